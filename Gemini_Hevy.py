@@ -5,6 +5,7 @@ import json
 import pandas as pd
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -12,6 +13,9 @@ from google.auth.transport.requests import Request
 from googleapiclient.http import MediaIoBaseDownload
 from google import genai
 from dotenv import load_dotenv
+from hevy_client import HevyClient, HevyAPIError
+from csv_store import dataset_files
+from schemas import parse_dates
 
 # --- CONFIGURATION ---
 DRY_RUN = False  # Set to False to actually post workouts to Hevy
@@ -21,6 +25,10 @@ load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 HEVY_API_KEY = os.getenv("HEVY_API_KEY")
 TARGET_FOLDER_ID = os.getenv("GOOGLE_DRIVE_FOLDER_ID")
+SAVE_PATH = os.getenv("SAVE_PATH")  # Drive-synced folder the Pi writes the CSVs into
+SYNCED_MAX_AGE_HOURS = 48  # Older local hevy_stats.csv means the sync stopped: fall back to Drive
+HEVY_MAX_WORKERS = 4   # Routines created/deleted in parallel
+hevy = HevyClient(HEVY_API_KEY, pool_size=HEVY_MAX_WORKERS)
 SCOPES = [
     'https://www.googleapis.com/auth/drive',
     'https://www.googleapis.com/auth/spreadsheets.readonly'
@@ -92,7 +100,7 @@ def aggregate_training_data(hevy_stats_df, exercise_db_df, months=6):
     """
     # Filter for last N months (using DateOffset for precision)
     cutoff_date = datetime.now() - pd.DateOffset(months=months)
-    hevy_stats_df['Date'] = pd.to_datetime(hevy_stats_df['Date'], format='mixed')
+    hevy_stats_df['Date'] = parse_dates(hevy_stats_df['Date'])
     recent_data = hevy_stats_df[hevy_stats_df['Date'] >= cutoff_date].copy()
 
     if recent_data.empty:
@@ -156,7 +164,7 @@ def calculate_strength_trends(hevy_stats_df, recent_months=3, history_months=12)
     history_cutoff = now - pd.DateOffset(months=history_months)
 
     df = hevy_stats_df.copy()
-    df['Date'] = pd.to_datetime(df['Date'], format='mixed')
+    df['Date'] = parse_dates(df['Date'])
     df['estimated_1rm'] = df.apply(
         lambda row: calculate_one_rep_max(row['Weight (lbs)'], row['Reps']), axis=1
     )
@@ -239,26 +247,10 @@ def get_drive_service():
 def fetch_and_save_hevy_exercises():
     """Downloads exercise list from Hevy and saves as CSV locally."""
     print("   [!] 'HEVY APP exercises.csv' missing. Downloading from Hevy API...")
-    url = "https://api.hevyapp.com/v1/exercise_templates"
-    headers = {"api-key": HEVY_API_KEY}
-    
-    all_exercises = []
-    page = 1
-    page_count = 1
-    
     try:
-        # Hevy paginates, so we loop to get them all
-        while page <= page_count:
-            response = requests.get(url, headers=headers, params={"page": page, "pageSize": 50})
-            if response.status_code != 200:
-                print(f"Error fetching exercises: {response.text}")
-                return None
-            
-            data = response.json()
-            page_count = data.get("page_count", 1)
-            all_exercises.extend(data.get("exercise_templates", []))
-            page += 1
-            
+        # Hevy paginates, so we walk every page (largest page size the endpoint allows)
+        all_exercises = list(hevy.paginate("/exercise_templates", "exercise_templates"))
+
         # Convert to DataFrame
         df = pd.DataFrame(all_exercises)
         # Keep columns needed for aggregation and LLM context
@@ -274,7 +266,10 @@ def fetch_and_save_hevy_exercises():
         else:
             print("   -> Error: Unexpected data format from Hevy.")
             return None
-            
+
+    except HevyAPIError as e:
+        print(f"Error fetching exercises: {e.message}")
+        return None
     except Exception as e:
         print(f"   -> Failed to fetch exercises: {e}")
         return None
@@ -321,30 +316,60 @@ def get_sheet_tab(service, filename, sheet_name):
         print(f"   [!] Error fetching sheet '{sheet_name}': {e}")
         return None
 
-def get_file_content(service, filename):
-    # First check if file exists locally
-    if os.path.exists(filename):
-        print(f"   Found '{filename}' locally.")
-        with open(filename, 'rb') as f:
-            return io.BytesIO(f.read())
+def find_local_copy(filename):
+    """Return the newest local copy of filename (SAVE_PATH or current directory), or None."""
+    candidates = []
+    if SAVE_PATH:
+        candidates.append(os.path.join(SAVE_PATH, filename))
+    candidates.append(filename)
+
+    existing = [path for path in candidates if os.path.isfile(path)]
+    if not existing:
+        return None
+    return max(existing, key=os.path.getmtime)
 
-    # If not local, search Google Drive
-    print(f"   Searching for '{filename}' in Google Drive...")
+def find_drive_file(service, filename):
+    """Look up filename's metadata in the Drive folder (no download). Returns the file dict or None."""
     query = f"'{TARGET_FOLDER_ID}' in parents and name = '{filename}' and trashed=false"
-    results = service.files().list(q=query, pageSize=1, fields="files(id, name, mimeType)").execute()
+    results = service.files().list(q=query, pageSize=1, fields="files(id, name, mimeType, modifiedTime)").execute()
     items = results.get('files', [])
+    return items[0] if items else None
 
-    if not items:
-        print(f"   [!] Warning: Could not find '{filename}' locally or in Google Drive.")
-        return None
-
-    file_id = items[0]['id']
-    mime_type = items[0]['mimeType']
+def resolve_data_source(service, filename, max_age_hours=None):
+    """
+    Decide where to read filename from.
 
-    if mime_type == 'application/vnd.google-apps.spreadsheet':
-        request = service.files().export_media(fileId=file_id, mimeType='text/csv')
+    A local copy in SAVE_PATH (written directly by the sync scripts) is used without
+    asking Drive, unless it is older than max_age_hours (a sync job has stopped); only
+    then, or when there is no local copy, is Drive queried. Returns ('local', path),
+    ('drive', file_dict) or (None, None).
+    """
+    local_path = find_local_copy(filename)
+    if local_path:
+        age_hours = (time.time() - os.path.getmtime(local_path)) / 3600
+        if max_age_hours is None or age_hours <= max_age_hours:
+            return 'local', local_path
+        print(f"   Local '{filename}' was last written {age_hours:.0f}h ago (limit {max_age_hours}h). Checking Drive...")
+
+    drive_item = None
+    if service is not None and TARGET_FOLDER_ID:
+        try:
+            drive_item = find_drive_file(service, filename)
+        except Exception as e:
+            print(f"   [!] Drive lookup for '{filename}' failed: {e}")
+
+    if drive_item:
+        return 'drive', drive_item
+    if local_path:
+        return 'local', local_path  # Stale, but better than nothing
+    return None, None
+
+def download_drive_file(service, drive_item):
+    """Download (or export, for Google Sheets) a Drive file into memory."""
+    if drive_item['mimeType'] == 'application/vnd.google-apps.spreadsheet':
+        request = service.files().export_media(fileId=drive_item['id'], mimeType='text/csv')
     else:
-        request = service.files().get_media(fileId=file_id)
+        request = service.files().get_media(fileId=drive_item['id'])
 
     fh = io.BytesIO()
     downloader = MediaIoBaseDownload(fh, request)
@@ -352,15 +377,51 @@ def get_file_content(service, filename):
     while done is False:
         _, done = downloader.next_chunk()
     fh.seek(0)
-    print(f"   -> Downloaded '{filename}' from Google Drive successfully.")
     return fh
 
+def read_partitioned_dataset(filename):
+    """Local month-partitioned dataset (PARTITIONED_DATASETS) joined into one CSV buffer, or None."""
+    path = os.path.join(SAVE_PATH, filename) if SAVE_PATH else filename
+    files = dataset_files(path)
+    if not files or files == [path]:
+        return None
+    buf = io.StringIO()
+    for i, file_path in enumerate(files):
+        with open(file_path, mode='r', encoding='utf-8') as f:
+            if i:
+                f.readline()  # Header only once
+            buf.write(f.read())
+    buf.seek(0)
+    return buf
+
+def get_file_content(service, filename, max_age_hours=None):
+    partitioned_buf = read_partitioned_dataset(filename)
+    if partitioned_buf is not None:
+        print(f"   Found '{filename}' locally (month partitions).")
+        return partitioned_buf
+
+    source, location = resolve_data_source(service, filename, max_age_hours)
+
+    if source == 'local':
+        print(f"   Found '{filename}' locally ({location}).")
+        with open(location, 'rb') as f:
+            return io.BytesIO(f.read())
+
+    if source == 'drive':
+        print(f"   Downloading '{filename}' from Google Drive...")
+        fh = download_drive_file(service, location)
+        print(f"   -> Downloaded '{filename}' from Google Drive successfully.")
+        return fh
+
+    print(f"   [!] Warning: Could not find '{filename}' locally or in Google Drive.")
+    return None
+
 def generate_monthly_plan():
     service = get_drive_service()
     client = genai.Client(api_key=GEMINI_API_KEY)
 
     print("\n--- STEP 1: GATHERING DATA ---")
-    hevy_stats = get_file_content(service, "hevy_stats.csv")
+    hevy_stats = get_file_content(service, "hevy_stats.csv", max_age_hours=SYNCED_MAX_AGE_HOURS)
     exercise_db = get_file_content(service, "HEVY APP exercises.csv")
     chat_memory = get_sheet_tab(service, "Chat Memory", "Memory Log")
 
@@ -433,55 +494,89 @@ def generate_monthly_plan():
     )
     return json.loads(response.text)
 
+def hevy_request(method, path, **kwargs):
+    """
+    Send a request through the shared Hevy client. Returns (response, elapsed_seconds).
+    POSTs are not retried once they may have reached Hevy (see HevyClient.request).
+    """
+    started = time.perf_counter()
+    response = hevy.request(method, path, **kwargs)
+    return response, time.perf_counter() - started
+
 def get_or_create_folder(folder_name="AI Fitness"):
     """Get the folder ID for the given folder name, or create it if it doesn't exist."""
-    headers = {"api-key": HEVY_API_KEY, "Content-Type": "application/json"}
-
     # List existing folders
-    response = requests.get("https://api.hevyapp.com/v1/routine_folders", headers=headers)
-    if response.status_code == 200:
-        folders = response.json().get('routine_folders', [])
-        for folder in folders:
-            if folder['title'] == folder_name:
-                print(f"   Found existing folder '{folder_name}' (ID: {folder['id']})")
-                return folder['id']
+    try:
+        folder_id = hevy.find_routine_folder(folder_name)
+    except HevyAPIError as e:
+        print(f"   Failed to list folders: {e.message}")
+        folder_id = None
+    if folder_id:
+        print(f"   Found existing folder '{folder_name}' (ID: {folder_id})")
+        return folder_id
 
     # Folder doesn't exist, create it
     print(f"   Creating new folder '{folder_name}'...")
-    payload = {"routine_folder": {"title": folder_name}}
-    response = requests.post("https://api.hevyapp.com/v1/routine_folders", headers=headers, json=payload)
-    if response.status_code in [200, 201]:
-        folder_id = response.json()['routine_folder']['id']
+    folder_id = hevy.create_routine_folder(folder_name)
+    if folder_id:
         print(f"   Created folder '{folder_name}' (ID: {folder_id})")
         return folder_id
     else:
-        print(f"   Failed to create folder: {response.text}")
+        print(f"   Failed to create folder '{folder_name}'")
         return None
 
+def delete_routine(routine):
+    """Delete a single routine. Returns (title, ok, detail, seconds)."""
+    title = routine['title']
+    try:
+        response, elapsed = hevy_request("DELETE", f"/routines/{routine['id']}")
+    except requests.exceptions.RequestException as e:
+        return title, False, str(e), 0.0
+    return title, response.status_code == 200, response.text, elapsed
+
 def delete_routines_in_folder(folder_id):
     """Delete all routines in the specified folder."""
-    headers = {"api-key": HEVY_API_KEY}
-
     # List routines in the folder
-    response = requests.get(f"https://api.hevyapp.com/v1/routines?routine_folder_id={folder_id}", headers=headers)
-    if response.status_code != 200:
-        print(f"   Failed to list routines: {response.text}")
+    try:
+        routines = [r for r in hevy.paginate("/routines", "routines", params={"routine_folder_id": folder_id})
+                    if r.get('folder_id') == folder_id]
+    except (HevyAPIError, requests.exceptions.RequestException) as e:
+        print(f"   Failed to list routines: {e}")
         return
 
-    routines = response.json().get('routines', [])
     if not routines:
         print(f"   No existing routines to delete.")
         return
 
     print(f"   Deleting {len(routines)} existing routine(s)...")
-    for routine in routines:
-        routine_id = routine['id']
-        title = routine['title']
-        delete_response = requests.delete(f"https://api.hevyapp.com/v1/routines/{routine_id}", headers=headers)
-        if delete_response.status_code == 200:
-            print(f"   -> Deleted '{title}'")
-        else:
-            print(f"   -> Failed to delete '{title}': {delete_response.text}")
+    with ThreadPoolExecutor(max_workers=HEVY_MAX_WORKERS) as pool:
+        futures = [pool.submit(delete_routine, routine) for routine in routines]
+        for future in as_completed(futures):
+            title, ok, detail, elapsed = future.result()
+            if ok:
+                print(f"   -> Deleted '{title}' ({elapsed:.2f}s)")
+            else:
+                print(f"   -> Failed to delete '{title}': {detail}")
+
+def create_routine(payload):
+    """POST a single routine. Returns (title, routine_id or None, error or None, seconds)."""
+    title = payload['routine']['title']
+    try:
+        response, elapsed = hevy_request("POST", "/routines", json=payload)
+    except requests.exceptions.RequestException as e:
+        return title, None, str(e), 0.0
+
+    # Hevy returns 200 or 201 for success, or the routine data itself
+    try:
+        response_data = response.json()
+    except (json.JSONDecodeError, requests.exceptions.JSONDecodeError):
+        return title, None, f"Invalid JSON response - {response.text[:200]}", elapsed
+
+    if response.status_code in [200, 201] or 'routine' in response_data:
+        routine_data = response_data.get('routine', [{}])
+        routine_id = routine_data[0].get('id', 'unknown') if isinstance(routine_data, list) else routine_data.get('id', 'unknown')
+        return title, routine_id, None, elapsed
+    return title, None, response.text, elapsed
 
 def post_to_hevy(routines_json):
     if DRY_RUN:
@@ -493,39 +588,43 @@ def post_to_hevy(routines_json):
     print("\n--- STEP 3: UPLOADING TO HEVY ---")
 
     # Create a new dated folder each time
-    from datetime import datetime
     folder_name = f"AI Fitness {datetime.now().strftime('%Y-%m-%d')}"
     folder_id = get_or_create_folder(folder_name)
     if not folder_id:
         print("ERROR: Could not get or create folder")
         return
 
-    url = "https://api.hevyapp.com/v1/routines"
-    headers = {"api-key": HEVY_API_KEY, "Content-Type": "application/json"}
-
     routines_list = routines_json.get('routines', []) if isinstance(routines_json, dict) else routines_json
 
-    print(f"\n   Creating {len(routines_list)} new routine(s)...")
+    payloads = []
     for routine in routines_list:
         # Add folder_id to the routine
         routine['folder_id'] = folder_id
+        payloads.append({"routine": routine} if "routine" not in routine else routine)
+
+    # Created in parallel over the pooled session; pool.map hands the results
+    # back by plan index, so the report follows the plan whatever finishes first
+    print(f"\n   Creating {len(payloads)} new routine(s)...")
+    started = time.perf_counter()
+    latencies = []
+    success_count = 0
+
+    with ThreadPoolExecutor(max_workers=HEVY_MAX_WORKERS) as pool:
+        results = list(pool.map(create_routine, payloads))
+
+    for title, routine_id, error, elapsed in results:
+        latencies.append(elapsed)
+        if error is None:
+            success_count += 1
+            print(f"   -> '{title}' created (ID: {routine_id}) in {elapsed:.2f}s")
+        else:
+            print(f"   -> '{title}' failed after {elapsed:.2f}s: {error}")
 
-        payload = {"routine": routine} if "routine" not in routine else routine
-        title = payload['routine']['title']
-        print(f"   Posting routine: {title}...")
-
-        response = requests.post(url, headers=headers, json=payload)
-        # Hevy returns 200 or 201 for success, or the routine data itself
-        try:
-            response_data = response.json()
-            if response.status_code in [200, 201] or 'routine' in response_data:
-                routine_data = response_data.get('routine', [{}])
-                routine_id = routine_data[0].get('id', 'unknown') if isinstance(routine_data, list) else routine_data.get('id', 'unknown')
-                print(f"   -> Success! (ID: {routine_id})")
-            else:
-                print(f"   -> Failed: {response.text}")
-        except (json.JSONDecodeError, requests.exceptions.JSONDecodeError):
-            print(f"   -> Failed: Invalid JSON response - {response.text[:200]}")
+    total = time.perf_counter() - started
+    if latencies:
+        print(f"   Uploaded {success_count}/{len(payloads)} routines in {total:.2f}s "
+              f"(per-routine avg {sum(latencies) / len(latencies):.2f}s, max {max(latencies):.2f}s)")
+    print(f"   {hevy.metrics_summary()}")
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Dashboard Load Benchmarks
+
+Generates large synthetic datasets in a temp folder and times the dashboard's
+data loading paths. Nothing in SAVE_PATH is read or written.
+
+Benchmarks:
+  dates  - hevy_stats.csv load: legacy mixed-format dates parsed with
+           format='mixed' (before) vs ISO dates with schema dtypes and the
+           fixed-format parse_dates() fast path (after)
+  kpis   - Training tab metric cards for a 30-day period vs the previous one:
+           per-period boolean masks + .copy() + separate metrics (before) vs
+           one compute_kpis() aggregation over the date-indexed frame (after)
+  rerun  - per-rerun frame work of the Training and Cardio sections, timed and
+           traced with tracemalloc: masked .copy() frames with derived columns
+           added by mutation (before) vs index slices of frames whose derived
+           columns were computed at load (after). Fails if the "after" peak
+           allocation exceeds RERUN_ALLOC_BUDGET_MB (dashboard_frames.py;
+           tests/test_rerun_memory.py asserts it on fixture files)
+
+Usage:
+  python benchmark_dashboard.py                 # All benchmarks, 500k rows
+  python benchmark_dashboard.py --rows 100000
+  python benchmark_dashboard.py dates
+  python benchmark_dashboard.py kpis
+  python benchmark_dashboard.py rerun
+"""
+
+from datetime import date, timedelta
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from dashboard_frames import RERUN_ALLOC_BUDGET_MB, date_slice
+from kpi_engine import KPI, compute_kpis
+from schemas import HEVY_STATS, parse_dates
+
+# --- CONFIGURATION ---
+ROWS = 500_000
+REPEATS = 3
+LEGACY_DATE_SHARE = 0.1  # Share of rows written as M/D/YYYY in the "before" file
+
+args = sys.argv[1:]
+if "--rows" in args:
+    ROWS = int(args[args.index("--rows") + 1])
+SELECTED = [a for a in args if not a.startswith("-") and not a.isdigit()]
+# ---------------------
+
+
+def best_of(func, repeats=REPEATS):
+    """Run func `repeats` times and return (best seconds, last result)."""
+    best = None
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def write_hevy_file(path, rows, legacy_share):
+    """Synthetic hevy_stats.csv: ~8 sets per workout day, newest first."""
+    rng = random.Random(42)
+    exercises = ["Bench Press (Barbell)", "Squat (Barbell)", "Deadlift (Barbell)",
+                 "Lat Pulldown (Cable)", "Overhead Press (Dumbbell)", "Bicep Curl (Dumbbell)"]
+    day = date.today()
+    with open(path, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEVY_STATS.headers)
+        for i in range(rows):
+            if i % 8 == 0:
+                day -= timedelta(days=1)
+            if rng.random() < legacy_share:
+                date_str = f"{day.month}/{day.day}/{day.year}"
+            else:
+                date_str = day.isoformat()
+            writer.writerow([date_str, "Workout", rng.choice(exercises), i % 4 + 1,
+                             round(rng.uniform(20, 300), 1), rng.randint(3, 15), "", "normal"])
+
+
+def bench_dates(workdir):
+    legacy_path = os.path.join(workdir, "hevy_legacy.csv")
+    iso_path = os.path.join(workdir, "hevy_iso.csv")
+    write_hevy_file(legacy_path, ROWS, LEGACY_DATE_SHARE)
+    write_hevy_file(iso_path, ROWS, 0.0)
+
+    def before():
+        df = pd.read_csv(legacy_path)
+        df['Date'] = pd.to_datetime(df['Date'], format='mixed', dayfirst=False)
+        return df
+
+    def after():
+        df = pd.read_csv(iso_path, **HEVY_STATS.read_csv_kwargs())
+        df['Date'] = parse_dates(df['Date'])
+        return df
+
+    before_s, df_before = best_of(before)
+    after_s, df_after = best_of(after)
+    assert df_before['Date'].equals(df_after['Date'])
+
+    # Date parsing alone (cache=False so every row is parsed, not just unique dates)
+    legacy_dates = pd.read_csv(legacy_path, usecols=['Date'])['Date']
+    iso_dates = pd.read_csv(iso_path, usecols=['Date'])['Date']
+    mixed_s, _ = best_of(lambda: pd.to_datetime(legacy_dates, format='mixed', cache=False))
+    fixed_s, _ = best_of(lambda: pd.to_datetime(iso_dates, format='%Y-%m-%d', cache=False))
+
+    print(f"dates: hevy_stats.csv, {ROWS:,} rows ({LEGACY_DATE_SHARE:.0%} legacy dates in 'before')")
+    print(f"   before  read_csv + format='mixed'      {before_s * 1000:8.1f} ms")
+    print(f"   after   schema dtypes + ISO fast path  {after_s * 1000:8.1f} ms   ({before_s / after_s:.1f}x)")
+    print(f"   date parse only: mixed {mixed_s * 1000:.1f} ms -> fixed format {fixed_s * 1000:.1f} ms "
+          f"({mixed_s / fixed_s:.1f}x)")
+
+
+def bench_kpis(workdir):
+    path = os.path.join(workdir, "hevy_kpis.csv")
+    write_hevy_file(path, ROWS, 0.0)
+    df = pd.read_csv(path, **HEVY_STATS.read_csv_kwargs())
+    df['Date'] = parse_dates(df['Date'])
+    df['Volume'] = df['Weight (lbs)'].fillna(0) * df['Reps'].fillna(0)
+    indexed = df.sort_values('Date', kind='stable').set_index('Date', drop=False)
+    indexed.index.name = None
+
+    end = df['Date'].max() + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    start = end.normalize() - pd.Timedelta(days=29)
+    prev_start, prev_end = start - pd.Timedelta(days=30), start - pd.Timedelta(seconds=1)
+    kpis = [KPI("workouts", ("Date", "Workout"), "distinct"), KPI("volume", "Volume", "sum"),
+            KPI("sets"), KPI("exercises", "Exercise", "nunique")]
+
+    def before():
+        current = df[(df['Date'] >= start) & (df['Date'] <= end)].copy()
+        previous = df[(df['Date'] >= prev_start) & (df['Date'] <= prev_end)].copy()
+        return (current.groupby(['Date', 'Workout']).ngroups, current['Volume'].sum(), len(current),
+                current['Exercise'].nunique(), previous.groupby(['Date', 'Workout']).ngroups,
+                previous['Volume'].sum(), len(previous))
+
+    def after():
+        return compute_kpis(indexed, kpis, (start, end), (prev_start, prev_end))
+
+    before_s, old = best_of(before, repeats=REPEATS * 10)
+    after_s, new = best_of(after, repeats=REPEATS * 10)
+    assert (new['workouts'].current, new['sets'].current, new['workouts'].previous, new['sets'].previous) == \
+        (old[0], old[2], old[4], old[6])
+
+    print(f"kpis: hevy_stats.csv, {ROWS:,} rows, 30-day period vs previous 30 days")
+    print(f"   before  masks + copies + per-metric calls  {before_s * 1000:8.2f} ms")
+    print(f"   after   compute_kpis (one pass)             {after_s * 1000:8.2f} ms   ({before_s / after_s:.1f}x)")
+
+
+def traced_peak_mb(func):
+    """Peak Python-tracked allocation (MB) while running func once."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def make_activities(rows):
+    """Synthetic garmin_activities frame (one activity per row, ~2 per day, oldest first)."""
+    rng = random.Random(7)
+    dates = pd.Timestamp(date.today()) - pd.to_timedelta([(rows - i) // 2 for i in range(rows)], unit="D")
+    return pd.DataFrame({
+        "Date": dates,
+        "sportType": [rng.choice(["running", "cycling", "swimming"]) for _ in range(rows)],
+        "duration": [rng.uniform(900, 5400) for _ in range(rows)],
+        "distance": [rng.uniform(1000, 40000) for _ in range(rows)],
+        "averageSpeed": [rng.uniform(1.0, 9.0) for _ in range(rows)],
+        "averageHR": [rng.uniform(110, 170) for _ in range(rows)],
+    })
+
+
+def bench_rerun(workdir):
+    path = os.path.join(workdir, "hevy_rerun.csv")
+    write_hevy_file(path, ROWS, 0.0)
+    hevy = pd.read_csv(path, **HEVY_STATS.read_csv_kwargs())
+    hevy['Date'] = parse_dates(hevy['Date'])
+    hevy['Volume'] = hevy['Weight (lbs)'].fillna(0) * hevy['Reps'].fillna(0)
+    activities = make_activities(max(ROWS // 10, 1000))
+
+    # "After" frames: what the loaders return (sorted, date-indexed, derived columns added once)
+    hevy_loaded = hevy.assign(Week=hevy['Date'].dt.to_period('W').dt.start_time)
+    hevy_loaded = hevy_loaded.sort_values('Date', kind='stable').set_index('Date', drop=False)
+    hevy_loaded.index.name = None
+    speed = activities['averageSpeed']
+    activities_loaded = activities.assign(distance_km=activities['distance'] / 1000, speed_kmh=speed * 3.6,
+                                          pace_min_km=(1000 / (speed * 60)).where(speed > 0))
+    activities_loaded = activities_loaded.set_index('Date', drop=False)
+    activities_loaded.index.name = None
+
+    end = pd.Timestamp(date.today()) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    start = end.normalize() - pd.Timedelta(days=89)
+    prev_start, prev_end = start - pd.Timedelta(days=90), start - pd.Timedelta(seconds=1)
+
+    def before():
+        filtered = hevy[(hevy['Date'] >= start) & (hevy['Date'] <= end)].copy()
+        prev = hevy[(hevy['Date'] >= prev_start) & (hevy['Date'] <= prev_end)].copy()
+        weekly = filtered[['Date', 'Volume']].copy()
+        weekly['Week'] = weekly['Date'].dt.to_period('W').dt.start_time
+        weekly_agg = weekly.groupby('Week')['Volume'].sum()
+        runs = activities[(activities['Date'] >= start) & (activities['Date'] <= end)].copy()
+        runs = runs[runs['sportType'] == "running"].copy()
+        prev_runs = activities[(activities['Date'] >= prev_start) & (activities['Date'] <= prev_end)].copy()
+        prev_runs = prev_runs[prev_runs['sportType'] == "running"].copy()
+        distance = runs.assign(distance_display=runs['averageSpeed'] * runs['duration'] / 1000)
+        pace = runs.assign(pace_display=1000 / (runs['averageSpeed'] * 60))
+        speed_frame = runs.assign(speed_display=runs['averageSpeed'] * 3.6)
+        return len(prev), weekly_agg, distance, pace, speed_frame, prev_runs
+
+    def after():
+        filtered = date_slice(hevy_loaded, start, end)
+        weekly_agg = filtered.groupby('Week')['Volume'].sum()
+        comparison = date_slice(activities_loaded, prev_start, end)
+        comparison = comparison[comparison['sportType'] == "running"]
+        runs = date_slice(comparison, start, end)
+        distance = runs[['Date', 'distance_km', 'averageHR']]
+        pace = runs[['Date', 'pace_min_km']]
+        speed_frame = runs[['Date', 'speed_kmh']]
+        return weekly_agg, distance, pace, speed_frame
+
+    before_s, _ = best_of(before)
+    after_s, _ = best_of(after)
+    before_mb = traced_peak_mb(before)
+    after_mb = traced_peak_mb(after)
+
+    print(f"rerun: Training + Cardio frame work, {ROWS:,} sets / {len(activities):,} activities, 90-day range")
+    print(f"   before  masks + copies + mutation      {before_s * 1000:8.1f} ms   peak {before_mb:6.2f} MB")
+    print(f"   after   index slices + load-time cols  {after_s * 1000:8.1f} ms   peak {after_mb:6.2f} MB")
+    if after_mb > RERUN_ALLOC_BUDGET_MB:
+        print(f"   FAIL: peak {after_mb:.2f} MB is over the {RERUN_ALLOC_BUDGET_MB} MB budget")
+        sys.exit(1)
+    print(f"   OK: within the {RERUN_ALLOC_BUDGET_MB} MB per-rerun budget")
+
+
+BENCHMARKS = {
+    "dates": bench_dates,
+    "kpis": bench_kpis,
+    "rerun": bench_rerun,
+}
+
+
+def main():
+    names = SELECTED or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmark(s): {', '.join(unknown)}. Available: {', '.join(BENCHMARKS)}")
+        sys.exit(1)
+
+    workdir = tempfile.mkdtemp(prefix="dashboard_bench_")
+    try:
+        print(f"pandas {pd.__version__}, best of {REPEATS}\n")
+        for name in names:
+            BENCHMARKS[name](workdir)
+            print()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
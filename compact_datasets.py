@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Compact the CSV Datasets
+
+Duplicates and out-of-order rows build up over time: the history import
+appends rows at the end of garmin_stats.csv, and re-syncs can write the same
+activity or set twice. This job cleans every registered dataset (schemas.py):
+
+  1. Runs pending schema migrations
+  2. Removes duplicate rows on the natural key (the last copy in the file wins,
+     the same row the dashboard kept)
+  3. Sorts newest first and normalises values to the column types: ISO dates,
+     whole numbers for integer columns, unparseable numbers blanked
+  4. Rebuilds the <file>.meta.json sidecar and records a "clean" marker
+
+While the marker matches the files, the dashboard skips its own dedup/sort on
+load. Any later write that could break the order invalidates the marker
+automatically (see csv_store.is_clean).
+
+Cron example (daily at 3:15 AM):
+  15 3 * * * /path/to/venv/bin/python /path/to/compact_datasets.py
+"""
+
+from csv_store import (dataset_files, dataset_lock, is_clean, load_meta,
+                       mark_clean, normalize_date, read_rows, save_meta, write_dataset)
+from schemas import SCHEMAS, migrate_dataset
+import math
+import os
+import sys
+import platform
+import time
+from dotenv import load_dotenv
+
+# 1. Load configuration
+load_dotenv()
+
+# 2. Platform-Aware Safety Check
+check_mount = os.getenv("CHECK_MOUNT_STATUS", "False").lower() == "true"
+drive_path = os.getenv("DRIVE_MOUNT_PATH", "/home/pi/google_drive")
+is_windows = platform.system() == "Windows"
+
+if check_mount and not is_windows:
+    print(f"Safety Check: Verifying mount at {drive_path}...")
+    if not os.path.ismount(drive_path):
+        print(f"CRITICAL ERROR: Drive is not mounted at {drive_path}.")
+        print("Stopping script to prevent writing to local storage.")
+        sys.exit(1)
+    else:
+        print("Safety Check: PASSED. Drive is mounted.")
+elif check_mount and is_windows:
+    print("Note: Mount check skipped on Windows (not applicable).")
+
+# --- CONFIGURATION ---
+SAVE_PATH = os.getenv("SAVE_PATH") or "."
+NULL_VALUES = {"nan", "NaN", "None", "null", "NULL"}
+TEXT_DTYPES = ("str", "category")
+# ---------------------
+
+
+def normalize_value(value, dtype):
+    """Normalise one CSV value for its column type. Returns (value, was_invalid)."""
+    if value is None:
+        return '', False
+    value = value.strip() if dtype not in TEXT_DTYPES else value
+    if value in NULL_VALUES:
+        return '', False
+    if dtype in TEXT_DTYPES or value == '':
+        return value, False
+    if dtype == "date":
+        iso = normalize_date(value)
+        return (iso, False) if iso else ('', True)
+    try:
+        number = float(value)
+    except ValueError:
+        return '', True
+    if not math.isfinite(number):
+        return '', False
+    if dtype.lower().startswith("int"):
+        if not number.is_integer():
+            return '', True
+        return str(int(number)), False
+    return value, False  # Floats keep their original text
+
+
+def compact_rows(rows, schema):
+    """Dedupe, normalise and sort rows. Returns (rows, duplicates, invalid values)."""
+    width = len(schema.columns)
+    dtypes = [c.dtype for c in schema.columns]
+    key_positions = [schema.headers.index(name) for name in schema.key]
+    order_positions = [schema.headers.index(name) for name in schema.order]
+
+    unique = {}
+    invalid = 0
+    for row in rows:
+        row = (row + [''] * width)[:width]
+        for i, dtype in enumerate(dtypes):
+            row[i], bad = normalize_value(row[i], dtype)
+            invalid += bad
+        key = tuple(row[i] for i in key_positions)
+        unique.pop(key, None)  # Last copy wins (and takes the later position)
+        unique[key] = row
+
+    compacted = list(unique.values())
+    compacted.sort(key=lambda r: tuple(r[i] for i in order_positions), reverse=True)
+    return compacted, len(rows) - len(compacted), invalid
+
+
+def compact_dataset(path, schema):
+    """Compact one dataset in place (under its lock)."""
+    name = schema.filename
+    if not dataset_files(path):
+        return
+    migrate_dataset(path, schema)
+
+    with dataset_lock(path):
+        if is_clean(path):
+            print(f"{name}: already clean.")
+            return
+
+        rows = list(read_rows(path, encoding='utf-8'))
+        compacted, duplicates, invalid = compact_rows(rows, schema)
+        changed = compacted != rows
+        print(f"{name}: {len(rows)} rows -> {len(compacted)} "
+              f"({duplicates} duplicates removed, {invalid} invalid values blanked"
+              f"{'' if changed else ', already in order'}).")
+        if changed:
+            write_dataset(path, schema.headers, compacted, encoding='utf-8')
+
+        # Rebuild the sidecar from what is now on disk
+        meta = load_meta(path)
+        meta.pop("date_format_version", None)  # Superseded by schema_version
+        meta.update({
+            "schema_version": schema.version,
+            "compacted_at": int(time.time()),
+        })
+        save_meta(path, meta)
+        mark_clean(path)
+
+
+def main():
+    print(f"--- Compacting datasets in {SAVE_PATH} ---")
+    for schema in SCHEMAS.values():
+        path = os.path.join(SAVE_PATH, schema.filename)
+        try:
+            compact_dataset(path, schema)
+        except Exception as e:
+            print(f"   Error compacting {schema.filename}: {e}")
+    print("--- COMPLETE ---")
+
+
+if __name__ == "__main__":
+    main()
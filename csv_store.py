@@ -0,0 +1,500 @@
+"""
+Keyed CSV Store for the daily tables (garmin_stats.csv)
+
+The daily health table has one row per date, newest first. upsert_daily_row()
+replaces one day's row without parsing or re-sorting the rest of the file:
+rows are read only until the target date's position, then the remainder is
+stream-copied unchanged. For today/yesterday that means parsing a couple of
+lines instead of the whole history.
+
+Legacy M/D/YYYY dates are rewritten as ISO by schemas.migrate_dataset(), which
+callers run before upserting. The first upsert on a file sorts it newest first
+once and records that in a sidecar <file>.meta.json, so later runs can rely on
+the file order. Writers that append out of order (history import) call
+mark_unsorted() so the next upsert re-sorts.
+
+Concurrent writers:
+  Every CSV writer takes dataset_lock(path), an advisory lock on <file>.lock
+  (fcntl on Linux/Pi, msvcrt on Windows), around its read-modify-write, and
+  writes through atomic_write(), a temp file in the same folder swapped in with
+  os.replace. Jobs can overlap safely and readers (dashboard, Drive sync)
+  never see a half-written file.
+
+Partitioned layout (optional, PARTITIONED_DATASETS=True in .env):
+  Each dataset is stored as month files, e.g. hevy_stats/2026-10.csv instead of
+  hevy_stats.csv. write_dataset() only replaces the partitions whose content
+  changed, so the Drive sync client re-uploads the current month instead of the
+  whole history. dataset_files()/read_rows() read either layout, and can skip
+  months outside a date range. The first write after switching the flag
+  converts the dataset (the old file or folder is kept as a .bak).
+
+Clean marker:
+  compact_datasets.py deduplicates and sorts every dataset, then records the
+  dataset_signature() in the sidecar. is_clean() is True until some writer
+  changes the files, so readers can skip their own dedup/sort. upsert_daily_row()
+  keeps rows unique and sorted, so it carries the marker forward.
+
+Usage:
+  from csv_store import upsert_daily_row
+  upsert_daily_row(CSV_FILE, HEADERS, row)   # row[0] is the ISO date
+
+  with dataset_lock(CSV_FILE):
+      rows = read_existing()
+      write_csv(CSV_FILE, HEADERS, rows)
+"""
+
+from contextlib import contextmanager
+import csv
+import filecmp
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+META_SUFFIX = ".meta.json"
+LOCK_SUFFIX = ".lock"
+PARTITION_NAME = re.compile(r"^\d{4}-\d{2}\.csv$")
+
+_held_locks = {}  # abs path -> (RLock, depth) so nested dataset_lock() calls don't deadlock
+_held_guard = threading.Lock()
+
+
+def normalize_date(date_str):
+    """Normalize date string to ISO format for comparison"""
+    if not date_str:
+        return None
+    try:
+        # Try ISO format first (YYYY-MM-DD)
+        if '-' in date_str and len(date_str) == 10:
+            return date_str
+        # Try US format (M/D/YYYY or MM/DD/YYYY)
+        if '/' in date_str:
+            parts = date_str.split('/')
+            if len(parts) == 3:
+                month, day, year = parts
+                return f"{year}-{int(month):02d}-{int(day):02d}"
+        return date_str
+    except:
+        return date_str
+
+
+def _try_lock_file(f):
+    f.seek(0)
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def _unlock_file(f):
+    f.seek(0)
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def dataset_lock(path, timeout=None):
+    """
+    Hold the cross-process write lock for a dataset. Re-entrant within a
+    process. Raises TimeoutError if another job holds it for over `timeout` s
+    (CSV_LOCK_TIMEOUT, default 300).
+    """
+    if timeout is None:
+        timeout = float(os.getenv("CSV_LOCK_TIMEOUT", "300"))
+    key = os.path.abspath(path)
+    with _held_guard:
+        rlock = _held_locks.setdefault(key, [threading.RLock(), 0])
+    with rlock[0]:
+        rlock[1] += 1
+        try:
+            if rlock[1] > 1:
+                yield
+                return
+
+            folder_path = os.path.dirname(path)
+            if folder_path and not os.path.exists(folder_path):
+                os.makedirs(folder_path)
+            with open(path + LOCK_SUFFIX, 'a+') as f:
+                deadline = time.monotonic() + timeout
+                waited = False
+                while True:
+                    try:
+                        _try_lock_file(f)
+                        break
+                    except OSError:
+                        if time.monotonic() > deadline:
+                            raise TimeoutError(f"{os.path.basename(path)} is locked by another job")
+                        if not waited:
+                            print(f"Waiting for another job to finish writing {os.path.basename(path)}...")
+                            waited = True
+                        time.sleep(0.2)
+                try:
+                    yield
+                finally:
+                    _unlock_file(f)
+        finally:
+            rlock[1] -= 1
+
+
+@contextmanager
+def atomic_write(path, encoding=None):
+    """
+    Open a temp file next to `path` for writing; when the block completes it
+    replaces `path` in one os.replace. On error the original is untouched.
+    """
+    folder_path = os.path.dirname(path) or "."
+    os.makedirs(folder_path, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=folder_path)
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_csv(path, headers, rows, encoding=None):
+    """Atomically replace a CSV with a header and rows."""
+    with atomic_write(path, encoding=encoding) as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+
+# --- PARTITIONED LAYOUT ---
+def partitioned():
+    """True when datasets should be stored as month partitions (read at call time, after load_dotenv)."""
+    return os.getenv("PARTITIONED_DATASETS", "False").lower() == "true"
+
+
+def partition_dir(path):
+    return os.path.splitext(path)[0]
+
+
+def partition_path(path, date_str):
+    """Month partition file holding `date_str` (YYYY-MM-DD)."""
+    return os.path.join(partition_dir(path), f"{normalize_date(date_str)[:7]}.csv")
+
+
+def _partition_files(path):
+    folder = partition_dir(path)
+    if not os.path.isdir(folder):
+        return []
+    names = sorted((n for n in os.listdir(folder) if PARTITION_NAME.match(n)), reverse=True)
+    return [os.path.join(folder, n) for n in names]
+
+
+def dataset_files(path, since=None, until=None):
+    """
+    Files currently holding a dataset, newest first: the flat file, or the
+    month partitions overlapping [since, until] (dates or ISO strings).
+    Works for either layout, whatever the flag says.
+    """
+    parts = _partition_files(path)
+    flat = [path] if os.path.isfile(path) else []
+    if not parts or (flat and not partitioned()):
+        return flat
+    if since:
+        parts = [p for p in parts if os.path.basename(p)[:7] >= str(since)[:7]]
+    if until:
+        parts = [p for p in parts if os.path.basename(p)[:7] <= str(until)[:7]]
+    return parts
+
+
+def dataset_signature(path):
+    """(file count, newest mtime_ns, total size) across the dataset's files, or None if missing."""
+    stats = []
+    for file_path in dataset_files(path):
+        try:
+            stats.append(os.stat(file_path))
+        except OSError:
+            pass
+    if not stats:
+        return None
+    return (len(stats), max(st.st_mtime_ns for st in stats), sum(st.st_size for st in stats))
+
+
+def read_rows(path, since=None, until=None, encoding=None):
+    """Yield every data row of a dataset (headers skipped, blank lines dropped)."""
+    for file_path in dataset_files(path, since, until):
+        with open(file_path, mode='r', newline='', encoding=encoding) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if row:
+                    yield row
+
+
+def ensure_layout(path, headers, encoding=None):
+    """Convert a dataset to the layout PARTITIONED_DATASETS asks for (once, keeping a .bak)."""
+    with dataset_lock(path):
+        if partitioned() and os.path.isfile(path):
+            rows = list(read_rows(path, encoding=encoding))
+            _write_partitions(path, headers, rows, encoding)
+            os.replace(path, path + ".bak")
+            print(f"Split {os.path.basename(path)} into month partitions ({len(rows)} rows).")
+        elif not partitioned() and not os.path.isfile(path) and _partition_files(path):
+            rows = list(read_rows(path, encoding=encoding))
+            rows.sort(key=lambda r: normalize_date(r[0]) or '', reverse=True)
+            write_csv(path, headers, rows, encoding=encoding)
+            shutil.rmtree(partition_dir(path) + ".bak", ignore_errors=True)
+            os.replace(partition_dir(path), partition_dir(path) + ".bak")
+            print(f"Merged {os.path.basename(path)} partitions back into one file ({len(rows)} rows).")
+
+
+def _write_partitions(path, headers, rows, encoding=None):
+    """Stream rows into per-month temp files, then swap in only the partitions that changed."""
+    folder = partition_dir(path)
+    os.makedirs(folder, exist_ok=True)
+    temps = {}
+    undated = 0
+    try:
+        for row in rows:
+            month = (normalize_date(row[0]) or '')[:7] if row else ''
+            if not re.match(r"^\d{4}-\d{2}$", month):
+                undated += 1
+                continue
+            if month not in temps:
+                fd, tmp_path = tempfile.mkstemp(prefix=f".{month}.", suffix=".tmp", dir=folder)
+                f = os.fdopen(fd, 'w', newline='', encoding=encoding)
+                writer = csv.writer(f)
+                writer.writerow(headers)
+                temps[month] = (tmp_path, f, writer)
+            temps[month][2].writerow(row)
+    finally:
+        for tmp_path, f, _ in temps.values():
+            f.close()
+
+    changed = 0
+    for month, (tmp_path, _, _) in temps.items():
+        target = os.path.join(folder, f"{month}.csv")
+        if os.path.isfile(target) and filecmp.cmp(tmp_path, target, shallow=False):
+            os.remove(tmp_path)  # Unchanged: leave the file (and its sync state) alone
+            continue
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, target)
+        changed += 1
+    for file_path in _partition_files(path):
+        if os.path.basename(file_path)[:7] not in temps:
+            os.remove(file_path)
+            changed += 1
+    if undated:
+        print(f"Warning: Skipped {undated} rows without a valid date in {os.path.basename(path)}.")
+    return changed
+
+
+def write_dataset(path, headers, rows, encoding=None):
+    """
+    Replace a dataset's contents. Flat layout: one atomic file rewrite.
+    Partitioned: only month files whose rows changed are rewritten.
+    """
+    with dataset_lock(path):
+        ensure_layout(path, headers, encoding)
+        if partitioned():
+            _write_partitions(path, headers, rows, encoding)
+        else:
+            write_csv(path, headers, rows, encoding=encoding)
+
+
+def replace_dataset(path, headers, source_path, encoding=None):
+    """
+    Install a fully written CSV (header + rows) as the dataset's new contents,
+    consuming source_path. The source may be on another filesystem (a local
+    scratch dir); it is copied in through atomic_write.
+    """
+    with dataset_lock(path):
+        ensure_layout(path, headers, encoding)
+        if not partitioned():
+            with open(source_path, mode='r', newline='', encoding=encoding) as src, \
+                    atomic_write(path, encoding) as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(source_path)
+            return
+        with open(source_path, mode='r', newline='', encoding=encoding) as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            _write_partitions(path, headers, (row for row in reader if row), encoding)
+        os.remove(source_path)
+
+
+def append_row(path, headers, row, encoding=None):
+    """Append one row (flat file or its month partition) and flag the dataset as unsorted."""
+    with dataset_lock(path):
+        ensure_layout(path, headers, encoding)
+        target = partition_path(path, row[0]) if partitioned() else path
+        new_file = not os.path.isfile(target)
+        if new_file:
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        with open(target, mode='a', newline='', encoding=encoding) as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(headers)
+            writer.writerow(row)
+        mark_unsorted(path)
+
+
+def meta_path(path):
+    return path + META_SUFFIX
+
+
+def load_meta(path):
+    """Sidecar metadata for a dataset ({} if none has been written yet)."""
+    try:
+        with open(meta_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_meta(path, meta):
+    with atomic_write(meta_path(path), encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_rows_file(path, encoding=None):
+    """Data rows of one CSV file ([] if it does not exist)."""
+    if not os.path.isfile(path):
+        return []
+    with open(path, mode='r', newline='', encoding=encoding) as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        return [row for row in reader if row]
+
+
+def _format_row(row):
+    buf = io.StringIO()
+    csv.writer(buf).writerow(row)
+    return buf.getvalue()
+
+
+def is_clean(path):
+    """True if the dataset is unchanged since it was last compacted (deduplicated and sorted)."""
+    signature = dataset_signature(path)
+    return signature is not None and load_meta(path).get("clean") == list(signature)
+
+
+def mark_clean(path):
+    """Record the dataset's current files as compacted (see is_clean)."""
+    with dataset_lock(path):
+        meta = load_meta(path)
+        meta.update({"clean": list(dataset_signature(path) or ()), "sorted": True})
+        save_meta(path, meta)
+
+
+def mark_unsorted(path):
+    """Record that rows were appended out of order; the next upsert re-sorts the file."""
+    with dataset_lock(path):
+        meta = load_meta(path)
+        if meta.get("sorted", True):
+            meta["sorted"] = False
+            save_meta(path, meta)
+
+
+def sort_daily_rows(path, headers):
+    """
+    Sort the file newest first, once (or again after mark_unsorted). Dates are
+    left as written; ISO conversion is the schema migration's job (see
+    schemas.migrate_dataset). Returns True if the file was rewritten.
+    """
+    meta = load_meta(path)
+    if meta.get("sorted") is True:
+        return False
+
+    count = 0
+    for file_path in dataset_files(path):  # The flat file, or each month partition
+        rows = read_rows_file(file_path)
+        rows.sort(key=lambda r: normalize_date(r[0]) or '', reverse=True)
+        write_csv(file_path, headers, rows)
+        count += len(rows)
+    if count:
+        print(f"Sorted {count} rows in {os.path.basename(path)} (newest first).")
+
+    meta.update({"sorted": True, "sorted_at": int(time.time())})
+    save_meta(path, meta)
+    return True
+
+
+def upsert_daily_row(path, headers, row):
+    """
+    Insert or replace the row for row[0]'s date in a newest-first CSV.
+
+    Only the rows newer than the target are parsed; everything after the
+    insertion point is copied through as raw text.
+    """
+    with dataset_lock(path):
+        was_clean = is_clean(path)
+        _upsert_daily_row(path, headers, row)
+        if was_clean:
+            mark_clean(path)  # Still one row per date, newest first
+
+
+def _upsert_daily_row(path, headers, row):
+    """upsert_daily_row() body; the caller holds the lock."""
+    ensure_layout(path, headers)
+    sort_daily_rows(path, headers)
+    target = normalize_date(row[0])
+    new_line = _format_row(row)
+
+    if partitioned():
+        # A month partition holds at most ~31 rows: replace the row and re-sort in memory
+        part = partition_path(path, target)
+        rows = [r for r in read_rows_file(part) if normalize_date(r[0]) != target] + [row]
+        rows.sort(key=lambda r: normalize_date(r[0]) or '', reverse=True)
+        write_csv(part, headers, rows)
+        return
+
+    if not os.path.isfile(path):
+        write_csv(path, headers, [row])
+        return
+
+    with atomic_write(path) as dst:
+        with open(path, mode='r', newline='') as src:
+            src.readline()  # Existing header is replaced by the current one
+            dst.write(_format_row(headers))
+            inserted = False
+            while True:
+                line = src.readline()
+                if not line:
+                    break
+                if not line.endswith("\n"):
+                    line += "\r\n"  # Last row written without a line ending
+                fields = next(csv.reader([line]), None)
+                if not fields:
+                    continue
+                row_date = normalize_date(fields[0])
+                if row_date is None:
+                    dst.write(line)  # Undated row: keep it where it is
+                    continue
+                if row_date == target:
+                    continue  # Replaced below
+                if row_date < target:
+                    dst.write(new_line)
+                    dst.write(line)
+                    inserted = True
+                    shutil.copyfileobj(src, dst)  # Older rows are untouched
+                    break
+                dst.write(line)
+            if not inserted:
+                dst.write(new_line)
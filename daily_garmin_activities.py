@@ -5,18 +5,21 @@ Daily Garmin Activities Sync
 Fetches ALL cardio activities from Garmin Connect (running, cycling, swimming, etc.)
 and saves them to garmin_activities.csv with sport-specific metrics.
 
-Replaces the older daily_garmin_runs.py which only fetched running activities.
+Also maintains garmin_runs.csv (the running-only view used by the AI coach) as a
+projection of the same fetch, so one login and one API call cover both files.
+daily_garmin_runs.py now just runs this script.
 """
 
-import garth
-from garminconnect import Garmin
+from garmin_session import get_garmin_client
 from datetime import date, timedelta
-import csv
 import os
 import sys
 import platform
 import json
 from dotenv import load_dotenv
+from garmin_activity_details import enqueue_activity_ids, start_worker
+from csv_store import dataset_lock, read_rows, write_dataset
+from schemas import GARMIN_ACTIVITIES, GARMIN_RUNS, migrate_dataset
 
 # 1. Load configuration
 load_dotenv()
@@ -40,7 +43,7 @@ elif check_mount and is_windows:
 # --- CONFIGURATION ---
 SAVE_PATH = os.getenv("SAVE_PATH")
 CSV_FILE = os.path.join(SAVE_PATH, "garmin_activities.csv") if SAVE_PATH else "garmin_activities.csv"
-TOKEN_DIR = ".garth"
+RUNS_CSV_FILE = os.path.join(SAVE_PATH, "garmin_runs.csv") if SAVE_PATH else "garmin_runs.csv"
 
 # Activity type categories for filtering
 CARDIO_TYPES = [
@@ -51,35 +54,11 @@ CARDIO_TYPES = [
     'cross_country_skiing', 'skate_skiing', 'backcountry_skiing'
 ]
 
-# CSV Headers - expanded schema for multi-sport
-HEADERS = [
-    # Identifiers
-    "Date", "Time", "activityName", "sportType",
-    # Duration & Distance
-    "duration", "elapsedDuration", "movingDuration", "distance",
-    # Speed/Pace
-    "averageSpeed", "maxSpeed",
-    # Heart Rate
-    "averageHR", "maxHR",
-    "hrTimeInZone_1", "hrTimeInZone_2", "hrTimeInZone_3", "hrTimeInZone_4", "hrTimeInZone_5",
-    # Power (Cycling/Running)
-    "avgPower", "maxPower", "normPower",
-    # Cadence
-    "avgCadence", "maxCadence",
-    # Elevation (Cycling/Running/Hiking)
-    "totalAscent", "totalDescent",
-    # Running Specific
-    "steps", "avgStrideLength",
-    # Swimming Specific
-    "avgStrokes", "totalStrokes", "poolLength", "numLaps",
-    # Training Metrics
-    "calories", "trainingEffectLabel", "activityTrainingLoad",
-    "aerobicEffect", "anaerobicEffect",
-    # VO2 & Performance
-    "vo2Max", "lactateThreshold",
-    # Activity ID (for reference)
-    "activityId"
-]
+# CSV Headers - multi-sport schema (see schemas.py)
+HEADERS = GARMIN_ACTIVITIES.headers
+
+# Runs view headers (garmin_runs.csv)
+RUNS_HEADERS = GARMIN_RUNS.headers
 # ---------------------
 
 
@@ -206,29 +185,70 @@ def extract_activity_data(act):
     ]
 
 
-def main():
-    # 1. Load Existing IDs
+def extract_run_data(act):
+    """Extract the garmin_runs.csv row for a running activity"""
+    start_local = act.get('startTimeLocal', '')
+
+    # Strength / Reps (Likely 0 for runs)
+    # summaries often come as a list of dicts. We JSON stringify it to fit in CSV.
+    summ_sets_raw = act.get('summarizedExerciseSets')
+    summ_sets_str = json.dumps(summ_sets_raw) if summ_sets_raw else ""
+
+    return [
+        start_local[:10], start_local[11:],
+        act.get('activityName', 'Run'),
+        safe_get(act, 'activityType', 'typeKey', default='running'),
+        act.get('duration', 0), act.get('elapsedDuration', 0), act.get('movingDuration', 0),
+        act.get('averageSpeed', 0), act.get('averageHR'), act.get('maxHR'), act.get('steps'),
+        summ_sets_str, act.get('totalSets'), act.get('activeSets'), act.get('totalReps'),
+        act.get('trainingEffectLabel'), act.get('activityTrainingLoad'), act.get('minActivityLapDuration'),
+        act.get('hrTimeInZone_1'), act.get('hrTimeInZone_2'), act.get('hrTimeInZone_3'), act.get('hrTimeInZone_4')
+    ]
+
+
+def load_existing_ids(csv_file):
+    """Return the set of "date_time" signatures already stored in a CSV"""
     existing_ids = set()
+    try:
+        for row in read_rows(csv_file, encoding='utf-8'):
+            if len(row) > 1:
+                existing_ids.add(f"{row[0]}_{row[1]}")  # date_time
+    except Exception as e:
+        print(f"Warning: Could not read {os.path.basename(csv_file)}: {e}")
+    return existing_ids
+
+
+def save_new_rows(csv_file, headers, new_rows):
+    """Merge new rows into a CSV, sorted by date/time newest first"""
+    with dataset_lock(csv_file):
+        existing_rows = list(read_rows(csv_file, encoding='utf-8'))
+
+        # Another job may have saved some of these since we read the IDs
+        current_ids = {f"{row[0]}_{row[1]}" for row in existing_rows if len(row) > 1}
+        new_rows = [row for row in new_rows if f"{row[0]}_{row[1]}" not in current_ids]
+
+        # Combine and sort by date/time descending (newest first)
+        all_rows = existing_rows + new_rows
+        all_rows.sort(key=lambda x: (x[0], x[1]) if len(x) > 1 else ('', ''), reverse=True)
+
+        # Rewrite (temp file + atomic replace; only changed month partitions if partitioned)
+        write_dataset(csv_file, headers, all_rows, encoding='utf-8')
+
+
+def main():
+    # 1. Load Existing IDs (activities store + runs view)
     folder_path = os.path.dirname(CSV_FILE)
     if folder_path and not os.path.exists(folder_path):
         os.makedirs(folder_path)
 
-    if os.path.isfile(CSV_FILE):
-        try:
-            with open(CSV_FILE, mode='r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                next(reader, None)  # Skip header
-                for row in reader:
-                    if len(row) > 1:
-                        existing_ids.add(f"{row[0]}_{row[1]}")  # date_time
-        except Exception as e:
-            print(f"Warning: Could not read existing file: {e}")
+    migrate_dataset(CSV_FILE, GARMIN_ACTIVITIES)  # Legacy headers/dates (one-time)
+    migrate_dataset(RUNS_CSV_FILE, GARMIN_RUNS)
+    existing_ids = load_existing_ids(CSV_FILE)
+    existing_run_ids = load_existing_ids(RUNS_CSV_FILE)
 
     # 2. Login
     try:
-        garth.resume(TOKEN_DIR)
-        api = Garmin("dummy", "dummy")
-        api.garth = garth.client
+        api = get_garmin_client()
     except Exception as e:
         print(f"Login Error: {e}")
         return
@@ -240,18 +260,29 @@ def main():
     print(f"Checking activities from {start_check}...")
 
     try:
-        # Fetch ALL activities (no type filter)
+        # Fetch ALL activities once (no type filter); runs are projected locally
         activities = api.get_activities_by_date(start_check.isoformat(), today.isoformat())
 
         new_rows = []
+        new_run_rows = []
+        new_activity_ids = []
         if activities:
             for act in activities:
                 start_local = act.get('startTimeLocal', '')
                 date_str = start_local[:10]
                 time_str = start_local[11:]
-
                 sig = f"{date_str}_{time_str}"
-                if sig in existing_ids:
+
+                is_new = sig not in existing_ids
+                is_new_run = (sig not in existing_run_ids and
+                              get_sport_category(safe_get(act, 'activityType', 'typeKey')) == "running")
+                if not is_new and not is_new_run:
+                    continue
+
+                new_activity_ids.append(act.get('activityId'))
+                if is_new_run:
+                    new_run_rows.append(extract_run_data(act))
+                if not is_new:
                     continue
 
                 # Extract activity data
@@ -263,27 +294,19 @@ def main():
                 print(f"   Found: {row[2]} ({sport}) on {date_str}")
 
         if new_rows:
-            # Read existing rows
-            existing_rows = []
-            if os.path.isfile(CSV_FILE):
-                with open(CSV_FILE, mode='r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    next(reader, None)  # Skip header
-                    existing_rows = list(reader)
-
-            # Combine and sort by date/time descending (newest first)
-            all_rows = existing_rows + new_rows
-            all_rows.sort(key=lambda x: (x[0], x[1]) if len(x) > 1 else ('', ''), reverse=True)
-
-            # Rewrite entire file
-            with open(CSV_FILE, mode='w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(HEADERS)
-                writer.writerows(all_rows)
+            save_new_rows(CSV_FILE, HEADERS, new_rows)
             print(f"SUCCESS: Added {len(new_rows)} new activities. [Sorted newest to oldest]")
         else:
             print("No new activities found.")
 
+        if new_run_rows:
+            save_new_rows(RUNS_CSV_FILE, RUNS_HEADERS, new_run_rows)
+            print(f"SUCCESS: Added {len(new_run_rows)} new runs to {os.path.basename(RUNS_CSV_FILE)}.")
+
+        # Details/splits/HR zones are fetched by a background worker so this sync stays fast
+        if enqueue_activity_ids(new_activity_ids):
+            start_worker()
+
     except Exception as e:
         print(f"Error: {e}")
 
@@ -1,8 +1,11 @@
-import garth
-from garminconnect import Garmin
+from garmin_session import get_garmin_client
+from csv_store import dataset_files, normalize_date, upsert_daily_row
+from schemas import GARMIN_STATS, migrate_dataset
 from datetime import date
 import csv
+import json
 import os
+import time
 from dotenv import load_dotenv
 
 import os
@@ -46,7 +49,34 @@ else:
     print("WARNING: SAVE_PATH not set in .env. Using current folder.")
     CSV_FILE = "garmin_stats.csv"
 
-TOKEN_DIR = ".garth"
+REFRESH_STATE_FILE = os.path.join(os.path.dirname(CSV_FILE), ".garmin_refresh_state.json")
+SLOW_REFRESH_HOURS = float(os.getenv("GARMIN_SLOW_REFRESH_HOURS", "4"))
+
+# Per-endpoint refresh policy for the hourly run:
+#   always         - fetched every run (steps, stress, calories, activities)
+#   until_present  - fetched until today's row has the values (sleep/HRV settle after wake-up)
+#   interval       - fetched at most every SLOW_REFRESH_HOURS (rarely change intra-day)
+# Skipped endpoints reuse the values already saved in today's row.
+REFRESH_POLICIES = {
+    "user_summary": "always",
+    "activities": "always",
+    "sleep": "until_present",
+    "hrv": "until_present",
+    "body_composition": "interval",
+    "blood_pressure": "interval",
+    "training_status": "interval",
+    "max_metrics": "interval",
+}
+
+# CSV columns filled by each skippable endpoint
+ENDPOINT_COLUMNS = {
+    "sleep": ["Sleep Total (hr)", "Sleep Deep (hr)", "Sleep REM (hr)", "Sleep Score"],
+    "hrv": ["HRV Status", "HRV Avg"],
+    "body_composition": ["Weight (lbs)", "Muscle Mass (lbs)", "Body Fat %", "Water %"],
+    "blood_pressure": ["BP Systolic", "BP Diastolic"],
+    "training_status": ["Training Status"],
+    "max_metrics": ["VO2 Max"],
+}
 # -------------------------------------
 
 def get_safe(data, *keys):
@@ -57,22 +87,76 @@ def get_safe(data, *keys):
     except (KeyError, TypeError, AttributeError):
         return None
 
+def load_today_row(today):
+    """Return today's saved row as {column: value}, or None if there isn't one yet."""
+    try:
+        for file_path in dataset_files(CSV_FILE, since=today, until=today):
+            with open(file_path, mode='r', newline='') as f:
+                for row in csv.DictReader(f):
+                    if normalize_date(row.get("Date")) == today:
+                        return row
+    except Exception:
+        pass
+    return None
+
+def load_refresh_state(today):
+    """Last fetch time per endpoint for today (empty on the first run of the day)."""
+    try:
+        with open(REFRESH_STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get("date") == today:
+            return state
+    except Exception:
+        pass
+    return {"date": today, "last_fetched": {}}
+
+def save_refresh_state(state):
+    try:
+        with open(REFRESH_STATE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+    except OSError as e:
+        print(f"Warning: Could not save refresh state: {e}")
+
+def should_refresh(endpoint, today_row, state, now=None):
+    """Apply the endpoint's refresh policy. Everything is fetched when today has no saved row."""
+    policy = REFRESH_POLICIES.get(endpoint, "always")
+    if policy == "always" or today_row is None:
+        return True
+    if policy == "until_present":
+        return any(not today_row.get(col) for col in ENDPOINT_COLUMNS[endpoint])
+    last = state["last_fetched"].get(endpoint)
+    return last is None or (now or time.time()) - last >= SLOW_REFRESH_HOURS * 3600
+
+def record_fetched(state, endpoints, row, now=None):
+    """Mark endpoints as fetched, but only those that filled a column (failed or empty fetches retry next run)."""
+    for endpoint in endpoints:
+        if any(row.get(col) not in (None, "") for col in ENDPOINT_COLUMNS.get(endpoint, [])):
+            state["last_fetched"][endpoint] = now or time.time()
+
 def main():
     try:
         print("1. Loading tokens...")
-        garth.resume(TOKEN_DIR)
-        
-        # Initialize API
-        api = Garmin("dummy", "dummy")
-        api.garth = garth.client
-        try:
-            api.display_name = api.garth.profile['displayName']
-        except:
-            pass
+        api = get_garmin_client()
         
         today = date.today().isoformat()
         print(f"2. Pulling data for {today}...")
 
+        today_row = load_today_row(today)
+        state = load_refresh_state(today)
+        fetched, skipped = [], []
+
+        def due(endpoint):
+            if should_refresh(endpoint, today_row, state):
+                fetched.append(endpoint)
+                return True
+            skipped.append(endpoint)
+            return False
+
+        def reuse(endpoint):
+            """Saved values for a skipped endpoint, in ENDPOINT_COLUMNS order."""
+            values = [today_row.get(col) or None for col in ENDPOINT_COLUMNS[endpoint]]
+            return values if len(values) > 1 else values[0]
+
         # --- DATA PULLING ---
         # 1. Core Biometrics
         try:
@@ -117,7 +201,9 @@ def main():
                 pass
 
         # VO2 Max - try fitness stats
-        if vo2_max is None:
+        if vo2_max is None and not due("max_metrics"):
+            vo2_max = reuse("max_metrics")
+        elif vo2_max is None:
             try:
                 if hasattr(api, 'get_max_metrics'):
                     max_metrics = api.get_max_metrics(today)
@@ -134,24 +220,29 @@ def main():
                 pass
 
         # 2. Sleep
-        try:
-            sleep_data = api.get_sleep_data(today)
-            sleep_total = get_safe(sleep_data, 'dailySleepDTO', 'sleepTimeSeconds')
-            sleep_deep = get_safe(sleep_data, 'dailySleepDTO', 'deepSleepSeconds')
-            sleep_rem = get_safe(sleep_data, 'dailySleepDTO', 'remSleepSeconds')
-            sleep_score = get_safe(sleep_data, 'dailySleepDTO', 'sleepScores', 'overall', 'value')
+        if not due("sleep"):
+            sleep_total, sleep_deep, sleep_rem, sleep_score = reuse("sleep")
+        else:
+            try:
+                sleep_data = api.get_sleep_data(today)
+                sleep_total = get_safe(sleep_data, 'dailySleepDTO', 'sleepTimeSeconds')
+                sleep_deep = get_safe(sleep_data, 'dailySleepDTO', 'deepSleepSeconds')
+                sleep_rem = get_safe(sleep_data, 'dailySleepDTO', 'remSleepSeconds')
+                sleep_score = get_safe(sleep_data, 'dailySleepDTO', 'sleepScores', 'overall', 'value')
             
-            if sleep_total: sleep_total = round(sleep_total / 3600, 2)
-            if sleep_deep: sleep_deep = round(sleep_deep / 3600, 2)
-            if sleep_rem: sleep_rem = round(sleep_rem / 3600, 2)
-        except:
-            sleep_total, sleep_deep, sleep_rem, sleep_score = None, None, None, None
+                if sleep_total: sleep_total = round(sleep_total / 3600, 2)
+                if sleep_deep: sleep_deep = round(sleep_deep / 3600, 2)
+                if sleep_rem: sleep_rem = round(sleep_rem / 3600, 2)
+            except:
+                sleep_total, sleep_deep, sleep_rem, sleep_score = None, None, None, None
 
         # 3. Training Status
         training_status = None
         t_status = None
         try:
-            if hasattr(api, 'get_training_status'):
+            if not due("training_status"):
+                training_status = reuse("training_status")
+            elif hasattr(api, 'get_training_status'):
                 t_status = api.get_training_status(today)
                 # Try multiple paths for training status
                 training_status = get_safe(t_status, 'mostRecentTerminatedTrainingStatus', 'status')
@@ -172,69 +263,78 @@ def main():
 
         # 4. Body Comp
         weight, muscle_mass, fat_pct, water_pct = None, None, None, None
-        try:
-            body_comp = api.get_body_composition(today)
-            if body_comp and 'totalAverage' in body_comp:
-                avg = body_comp['totalAverage']
-                w_g = avg.get('weight')
-                if w_g: weight = round(w_g / 453.592, 1)
-                m_g = avg.get('muscleMass')
-                if m_g: muscle_mass = round(m_g / 453.592, 1)
-                fat_pct = avg.get('bodyFat')
-                water_pct = avg.get('bodyWater')
-        except:
-            pass
+        if not due("body_composition"):
+            weight, muscle_mass, fat_pct, water_pct = reuse("body_composition")
+        else:
+            try:
+                body_comp = api.get_body_composition(today)
+                if body_comp and 'totalAverage' in body_comp:
+                    avg = body_comp['totalAverage']
+                    w_g = avg.get('weight')
+                    if w_g: weight = round(w_g / 453.592, 1)
+                    m_g = avg.get('muscleMass')
+                    if m_g: muscle_mass = round(m_g / 453.592, 1)
+                    fat_pct = avg.get('bodyFat')
+                    water_pct = avg.get('bodyWater')
+            except:
+                pass
 
         # 5. HRV
         hrv_status, hrv_avg = None, None
-        try:
-            if hasattr(api, 'get_hrv_data'):
-                h = api.get_hrv_data(today)
-            else:
-                h = api.connectapi(f"/hrv-service/hrv/daily/{today}")
-
-            hrv_status = get_safe(h, 'hrvSummary', 'status')
-
-            # Try multiple HRV value sources in order of preference
-            hrv_avg = get_safe(h, 'hrvSummary', 'weeklyAverage')
-            if hrv_avg is None:
-                hrv_avg = get_safe(h, 'hrvSummary', 'lastNightAvg')
-            if hrv_avg is None:
-                hrv_avg = get_safe(h, 'lastNightAvg')
-            if hrv_avg is None:
-                # Try to get from HRV values array
-                hrv_values = get_safe(h, 'hrvValues')
-                if hrv_values and len(hrv_values) > 0:
-                    # Get the most recent HRV reading
-                    hrv_avg = get_safe(hrv_values[-1], 'hrvValue')
-            if hrv_avg is None:
-                hrv_avg = get_safe(h, 'hrvValue')
-        except Exception as e:
-            print(f"HRV fetch error: {e}")
+        if not due("hrv"):
+            hrv_status, hrv_avg = reuse("hrv")
+        else:
+            try:
+                if hasattr(api, 'get_hrv_data'):
+                    h = api.get_hrv_data(today)
+                else:
+                    h = api.connectapi(f"/hrv-service/hrv/daily/{today}")
+
+                hrv_status = get_safe(h, 'hrvSummary', 'status')
+
+                # Try multiple HRV value sources in order of preference
+                hrv_avg = get_safe(h, 'hrvSummary', 'weeklyAverage')
+                if hrv_avg is None:
+                    hrv_avg = get_safe(h, 'hrvSummary', 'lastNightAvg')
+                if hrv_avg is None:
+                    hrv_avg = get_safe(h, 'lastNightAvg')
+                if hrv_avg is None:
+                    # Try to get from HRV values array
+                    hrv_values = get_safe(h, 'hrvValues')
+                    if hrv_values and len(hrv_values) > 0:
+                        # Get the most recent HRV reading
+                        hrv_avg = get_safe(hrv_values[-1], 'hrvValue')
+                if hrv_avg is None:
+                    hrv_avg = get_safe(h, 'hrvValue')
+            except Exception as e:
+                print(f"HRV fetch error: {e}")
 
         # 6. Blood Pressure
         bp_systolic, bp_diastolic = None, None
-        try:
-            if hasattr(api, 'get_blood_pressure'):
-                bp_data = api.get_blood_pressure(today)
-            else:
-                bp_data = api.connectapi(f"/bloodpressure/{today}")
-
-            if bp_data:
-                summaries = get_safe(bp_data, 'measurementSummaries')
-                if summaries and len(summaries) > 0:
-                    # Try to get from measurements array first (most accurate)
-                    measurements = get_safe(summaries[0], 'measurements')
-                    if measurements and len(measurements) > 0:
-                        bp_systolic = get_safe(measurements[0], 'systolic')
-                        bp_diastolic = get_safe(measurements[0], 'diastolic')
-
-                    # Fallback to summary high values
-                    if bp_systolic is None:
-                        bp_systolic = get_safe(summaries[0], 'highSystolic')
-                        bp_diastolic = get_safe(summaries[0], 'highDiastolic')
-        except Exception as e:
-            print(f"Blood pressure fetch error: {e}")
+        if not due("blood_pressure"):
+            bp_systolic, bp_diastolic = reuse("blood_pressure")
+        else:
+            try:
+                if hasattr(api, 'get_blood_pressure'):
+                    bp_data = api.get_blood_pressure(today)
+                else:
+                    bp_data = api.connectapi(f"/bloodpressure/{today}")
+
+                if bp_data:
+                    summaries = get_safe(bp_data, 'measurementSummaries')
+                    if summaries and len(summaries) > 0:
+                        # Try to get from measurements array first (most accurate)
+                        measurements = get_safe(summaries[0], 'measurements')
+                        if measurements and len(measurements) > 0:
+                            bp_systolic = get_safe(measurements[0], 'systolic')
+                            bp_diastolic = get_safe(measurements[0], 'diastolic')
+
+                        # Fallback to summary high values
+                        if bp_systolic is None:
+                            bp_systolic = get_safe(summaries[0], 'highSystolic')
+                            bp_diastolic = get_safe(summaries[0], 'highDiastolic')
+            except Exception as e:
+                print(f"Blood pressure fetch error: {e}")
 
         # 7. Activities
         activity_str = ""
@@ -258,70 +358,23 @@ def main():
             activity_str
         ]
 
-        headers = [
-            "Date",
-            "Weight (lbs)", "Muscle Mass (lbs)", "Body Fat %", "Water %",
-            "Sleep Total (hr)", "Sleep Deep (hr)", "Sleep REM (hr)", "Sleep Score",
-            "RHR", "Min HR", "Max HR", "Avg Stress", "Respiration", "SpO2",
-            "VO2 Max", "Training Status", "HRV Status", "HRV Avg",
-            "BP Systolic", "BP Diastolic",
-            "Steps", "Step Goal", "Cals Total", "Cals Active",
-            "Activities"
-        ]
+        headers = GARMIN_STATS.headers
 
         # --- SMART SAVE ---
-        rows = []
-        folder_path = os.path.dirname(CSV_FILE)
-        if folder_path and not os.path.exists(folder_path):
-            os.makedirs(folder_path)
-
-        file_exists = os.path.isfile(CSV_FILE)
-        read_failed = False
-
-        def normalize_date(date_str):
-            """Normalize date string to ISO format for comparison"""
-            if not date_str:
-                return None
-            try:
-                # Try ISO format first (YYYY-MM-DD)
-                if '-' in date_str and len(date_str) == 10:
-                    return date_str
-                # Try US format (M/D/YYYY or MM/DD/YYYY)
-                if '/' in date_str:
-                    parts = date_str.split('/')
-                    if len(parts) == 3:
-                        month, day, year = parts
-                        return f"{year}-{int(month):02d}-{int(day):02d}"
-                return date_str
-            except:
-                return date_str
-
-        if file_exists:
-            try:
-                with open(CSV_FILE, mode='r', newline='') as f:
-                    reader = csv.reader(f)
-                    all_data = list(reader)
-                    if all_data:
-                        # Filter out rows for today's date (handles both formats)
-                        rows = [row for row in all_data[1:] if row and normalize_date(row[0]) != today]
-            except Exception as e:
-                print(f"CRITICAL: Failed to read existing CSV: {e}")
-                print("Aborting to prevent data loss. Please check the file.")
-                read_failed = True
-
-        if read_failed:
+        # Replace today's row in place; older rows are copied through untouched
+        try:
+            migrate_dataset(CSV_FILE, GARMIN_STATS)  # One-time header alignment
+            upsert_daily_row(CSV_FILE, headers, new_row)
+        except Exception as e:
+            print(f"CRITICAL: Failed to update CSV: {e}")
+            print("Aborting to prevent data loss. Please check the file.")
             return
 
-        rows.append(new_row)
-        # Sort by normalized date (newest first)
-        rows.sort(key=lambda x: normalize_date(x[0]) if x else '', reverse=True)
-
-        with open(CSV_FILE, mode='w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(headers)
-            writer.writerows(rows)
-            
         print(f"SUCCESS! Saved data for {today} to {CSV_FILE}")
+        record_fetched(state, fetched, dict(zip(headers, new_row)))
+        save_refresh_state(state)
+        if skipped:
+            print(f"Skipped {len(skipped)} unchanged endpoint(s): {', '.join(skipped)}")
 
     except Exception as e:
         print(f"Global Error: {e}")
@@ -1,8 +1,29 @@
-import requests
-import csv
+"""
+Daily Hevy Workout Sync
+
+Default (incremental) mode reads Hevy's workout change events since the last
+sync and applies inserts, updates and deletes to hevy_stats.csv. Every row
+carries its Hevy workout ID, so an event replaces or removes exactly that
+workout's sets (two same-titled workouts on one day stay separate). The sync
+state (high-water mark) lives in .hevy_sync_state.json next to the CSV.
+
+The first run bootstraps from the beginning of the event log, which lists every
+workout that still exists: rows without a workout ID (from imports before the
+ID column) are replaced by the replayed workouts, and rows of workouts deleted
+since are dropped.
+
+Usage:
+  python daily_hevy_workouts.py            # Incremental sync via workout events
+  python daily_hevy_workouts.py --recent   # Legacy mode: add new sets from the last 2 days
+"""
+
+import json
 import os
 from datetime import datetime, timedelta
 from dotenv import load_dotenv  # <--- New Import
+from hevy_client import HevyClient, HevyAPIError
+from csv_store import dataset_lock, read_rows as read_dataset_rows, write_dataset
+from schemas import HEVY_STATS, migrate_dataset
 
 import os
 import sys
@@ -51,134 +72,261 @@ else:
     # Fallback if someone forgets to set the .env
     print("WARNING: SAVE_PATH not found in .env. Using current directory.")
     CSV_FILE = "hevy_stats.csv"
+
+SYNC_STATE_FILE = os.path.join(os.path.dirname(CSV_FILE), ".hevy_sync_state.json")
+EPOCH = "1970-01-01T00:00:00Z"
+STATE_VERSION = 2  # 2: rows carry workout IDs (older state is replayed once to add them)
+HEADERS = HEVY_STATS.headers
+ID_POSITION = HEADERS.index("Workout ID")
+RECENT_MODE = "--recent" in sys.argv[1:]
 # -------------------------------------
 
+def workout_key(workout):
+    """Return the (Date, Workout) pair a Hevy workout is stored under, or None."""
+    w_date_str = workout.get('start_time')
+    if not w_date_str:
+        return None
+
+    # Convert UTC to local time before extracting the date
+    w_dt = datetime.fromisoformat(w_date_str).astimezone().replace(tzinfo=None)
+    return w_dt.strftime("%Y-%m-%d"), workout.get('title', 'Unknown Workout')
+
+
+def workout_to_rows(workout):
+    """Flatten a Hevy workout into hevy_stats.csv rows (one per set)."""
+    key = workout_key(workout)
+    if not key:
+        return []
+    w_date_clean, w_title = key
+
+    rows = []
+    for exercise in workout.get('exercises', []):
+        ex_name = exercise.get('title', 'Unknown')
+
+        for i, s in enumerate(exercise.get('sets', [])):
+            weight_kg = s.get('weight_kg', 0)
+            weight_lbs = round(weight_kg * 2.20462, 1) if weight_kg else 0
+            reps = s.get('reps', 0)
+
+            rows.append([
+                w_date_clean,
+                w_title,
+                ex_name,
+                str(i + 1),
+                weight_lbs,
+                reps,
+                s.get('rpe', ''),
+                s.get('type', 'normal'),
+                workout.get('id', '')
+            ])
+    return rows
+
+
+def row_workout_id(row):
+    return row[ID_POSITION] if len(row) > ID_POSITION else ''
+
+
+def read_rows():
+    """Read every data row of the dataset (header skipped)."""
+    migrate_dataset(CSV_FILE, HEVY_STATS)  # Legacy headers/dates (one-time)
+    return list(read_dataset_rows(CSV_FILE, encoding='utf-8'))
+
+
+def write_rows(rows):
+    """Rewrite the dataset sorted newest to oldest (atomic replace, changed partitions only)."""
+    rows.sort(key=lambda x: x[0] if x else '', reverse=True)
+    write_dataset(CSV_FILE, HEADERS, rows, encoding='utf-8')
+
+
+def load_sync_state():
+    """Load the high-water mark (fresh state on first run)."""
+    if os.path.isfile(SYNC_STATE_FILE):
+        try:
+            with open(SYNC_STATE_FILE, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("version") == STATE_VERSION:
+                state.setdefault("since", EPOCH)
+                return state
+            print("Sync state predates workout IDs in the CSV. Replaying the event log once to add them.")
+        except Exception as e:
+            print(f"Warning: Could not read sync state ({e}). Bootstrapping from scratch.")
+    return {"version": STATE_VERSION, "since": EPOCH}
+
+
+def save_sync_state(state):
+    with open(SYNC_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+
+
+def parse_timestamp(stamp):
+    return datetime.fromisoformat(stamp.replace('Z', '+00:00'))
+
+
+def fetch_events(client, since):
+    """
+    Fetch all workout events since the high-water mark.
+
+    Hevy returns events newest first, so only the first event seen per workout
+    is kept (it is that workout's latest state). Returns (events, new_since).
+    """
+    latest = {}
+    new_since = since
+    for _, events, _ in client.iter_pages("/workouts/events", "events", params={"since": since}, prefetch=True):
+        for event in events:
+            if event.get('type') == 'deleted':
+                workout_id = event.get('id')
+                stamp = event.get('deleted_at')
+            else:
+                workout = event.get('workout') or {}
+                workout_id = workout.get('id')
+                stamp = workout.get('updated_at')
+
+            if not workout_id:
+                continue
+            latest.setdefault(workout_id, event)
+            if stamp and parse_timestamp(stamp) > parse_timestamp(new_since):
+                new_since = stamp
+    return latest, new_since
+
+
+def sync_incremental(client):
+    """Apply Hevy workout events since the last sync to the CSV."""
+    state = load_sync_state()
+    since = state["since"]
+    bootstrap = since == EPOCH
+
+    if bootstrap:
+        print("No sync state found. Bootstrapping from the full workout event log...")
+    else:
+        print(f"Checking Hevy for workout changes since {since}...")
+
+    events, new_since = fetch_events(client, since)
+    if not events:
+        print("No workout changes found.")
+        return
+
+    # Every event's workout loses its current rows; updated ones get the new rows.
+    # Rows without an ID can only be matched by (Date, Workout).
+    drop_ids = set(events)
+    legacy_keys = set()
+    new_rows = []
+    upserted = 0
+    deleted_ids = set()
+
+    for workout_id, event in events.items():
+        if event.get('type') == 'deleted':
+            deleted_ids.add(workout_id)
+            continue
+
+        workout = event['workout']
+        key = workout_key(workout)
+        if not key:
+            continue
+        legacy_keys.add(key)
+        new_rows.extend(workout_to_rows(workout))
+        upserted += 1
+
+    with dataset_lock(CSV_FILE):
+        existing_rows = read_rows()
+        existing_ids = {row_workout_id(row) for row in existing_rows}
+        kept_rows = []
+        for row in existing_rows:
+            workout_id = row_workout_id(row)
+            if workout_id:
+                if workout_id in drop_ids:
+                    continue
+            elif bootstrap or (row[0], row[1] if len(row) > 1 else '') in legacy_keys:
+                continue  # Replaced by the replayed workout (or its workout no longer exists)
+            kept_rows.append(row)
+        removed = len(existing_rows) - len(kept_rows)
+
+        write_rows(kept_rows + new_rows)
+
+        state["since"] = new_since
+        save_sync_state(state)
+
+    deleted = len(deleted_ids & existing_ids)
+    print(f"SUCCESS: {upserted} workouts inserted/updated, {deleted} deleted "
+          f"({len(new_rows)} sets written, {removed} old sets removed). [Sorted newest to oldest]")
+    if len(deleted_ids) > deleted and not bootstrap:
+        print(f"   Note: {len(deleted_ids) - deleted} deleted workouts were not in the CSV (nothing to remove).")
+    print(f"   High-water mark: {new_since}")
+
+
+def sync_recent(client):
+    """Legacy mode: add sets from workouts in the last 2 days that are not in the CSV yet."""
+    existing_sets = set()
+    for row in read_rows():
+        if len(row) > 3:
+            # Signature: Date_Workout_Exercise_Set
+            existing_sets.add(f"{row[0]}_{row[1]}_{row[2]}_{row[3]}")
+
+    cutoff_date = datetime.now() - timedelta(days=2)
+    print(f"Checking Hevy for workouts since {cutoff_date.date()}...")
+
+    response = client.get("/workouts", params={"page": 1, "pageSize": 10})
+    if response.status_code != 200:
+        print(f"Error: {response.status_code} - {response.text}")
+        return
+
+    workouts = response.json().get('workouts', [])
+    if not workouts:
+        print("No workouts found.")
+        return
+
+    new_rows = []
+    skipped_count = 0
+
+    for workout in workouts:
+        w_date_str = workout.get('start_time')
+        if not w_date_str: continue
+
+        w_dt = datetime.fromisoformat(w_date_str).astimezone().replace(tzinfo=None)
+        if w_dt < cutoff_date:
+            continue
+
+        for row in workout_to_rows(workout):
+            if f"{row[0]}_{row[1]}_{row[2]}_{row[3]}" in existing_sets:
+                skipped_count += 1
+                continue
+            new_rows.append(row)
+
+    if new_rows:
+        with dataset_lock(CSV_FILE):
+            write_rows(read_rows() + new_rows)
+        print(f"SUCCESS: Added {len(new_rows)} new sets. (Skipped {skipped_count} duplicates) [Sorted newest to oldest]")
+    else:
+        print(f"No *new* sets found. (Skipped {skipped_count} duplicates)")
+
+
 def main():
     # Safety Check: Did the user actually set the key?
     if not API_KEY:
         print("CRITICAL ERROR: 'HEVY_API_KEY' not found. Please create a .env file.")
         return
 
-    headers = {
-        "api-key": API_KEY,
-        "Accept": "application/json"
-    }
-    
-    # 1. READ EXISTING DATA (Smart Deduplication)
-    existing_sets = set()
-    
+    client = HevyClient(API_KEY)
+
     # Check if directory exists first
     folder = os.path.dirname(CSV_FILE)
-    if not os.path.exists(folder):
+    if folder and not os.path.exists(folder):
         try:
             os.makedirs(folder)
             print(f"Created directory: {folder}")
         except OSError:
             pass # Drive might not be mounted yet
 
-    if os.path.isfile(CSV_FILE):
-        try:
-            with open(CSV_FILE, mode='r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                next(reader, None) # Skip header
-                for row in reader:
-                    if len(row) > 3:
-                        # Signature: Date_Workout_Exercise_Set
-                        signature = f"{row[0]}_{row[1]}_{row[2]}_{row[3]}"
-                        existing_sets.add(signature)
-        except Exception as e:
-            print(f"Warning reading file: {e}")
-
-    # 2. FETCH RECENT WORKOUTS
-    cutoff_date = datetime.now() - timedelta(days=2)
-    print(f"Checking Hevy for workouts since {cutoff_date.date()}...")
-    
-    url = "https://api.hevyapp.com/v1/workouts"
-    params = {"page": 1, "pageSize": 10}
-    
     try:
-        response = requests.get(url, headers=headers, params=params)
-        
-        if response.status_code != 200:
-            print(f"Error: {response.status_code} - {response.text}")
-            return
-
-        data = response.json()
-        workouts = data.get('workouts', [])
-        
-        if not workouts:
-            print("No workouts found.")
-            return
-
-        new_rows = []
-        skipped_count = 0
-        
-        for workout in workouts:
-            w_date_str = workout.get('start_time')
-            if not w_date_str: continue
-
-            # Convert UTC to local time before extracting the date
-            w_dt = datetime.fromisoformat(w_date_str).astimezone().replace(tzinfo=None)
-            
-            if w_dt < cutoff_date:
-                continue
-            
-            w_date_clean = w_dt.strftime("%Y-%m-%d")
-            w_title = workout.get('title', 'Unknown Workout')
-
-            for exercise in workout.get('exercises', []):
-                ex_name = exercise.get('title', 'Unknown')
-                
-                for i, s in enumerate(exercise.get('sets', [])):
-                    set_num = str(i + 1)
-
-                    signature = f"{w_date_clean}_{w_title}_{ex_name}_{set_num}"
-
-                    if signature in existing_sets:
-                        skipped_count += 1
-                        continue
-
-                    weight_kg = s.get('weight_kg', 0)
-                    weight_lbs = round(weight_kg * 2.20462, 1) if weight_kg else 0
-                    reps = s.get('reps', 0)
-
-                    row = [
-                        w_date_clean,
-                        w_title,
-                        ex_name,
-                        set_num,
-                        weight_lbs,
-                        reps,
-                        s.get('rpe', ''),
-                        s.get('type', 'normal')
-                    ]
-                    new_rows.append(row)
-
-        # 3. SAVE WITH SORTING (newest to oldest)
-        if new_rows:
-            # Read existing rows
-            existing_rows = []
-            if os.path.isfile(CSV_FILE):
-                with open(CSV_FILE, mode='r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    next(reader, None)  # Skip header
-                    existing_rows = list(reader)
-
-            # Combine and sort by date descending (newest first)
-            all_rows = existing_rows + new_rows
-            all_rows.sort(key=lambda x: x[0] if x else '', reverse=True)
-
-            # Rewrite entire file
-            with open(CSV_FILE, mode='w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(["Date", "Workout", "Exercise", "Set", "Weight (lbs)", "Reps", "RPE", "Type"])
-                writer.writerows(all_rows)
-            print(f"SUCCESS: Added {len(new_rows)} new sets. (Skipped {skipped_count} duplicates) [Sorted newest to oldest]")
+        if RECENT_MODE:
+            sync_recent(client)
         else:
-            print(f"No *new* sets found. (Skipped {skipped_count} duplicates)")
-
+            sync_incremental(client)
+    except HevyAPIError as e:
+        print(f"Error: {e.status_code} - {e.message}")
     except Exception as e:
         print(f"Error: {e}")
 
+    print(client.metrics_summary())
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,182 @@
+"""
+Dashboard Frame Helpers
+
+The pandas side of the dashboard's data loading, kept free of Streamlit so the
+benchmarks and tests run the same code the dashboard does:
+
+  read_dataset()           typed CSV read (flat file or month partitions)
+  load_hevy_frame()        hevy_stats as the dashboard loader holds it
+  load_activities_frame()  garmin_activities, likewise
+  with_date_index()        sort + index by Date, done once per load
+  date_slice()             a period of a loaded frame as a view (no masks, no copies)
+  add_activity_metrics()   derived cardio columns, computed at load
+  sport_view()             one sport's rows without the columns it never records
+  period_view()            a section's selected period + metric card KPIs, per rerun
+  cardio_view()            the same for activities, after the sport filter
+
+Loaded frames are shared by every session and rerun (st.cache_resource), so a
+rerun only slices and aggregates them; RERUN_ALLOC_BUDGET_MB is the most one
+rerun's period_view()/cardio_view() calls may allocate for a 90-day range (see tests/).
+"""
+
+import numpy as np
+import pandas as pd
+
+from csv_store import dataset_files, is_clean
+from kpi_engine import KPI, compute_kpis
+from schemas import GARMIN_ACTIVITIES, HEVY_STATS, parse_dates
+
+RERUN_ALLOC_BUDGET_MB = 2.0  # Max traced peak for one rerun's frame work (90-day range)
+HEVY_COLUMNS = [c for c in HEVY_STATS.headers if c != "Workout ID"]  # IDs are only for the sync
+
+# --- METRIC CARD KPIS ---
+HEVY_KPIS = [
+    KPI("workouts", ("Date", "Workout"), "distinct"),
+    KPI("volume", "Volume", "sum"),
+    KPI("sets"),
+    KPI("exercises", "Exercise", "nunique"),
+]
+
+CARDIO_KPIS = [
+    KPI("activities"),
+    KPI("distance_km", "distance_km", "sum"),
+    KPI("avg_distance_km", ("distance_km", "activities"), "ratio"),
+    KPI("avg_hr", "averageHR", "mean"),
+    KPI("avg_duration_min", "duration", "mean", scale=1 / 60),
+    KPI("avg_power", "avgPower", "mean"),
+    KPI("max_power", "maxPower", "max"),
+    KPI("avg_norm_power", "normPower", "mean"),
+]
+
+RECOVERY_KPIS = [
+    KPI("sleep", "Sleep Score", "mean"),
+    KPI("hrv", "HRV Avg", "mean"),
+    KPI("rhr", "RHR", "mean"),
+    KPI("steps", "Steps", "mean"),
+]
+
+
+def coerce_numeric(values, dtype):
+    """Parse a text column as `dtype`, blanking values that aren't numbers (or whole numbers, for ints)."""
+    values = pd.to_numeric(values, errors='coerce')
+    if dtype.lower().startswith('int'):
+        values = values.where(values % 1 == 0)
+        if values.isna().any():
+            dtype = 'I' + dtype[1:]  # Nullable equivalent (int16 -> Int16)
+    return values.astype(dtype)
+
+
+def read_csv_file(file_path, schema, columns=None):
+    """
+    Read one CSV with the schema's dtypes. A stray non-numeric cell (e.g. '--'
+    from a daily writer) fails the typed read, so the numeric columns are then
+    read as text and coerced instead of losing the whole dataset.
+    """
+    kwargs = schema.read_csv_kwargs(columns)
+    try:
+        return pd.read_csv(file_path, **kwargs)
+    except ValueError:
+        numeric = {name: dtype for name, dtype in kwargs['dtype'].items() if dtype not in ('str', 'category')}
+        df = pd.read_csv(file_path, **dict(kwargs, dtype={**kwargs['dtype'], **dict.fromkeys(numeric, 'str')}))
+        for name, dtype in numeric.items():
+            if name in df.columns:
+                df[name] = coerce_numeric(df[name], dtype)
+        return df
+
+
+def read_dataset(path, schema, since=None, columns=None):
+    """Read a dataset (flat file or month partitions; partitions before `since` are skipped)."""
+    frames = [read_csv_file(f, schema, columns) for f in dataset_files(path, since=since)]
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_hevy_frame(path, since=None):
+    """hevy_stats read, with Volume and Week added and indexed by date (the dashboard adds muscle groups)."""
+    df = read_dataset(path, HEVY_STATS, since, columns=HEVY_COLUMNS)
+    df['Date'] = parse_dates(df['Date'])  # ISO fast path (see schemas.py)
+    df['Volume'] = df['Weight (lbs)'].fillna(0) * df['Reps'].fillna(0)
+    df['Week'] = df['Date'].dt.to_period('W').dt.start_time
+    if is_clean(path):
+        # Compacted (compact_datasets.py): newest first, so reversed it needs no sort
+        return with_date_index(df.iloc[::-1], presorted=True)
+    return with_date_index(df)
+
+
+def load_activities_frame(path):
+    """garmin_activities read, with the derived cardio columns and indexed by (Date, Time)."""
+    df = read_dataset(path, GARMIN_ACTIVITIES)
+    df['Date'] = parse_dates(df['Date'])  # ISO fast path (see schemas.py)
+    add_activity_metrics(df)
+    if is_clean(path):
+        # Compacted: newest first by (Date, Time), so reversed it needs no sort
+        return with_date_index(df.iloc[::-1], presorted=True)
+    return with_date_index(df, order=('Date', 'Time') if 'Time' in df.columns else ('Date',))
+
+
+def previous_period(start, end):
+    """(start, end) of the comparison period: the same number of days just before `start`."""
+    period_days = (end - start).days + 1
+    return start - pd.Timedelta(days=period_days), start - pd.Timedelta(seconds=1)
+
+
+def with_date_index(df, order=('Date',), presorted=False):
+    """
+    Sort by date (stable, so same-day rows keep their order) and index by it.
+    The Date column stays for charts and groupbys; the index is unnamed so
+    'Date' is never ambiguous between column and index level. presorted=True
+    skips the sort for rows already oldest first (a compacted file, reversed).
+    """
+    df = df[df['Date'].notna()]
+    if not presorted:
+        df = df.sort_values(list(order), kind='stable')
+    df = df.set_index('Date', drop=False)
+    df.index.name = None
+    return df
+
+
+def date_slice(df, start, end):
+    """Rows with start <= Date <= end: two binary searches on the sorted index, returned as a view."""
+    lo = df.index.searchsorted(start, side='left')
+    hi = df.index.searchsorted(end, side='right')
+    return df.iloc[lo:hi]
+
+
+def add_activity_metrics(df):
+    """
+    Derived cardio columns, computed once per load so charts and KPIs never
+    add columns to the shared frame: distance_km (recorded distance, else
+    speed x duration), speed_kmh and pace_min_km (NaN without a speed).
+    """
+    speed = df['averageSpeed'] if 'averageSpeed' in df.columns else pd.Series(np.nan, index=df.index)
+    duration = df['duration'] if 'duration' in df.columns else pd.Series(np.nan, index=df.index)
+    estimated_km = speed * duration / 1000
+    df['distance_km'] = df['distance'] / 1000 if 'distance' in df.columns else estimated_km
+    df['distance_km'] = df['distance_km'].fillna(estimated_km)
+    df['speed_kmh'] = speed * 3.6  # m/s to km/h
+    df['pace_min_km'] = (1000 / (speed * 60)).where(speed > 0)
+
+
+def sport_view(df, sport, empty_columns):
+    """Rows of one sport, without the sport-specific columns that sport never records."""
+    if sport == 'All' or 'sportType' not in df.columns:
+        return df
+    dropped = set(empty_columns.get(sport, ()))
+    keep = [c for c in df.columns if c not in dropped]
+    return df.loc[(df['sportType'] == sport).to_numpy(), keep]
+
+
+# --- RERUN VIEWS ---
+def period_view(df, kpis, current, previous):
+    """(selected period view, {name: KPIValue} current vs previous) for one section's rerun."""
+    return date_slice(df, *current), compute_kpis(df, kpis, current, previous)
+
+
+def cardio_view(df, kpis, current, previous, sport, empty_columns):
+    """
+    period_view() for the Cardio section: the previous + selected periods are
+    sliced as one date-index view first, so the sport filter runs once for both.
+    """
+    comparison = sport_view(date_slice(df, previous[0], current[1]), sport, empty_columns)
+    return date_slice(comparison, *current), compute_kpis(comparison, kpis, current, previous)
@@ -3,13 +3,21 @@ import sys
 import time
 import subprocess
 import json
+import threading
 import requests
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from hevy_client import HevyClient, HevyAPIError
+from dashboard_frames import (CARDIO_KPIS, HEVY_KPIS, RECOVERY_KPIS, cardio_view, load_activities_frame,
+                              load_hevy_frame, period_view, previous_period, read_dataset, with_date_index)
+from csv_store import dataset_files, dataset_signature, is_clean, partitioned
+from schemas import GARMIN_ACTIVITIES, GARMIN_STATS, parse_dates
 
 # --- CONFIGURATION ---
 load_dotenv()
@@ -36,6 +44,20 @@ GARMIN_STATS_FILE = os.path.join(SAVE_PATH, "garmin_stats.csv")
 GARMIN_ACTIVITIES_FILE = os.path.join(SAVE_PATH, "garmin_activities.csv")
 HEVY_EXERCISES_FILE = os.path.join(SAVE_PATH, "HEVY APP exercises.csv")
 
+# Max points drawn per chart trace (longer ranges are downsampled with LTTB)
+CHART_POINT_BUDGET = int(os.getenv("CHART_POINT_BUDGET", "500"))
+
+# Memory cap for cached Plotly figures (shared by all sessions)
+FIGURE_CACHE_MB = int(os.getenv("FIGURE_CACHE_MB", "64"))
+
+KM_TO_MILES = 0.621371
+
+# Loaded datasets are shared by every session (st.cache_resource), so nothing may
+# modify them in place. Copy-on-Write makes slices and derived frames independent
+# copies-when-written; it is always on from pandas 3.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # Tracked Files & Commands (using environment-based paths)
 TRACKED_FILES = {
     "Garmin Health": {
@@ -163,71 +185,657 @@ def is_cardio_exercise(exercise_name):
 
 
 # --- DATA LOADING FUNCTIONS ---
-@st.cache_data(ttl=300)
-def load_hevy_data():
-    """Load and prepare hevy workout data"""
-    if not os.path.exists(HEVY_STATS_FILE):
+# Loaders are cached with st.cache_resource: one read-only frame per (version, since)
+# shared by every session and rerun, instead of st.cache_data's per-call unpickled copy.
+# Callers only slice/aggregate them; derived columns go through .assign() on a slice.
+DATASET_CACHE_ENTRIES = 4  # Per loader: current + previous file version, a couple of partition months
+
+
+def dataset_since(day):
+    """
+    Loader `since` key for a date range starting at `day`: its partition month when
+    datasets are partitioned, else None (a flat file is always read whole, so
+    the flat layout keeps exactly one frame per version).
+    """
+    return str(day)[:7] if partitioned() else None
+
+
+def frame_memory_mb(df):
+    """Memory held by a loaded frame in MB, strings and categories included."""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def process_rss_mb():
+    """Resident memory of this dashboard process in MB (None where it can't be read)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def dataset_version(path):
+    """Signature of a dataset's file(s), or None if it is missing. Changes whenever a file is rewritten."""
+    return dataset_signature(path)
+
+
+def periods():
+    """(selected, previous) period bounds for the rerun views (see dashboard_frames)."""
+    return (start_datetime, end_datetime), (prev_start_datetime, prev_end_datetime)
+
+
+@st.cache_resource(ttl=300, max_entries=DATASET_CACHE_ENTRIES)
+def load_hevy_data(version=None, since=None):
+    """Load and prepare hevy workout data (version busts the cache when the file changes; since skips older month partitions)"""
+    if not dataset_files(HEVY_STATS_FILE):
         return None
     try:
-        df = pd.read_csv(HEVY_STATS_FILE)
-        # Handle mixed date formats (ISO and US format)
-        df['Date'] = pd.to_datetime(df['Date'], format='mixed', dayfirst=False)
-        df['primary_muscle_group'] = df['Exercise'].apply(get_muscle_group)
-        df['is_cardio'] = df['Exercise'].apply(is_cardio_exercise)
-        df['Volume'] = df['Weight (lbs)'].fillna(0) * df['Reps'].fillna(0)
+        df = load_hevy_frame(HEVY_STATS_FILE, since)
+        # Exercise is categorical: map() calls the lookups once per distinct exercise
+        df['primary_muscle_group'] = df['Exercise'].map(get_muscle_group).astype('category')
+        df['is_cardio'] = df['Exercise'].map(is_cardio_exercise).astype(bool)
         return df
     except Exception as e:
         st.error(f"Error loading Hevy data: {e}")
         return None
 
 
-@st.cache_data(ttl=300)
-def load_garmin_data():
+@st.cache_resource(ttl=300, max_entries=DATASET_CACHE_ENTRIES)
+def load_garmin_data(version=None, since=None):
     """Load and prepare garmin health data"""
-    if not os.path.exists(GARMIN_STATS_FILE):
+    if not dataset_files(GARMIN_STATS_FILE):
         return None
     try:
-        df = pd.read_csv(GARMIN_STATS_FILE)
-        # Handle mixed date formats (ISO and US format)
-        df['Date'] = pd.to_datetime(df['Date'], format='mixed', dayfirst=False)
+        df = read_dataset(GARMIN_STATS_FILE, GARMIN_STATS, since)
+        df['Date'] = parse_dates(df['Date'])  # ISO fast path (see schemas.py)
+        if is_clean(GARMIN_STATS_FILE):
+            # Compacted (compact_datasets.py): unique dates, newest first, so reversed it needs no sort
+            return with_date_index(df.iloc[::-1], presorted=True)
         # Remove duplicate dates, keeping the last entry
         df = df.drop_duplicates(subset=['Date'], keep='last')
-        df = df.sort_values('Date').reset_index(drop=True)
-        return df
+        return with_date_index(df)
     except Exception as e:
         st.error(f"Error loading Garmin data: {e}")
         return None
 
 
 @st.cache_data(ttl=300)
-def load_garmin_activities():
+def latest_weight_lbs(version=None):
+    """Most recent recorded weight in lbs (None if there is none). Reads only Date and weight, newest file first."""
+    for file_path in dataset_files(GARMIN_STATS_FILE):
+        df = pd.read_csv(file_path, usecols=lambda c: c in ('Date', 'Weight (lbs)'), dtype=str)
+        if 'Weight (lbs)' not in df.columns:
+            continue
+        weights = pd.to_numeric(df['Weight (lbs)'], errors='coerce')
+        dates = parse_dates(df['Date'])[weights.notna()]
+        if dates.notna().any():
+            return float(weights[dates.idxmax()])
+    return None
+
+
+@st.cache_resource(ttl=300, max_entries=DATASET_CACHE_ENTRIES)
+def activity_empty_columns(version=None):
+    """{sport: sport-specific columns with no data for that sport} for the loaded activities."""
+    df = load_garmin_activities(version)
+    columns = [c for c in GARMIN_ACTIVITIES.sport_specific_columns if df is not None and c in df.columns]
+    if not columns or 'sportType' not in df.columns:
+        return {}
+    has_data = df[columns].notna().groupby(df['sportType'].to_numpy(), observed=True).any()
+    return {sport: [c for c in columns if not row[c]] for sport, row in has_data.iterrows()}
+
+
+@st.cache_resource(ttl=300, max_entries=DATASET_CACHE_ENTRIES)
+def load_garmin_activities(version=None):
     """Load garmin activities data (running, cycling, swimming, etc.)"""
-    if not os.path.exists(GARMIN_ACTIVITIES_FILE):
+    if not dataset_files(GARMIN_ACTIVITIES_FILE):
         return None
     try:
-        df = pd.read_csv(GARMIN_ACTIVITIES_FILE)
-        # Handle mixed date formats (ISO and US format)
-        df['Date'] = pd.to_datetime(df['Date'], format='mixed', dayfirst=False)
-        return df
+        return load_activities_frame(GARMIN_ACTIVITIES_FILE)
     except Exception as e:
         st.error(f"Error loading Garmin activities data: {e}")
         return None
 
 
+# --- CHART DOWNSAMPLING ---
+def lttb_indices(x, y, budget):
+    """
+    Largest-Triangle-Three-Buckets: pick `budget` row positions that keep the
+    visual shape of the (x, y) series. x must be sorted ascending.
+    """
+    n = len(x)
+    if budget >= n or budget < 3:
+        return np.arange(n)
+
+    bucket_size = (n - 2) / (budget - 2)
+    indices = np.empty(budget, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0  # Previously selected point
+
+    for i in range(budget - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # Average of the next bucket (the last point for the final bucket)
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+
+        # Keep the point forming the largest triangle with a and the next bucket's average
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+
+    return indices
+
+
+def downsample(df, x_col, y_col, budget):
+    """
+    Reduce a chart frame to at most `budget` rows with LTTB on (x_col, y_col).
+    Frames within the budget are returned unchanged, so short ranges stay exact.
+    """
+    if not budget or len(df) <= budget:
+        return df
+
+    y = pd.to_numeric(df[y_col], errors='coerce').to_numpy(dtype=float)
+    data = df[np.isfinite(y)]
+    if not data[x_col].is_monotonic_increasing:  # Loaded frames are already date-sorted
+        data = data.sort_values(x_col, kind='stable')
+    if len(data) <= budget:
+        return data
+
+    x_values = data[x_col]
+    if pd.api.types.is_datetime64_any_dtype(x_values):
+        x = x_values.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+    else:
+        x = x_values.to_numpy(dtype=float)
+    y = data[y_col].to_numpy(dtype=float)
+
+    return data.iloc[lttb_indices(x, y, budget)]
+
+
+BAR_PERIODS = (('W', 'week'), ('M', 'month'))
+
+
+def bar_buckets(df, budget, **aggs):
+    """
+    Bars can't be thinned like lines (LTTB would silently drop whole days), so a
+    bar series with more rows than `budget` is aggregated into weekly bars, or
+    monthly ones if the weeks don't fit either. `aggs` are named aggregations
+    for df.groupby().agg(). Returns (frame, period name or None).
+    """
+    if not budget or len(df) <= budget:
+        return df, None
+    span_days = (df['Date'].max() - df['Date'].min()).days + 1
+    freq, period = BAR_PERIODS[0] if span_days / 7 <= budget else BAR_PERIODS[1]
+    buckets = df['Date'].dt.to_period(freq).dt.start_time.to_numpy()
+    return df.groupby(buckets).agg(**aggs).rename_axis('Date').reset_index(), period
+
+
+# --- FIGURE CACHE ---
+class FigureCache:
+    """
+    LRU cache of built Plotly figures, stored as their JSON, with a memory cap.
+
+    Keys are tuples of (chart name, dataset version, date range, filters...), so a
+    figure is rebuilt only when its data file changes or one of its inputs does.
+    A figure is serialized once, on the miss that builds it; its size is the
+    length of that JSON string.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> figure JSON
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, builder):
+        """Figure JSON for this key (None if the builder has nothing to plot)."""
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        fig = builder()
+        if fig is None:
+            return None
+
+        fig_json = fig.to_json()
+        with self._lock:
+            if key in self.entries:
+                self.total_bytes -= len(self.entries.pop(key))
+            if len(fig_json) <= self.max_bytes:
+                self.entries[key] = fig_json
+                self.total_bytes += len(fig_json)
+            while self.total_bytes > self.max_bytes and self.entries:
+                _, old_json = self.entries.popitem(last=False)
+                self.total_bytes -= len(old_json)
+        return fig_json
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "figures": len(self.entries),
+                "mb": self.total_bytes / (1024 * 1024),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+@st.cache_resource
+def get_figure_cache():
+    """One figure cache shared by every session of this Streamlit process."""
+    return FigureCache(FIGURE_CACHE_MB * 1024 * 1024)
+
+
+def cached_figure(key, builder):
+    """
+    Return the cached figure for this key, building (and caching) it on a miss.
+    The figure comes back as a plain dict parsed from the cached JSON, which
+    st.plotly_chart takes as-is, so a hit never rebuilds Plotly objects.
+    """
+    fig_json = get_figure_cache().get_or_build(key, builder)
+    return None if fig_json is None else json.loads(fig_json)
+
+
+# --- CHART BUILDERS ---
+def build_volume_figure(filtered_hevy, show_trend, budget):
+    """Weekly training volume line with optional EWM trend."""
+    weekly_agg = filtered_hevy.groupby('Week')['Volume'].sum().reset_index()  # Week is added at load
+
+    # Trend is computed on every week before downsampling
+    if show_trend and len(weekly_agg) >= 3:
+        # Use exponential weighted moving average for smoother trend
+        span = max(4, len(weekly_agg) // 3)
+        weekly_agg['Trend'] = weekly_agg['Volume'].ewm(span=span, adjust=False).mean()
+
+    fig_volume = go.Figure()
+
+    # Main line
+    volume_points = downsample(weekly_agg, 'Week', 'Volume', budget)
+    fig_volume.add_trace(go.Scatter(
+        x=volume_points['Week'],
+        y=volume_points['Volume'],
+        mode='lines+markers',
+        name='Weekly Volume',
+        line=dict(color='#61afef'),
+        marker=dict(color='#98c379')
+    ))
+
+    # Add trend line if enabled
+    if 'Trend' in weekly_agg.columns:
+        trend_points = downsample(weekly_agg, 'Week', 'Trend', budget)
+        fig_volume.add_trace(go.Scatter(
+            x=trend_points['Week'],
+            y=trend_points['Trend'],
+            mode='lines',
+            name='Trend',
+            line=dict(color='#e5c07b', width=3, shape='spline')
+        ))
+
+    fig_volume.update_layout(
+        title="Weekly Training Volume (Weight x Reps)",
+        xaxis_title="Week",
+        yaxis_title="Volume (lbs)",
+        template="plotly_dark",
+        height=400,
+        legend=dict(x=0.5, y=1.1, xanchor='center', orientation='h')
+    )
+    return fig_volume
+
+
+def muscle_group_volume(filtered_hevy):
+    """Strength-only volume per primary muscle group, largest first."""
+    # Filter out cardio from muscle group analysis
+    strength_only = filtered_hevy[~filtered_hevy['is_cardio']]
+    muscle_volume = strength_only.groupby('primary_muscle_group', observed=True)['Volume'].sum().reset_index()
+    return muscle_volume.sort_values('Volume', ascending=False)
+
+
+def build_muscle_pie_figure(filtered_hevy):
+    fig_muscle = px.pie(
+        muscle_group_volume(filtered_hevy),
+        values='Volume',
+        names='primary_muscle_group',
+        title="Volume per Muscle Group (lbs)",
+        hole=0.4
+    )
+    fig_muscle.update_layout(
+        template="plotly_dark",
+        height=400
+    )
+    return fig_muscle
+
+
+def build_muscle_bar_figure(filtered_hevy):
+    fig_bar = px.bar(
+        muscle_group_volume(filtered_hevy),
+        x='primary_muscle_group',
+        y='Volume',
+        title="Total Volume by Muscle Group (Strength Training Only)",
+        color='Volume',
+        color_continuous_scale='Blues'
+    )
+    fig_bar.update_layout(
+        xaxis_title="Muscle Group",
+        yaxis_title="Volume (lbs)",
+        template="plotly_dark",
+        height=350
+    )
+    return fig_bar
+
+
+def build_distance_figure(filtered_runs, use_miles, sport_filter, budget):
+    """Per-activity distance bars coloured by average HR (weekly/monthly totals over the point budget)."""
+    # Bucket the view first; the unit conversion only touches the plotted rows
+    points, period = bar_buckets(filtered_runs[['Date', 'distance_km', 'averageHR']], budget,
+                                 distance_km=('distance_km', 'sum'), averageHR=('averageHR', 'mean'))
+    points = points.assign(distance_display=points['distance_km'] * (KM_TO_MILES if use_miles else 1.0))
+    dist_unit = "mi" if use_miles else "km"
+
+    chart_title = f"{sport_filter.title()} Distance Over Time" if sport_filter != "All" else "Activity Distance Over Time"
+    if period:
+        chart_title += f" (total per {period})"
+    fig_distance = px.bar(
+        points,
+        x='Date',
+        y='distance_display',
+        title=chart_title,
+        color='averageHR',
+        color_continuous_scale='Reds'
+    )
+    fig_distance.update_layout(
+        xaxis_title="Date",
+        yaxis_title=f"Distance ({dist_unit})",
+        template="plotly_dark",
+        height=350
+    )
+    return fig_distance
+
+
+def build_zones_figure(filtered_runs):
+    """Total minutes per HR zone, or None when no zone columns exist."""
+    zone_cols = ['hrTimeInZone_1', 'hrTimeInZone_2', 'hrTimeInZone_3', 'hrTimeInZone_4']
+    available_zones = [c for c in zone_cols if c in filtered_runs.columns]
+    if not available_zones:
+        return None
+
+    zone_sums = {col: filtered_runs[col].sum() / 60 for col in available_zones}  # Convert to minutes
+    zone_labels = ['Zone 1 (Easy)', 'Zone 2 (Fat Burn)', 'Zone 3 (Cardio)', 'Zone 4 (Peak)']
+    zone_data = pd.DataFrame({
+        'Zone': zone_labels[:len(available_zones)],
+        'Minutes': list(zone_sums.values())
+    })
+
+    fig_zones = px.pie(
+        zone_data,
+        values='Minutes',
+        names='Zone',
+        title="Heart Rate Zone Distribution (Total Minutes)",
+        hole=0.4,
+        color_discrete_sequence=['#4CAF50', '#FFC107', '#FF9800', '#F44336']
+    )
+    fig_zones.update_layout(
+        template="plotly_dark",
+        height=350
+    )
+    return fig_zones
+
+
+def build_speed_figure(filtered_runs, use_miles, budget):
+    """Cycling speed trend (km/h or mph)."""
+    points = downsample(filtered_runs[['Date', 'speed_kmh']], 'Date', 'speed_kmh', budget)
+    points = points.assign(speed_display=points['speed_kmh'] * (KM_TO_MILES if use_miles else 1.0))
+    speed_unit = "mph" if use_miles else "km/h"
+
+    fig_speed = px.line(
+        points,
+        x='Date',
+        y='speed_display',
+        markers=True,
+        title="Cycling Speed Trend (higher is faster)"
+    )
+    fig_speed.update_layout(
+        xaxis_title="Date",
+        yaxis_title=f"Speed ({speed_unit})",
+        template="plotly_dark",
+        height=300
+    )
+    fig_speed.update_traces(line_color='#61afef', marker_color='#e5c07b')
+    return fig_speed
+
+
+def build_power_figure(filtered_runs, budget):
+    """Cycling average power trend."""
+    fig_power = px.line(
+        downsample(filtered_runs, 'Date', 'avgPower', budget),
+        x='Date',
+        y='avgPower',
+        markers=True,
+        title="Cycling Power Trend"
+    )
+    fig_power.update_layout(
+        xaxis_title="Date",
+        yaxis_title="Avg Power (Watts)",
+        template="plotly_dark",
+        height=300
+    )
+    fig_power.update_traces(line_color='#c678dd', marker_color='#e5c07b')
+    return fig_power
+
+
+def build_pace_figure(filtered_runs, use_miles, sport_filter, budget):
+    """Pace trend (min/km or min/mi) for running/swimming/other."""
+    points = downsample(filtered_runs[['Date', 'pace_min_km']], 'Date', 'pace_min_km', budget)
+    points = points.assign(pace_display=points['pace_min_km'] * (1.60934 if use_miles else 1.0))
+    pace_unit = "min/mi" if use_miles else "min/km"
+
+    pace_title = f"{sport_filter.title()} Pace Trend (lower is faster)" if sport_filter != "All" else "Pace Trend (lower is faster)"
+    fig_pace = px.line(
+        points,
+        x='Date',
+        y='pace_display',
+        markers=True,
+        title=pace_title
+    )
+    fig_pace.update_layout(
+        xaxis_title="Date",
+        yaxis_title=f"Pace ({pace_unit})",
+        template="plotly_dark",
+        height=300
+    )
+    fig_pace.update_traces(line_color='#e06c75', marker_color='#e5c07b')
+    return fig_pace
+
+
+def build_weight_figure(filtered_garmin, show_trend, budget):
+    """Body weight line with optional EWM trend, or None without weight data."""
+    weight_data = filtered_garmin.loc[filtered_garmin['Weight (lbs)'].notna(), ['Date', 'Weight (lbs)']]
+    if weight_data.empty:
+        return None
+    weight_data = weight_data.sort_values('Date')
+
+    # Trend is computed on every point before downsampling
+    if show_trend and len(weight_data) >= 3:
+        span = max(7, len(weight_data) // 4)
+        weight_data['Trend'] = weight_data['Weight (lbs)'].ewm(span=span, adjust=False).mean()
+
+    fig_weight = go.Figure()
+
+    # Main weight line
+    weight_points = downsample(weight_data, 'Date', 'Weight (lbs)', budget)
+    fig_weight.add_trace(go.Scatter(
+        x=weight_points['Date'],
+        y=weight_points['Weight (lbs)'],
+        mode='lines+markers',
+        name='Weight',
+        line=dict(color='#e06c75'),
+        marker=dict(color='#e5c07b')
+    ))
+
+    # Add trend line if enabled
+    if 'Trend' in weight_data.columns:
+        trend_points = downsample(weight_data, 'Date', 'Trend', budget)
+        fig_weight.add_trace(go.Scatter(
+            x=trend_points['Date'],
+            y=trend_points['Trend'],
+            mode='lines',
+            name='Trend',
+            line=dict(color='#c678dd', width=3, shape='spline')
+        ))
+
+    fig_weight.update_layout(
+        title="Body Weight Over Time",
+        xaxis_title="Date",
+        yaxis_title="Weight (lbs)",
+        template="plotly_dark",
+        height=400,
+        legend=dict(x=0.5, y=1.1, xanchor='center', orientation='h')
+    )
+    return fig_weight
+
+
+def build_recovery_figure(filtered_garmin, show_trend, budget):
+    """Sleep Score (left axis) vs HRV Avg (right axis) with optional trends."""
+    fig_recovery = go.Figure()
+
+    if 'Sleep Score' in filtered_garmin.columns:
+        sleep_data = filtered_garmin.loc[filtered_garmin['Sleep Score'].notna(), ['Date', 'Sleep Score']]
+        sleep_data = sleep_data.sort_values('Date')
+        sleep_points = downsample(sleep_data, 'Date', 'Sleep Score', budget)
+        fig_recovery.add_trace(go.Scatter(
+            x=sleep_points['Date'],
+            y=sleep_points['Sleep Score'],
+            mode='lines+markers',
+            name='Sleep Score',
+            line=dict(color='#98c379'),
+            yaxis='y'
+        ))
+
+        # Add sleep trend line
+        if show_trend and len(sleep_data) >= 3:
+            span = max(7, len(sleep_data) // 4)
+            sleep_data['Sleep_Trend'] = sleep_data['Sleep Score'].ewm(span=span, adjust=False).mean()
+            trend_points = downsample(sleep_data, 'Date', 'Sleep_Trend', budget)
+            fig_recovery.add_trace(go.Scatter(
+                x=trend_points['Date'],
+                y=trend_points['Sleep_Trend'],
+                mode='lines',
+                name='Sleep Trend',
+                line=dict(color='#98c379', width=3, shape='spline'),
+                yaxis='y'
+            ))
+
+    if 'HRV Avg' in filtered_garmin.columns:
+        hrv_data = filtered_garmin.loc[filtered_garmin['HRV Avg'].notna(), ['Date', 'HRV Avg']]
+        if not hrv_data.empty:
+            hrv_data = hrv_data.sort_values('Date')
+            hrv_points = downsample(hrv_data, 'Date', 'HRV Avg', budget)
+            fig_recovery.add_trace(go.Scatter(
+                x=hrv_points['Date'],
+                y=hrv_points['HRV Avg'],
+                mode='lines+markers',
+                name='HRV Avg',
+                line=dict(color='#61afef'),
+                yaxis='y2'
+            ))
+
+            # Add HRV trend line
+            if show_trend and len(hrv_data) >= 3:
+                span = max(7, len(hrv_data) // 4)
+                hrv_data['HRV_Trend'] = hrv_data['HRV Avg'].ewm(span=span, adjust=False).mean()
+                trend_points = downsample(hrv_data, 'Date', 'HRV_Trend', budget)
+                fig_recovery.add_trace(go.Scatter(
+                    x=trend_points['Date'],
+                    y=trend_points['HRV_Trend'],
+                    mode='lines',
+                    name='HRV Trend',
+                    line=dict(color='#61afef', width=3, shape='spline'),
+                    yaxis='y2'
+                ))
+
+    fig_recovery.update_layout(
+        title="Sleep Score vs HRV Average",
+        xaxis_title="Date",
+        yaxis=dict(title="Sleep Score", side='left', color='#98c379'),
+        yaxis2=dict(title="HRV Avg", side='right', overlaying='y', color='#61afef'),
+        template="plotly_dark",
+        height=400,
+        legend=dict(x=0.5, y=1.15, xanchor='center', orientation='h')
+    )
+    return fig_recovery
+
+
+def build_steps_figure(filtered_garmin, budget):
+    """Daily steps bars (weekly/monthly averages over the point budget), or None without step data."""
+    steps_data = filtered_garmin.loc[filtered_garmin['Steps'].notna(), ['Date', 'Steps']]
+    if steps_data.empty:
+        return None
+
+    points, period = bar_buckets(steps_data, budget, Steps=('Steps', 'mean'))
+    fig_steps = px.bar(
+        points,
+        x='Date',
+        y='Steps',
+        title="Daily Steps" if period is None else f"Daily Steps (average per {period})"
+    )
+    fig_steps.update_layout(
+        template="plotly_dark",
+        height=300
+    )
+    fig_steps.update_traces(marker_color='#c678dd')
+    return fig_steps
+
+
+def build_rhr_figure(filtered_garmin, budget):
+    """Resting heart rate line, or None without RHR data."""
+    rhr_data = filtered_garmin[filtered_garmin['RHR'].notna()]
+    if rhr_data.empty:
+        return None
+
+    fig_rhr = px.line(
+        downsample(rhr_data, 'Date', 'RHR', budget),
+        x='Date',
+        y='RHR',
+        markers=True,
+        title="Resting Heart Rate"
+    )
+    fig_rhr.update_layout(
+        template="plotly_dark",
+        height=300
+    )
+    fig_rhr.update_traces(line_color='#e06c75', marker_color='#e5c07b')
+    return fig_rhr
+
+
 # --- HEVY API FUNCTIONS ---
+@st.cache_resource
+def get_hevy_client():
+    """One pooled Hevy client shared by every session of the dashboard."""
+    return HevyClient(HEVY_API_KEY)
+
+
 def get_or_create_hevy_folder(folder_name):
-    headers = {"api-key": HEVY_API_KEY, "Content-Type": "application/json"}
+    client = get_hevy_client()
     try:
-        res = requests.get("https://api.hevyapp.com/v1/routine_folders", headers=headers)
-        if res.status_code == 200:
-            for folder in res.json().get('routine_folders', []):
-                if folder['title'] == folder_name:
-                    return folder['id']
-        payload = {"routine_folder": {"title": folder_name}}
-        res = requests.post("https://api.hevyapp.com/v1/routine_folders", headers=headers, json=payload)
-        if res.status_code in [200, 201]:
-            return res.json()['routine_folder']['id']
-    except Exception as e:
+        folder_id = client.find_routine_folder(folder_name)
+        if folder_id:
+            return folder_id
+        return client.create_routine_folder(folder_name)
+    except (HevyAPIError, requests.exceptions.RequestException) as e:
         st.error(f"Hevy API Error: {e}")
     return None
 
@@ -256,7 +864,7 @@ def upload_routine_json(json_data, folder_name):
             if not folder_id:
                 return "Error: Could not create/access folder on Hevy."
 
-        headers = {"api-key": HEVY_API_KEY, "Content-Type": "application/json"}
+        client = get_hevy_client()
         success_count = 0
         errors = []
 
@@ -264,7 +872,7 @@ def upload_routine_json(json_data, folder_name):
             payload = {"routine": routine}
             if folder_id:
                 payload["routine"]["folder_id"] = folder_id
-            res = requests.post("https://api.hevyapp.com/v1/routines", headers=headers, json=payload)
+            res = client.post("/routines", json=payload)
             if res.status_code in [200, 201]:
                 success_count += 1
             else:
@@ -608,6 +1216,7 @@ else:
 
 start_datetime = pd.Timestamp(start_date)
 end_datetime = pd.Timestamp(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+prev_start_datetime, prev_end_datetime = previous_period(start_datetime, end_datetime)
 
 st.sidebar.markdown("---")
 st.sidebar.info(f"Showing data from {start_date} to {end_date}")
@@ -616,6 +1225,14 @@ st.sidebar.info(f"Showing data from {start_date} to {end_date}")
 st.sidebar.markdown("---")
 st.sidebar.subheader("Chart Options")
 show_trend_lines = st.sidebar.checkbox("Show Trend Lines", value=True, help="Overlay smooth average trend lines on charts")
+chart_point_budget = st.sidebar.number_input(
+    "Max Points per Chart",
+    min_value=50,
+    max_value=5000,
+    value=CHART_POINT_BUDGET,
+    step=50,
+    help="Longer date ranges are downsampled (LTTB) to this many points, and bar charts are grouped into weekly or monthly bars; shorter ranges show every point"
+)
 
 # Mission Status filter
 st.sidebar.markdown("---")
@@ -636,139 +1253,59 @@ tab1, tab2, tab3 = st.tabs(["Training (Hevy)", "Recovery (Garmin)", "System & To
 
 # --- TAB 1: Training (Hevy) ---
 with tab1:
-    hevy_df = load_hevy_data()
+    hevy_version = dataset_version(HEVY_STATS_FILE)
+    hevy_df = load_hevy_data(hevy_version, dataset_since(prev_start_datetime.date()))
 
     if hevy_df is None:
         st.warning("Hevy workout data file not found. Please check the file path.")
     else:
-        # Filter by date range
-        mask = (hevy_df['Date'] >= start_datetime) & (hevy_df['Date'] <= end_datetime)
-        filtered_hevy = hevy_df[mask].copy()
+        # Selected period, sliced from the date index, and its metric cards (one aggregation)
+        filtered_hevy, hevy_kpis = period_view(hevy_df, HEVY_KPIS, *periods())
 
         if filtered_hevy.empty:
             st.warning("No workout data found for the selected date range.")
         else:
-            # Calculate previous period for comparison
-            period_days = (end_datetime - start_datetime).days + 1
-            prev_start = start_datetime - pd.Timedelta(days=period_days)
-            prev_end = start_datetime - pd.Timedelta(seconds=1)
-            prev_mask = (hevy_df['Date'] >= prev_start) & (hevy_df['Date'] <= prev_end)
-            prev_hevy = hevy_df[prev_mask].copy()
 
-            # Metric Cards
+            # Metric Cards (current vs previous period)
             col1, col2, col3, col4 = st.columns(4)
-
-            # Current period metrics
-            total_workouts = filtered_hevy.groupby(['Date', 'Workout']).ngroups
-            total_volume = filtered_hevy['Volume'].sum()
-            total_sets = len(filtered_hevy)
-            unique_exercises = filtered_hevy['Exercise'].nunique()
-
-            # Previous period metrics for comparison
-            prev_workouts = prev_hevy.groupby(['Date', 'Workout']).ngroups if not prev_hevy.empty else 0
-            prev_volume = prev_hevy['Volume'].sum() if not prev_hevy.empty else 0
-            prev_sets = len(prev_hevy) if not prev_hevy.empty else 0
-
-            # Calculate deltas
-            delta_workouts = total_workouts - prev_workouts if prev_workouts > 0 else None
-            delta_volume = total_volume - prev_volume if prev_volume > 0 else None
-            delta_sets = total_sets - prev_sets if prev_sets > 0 else None
+            workouts, volume, sets = hevy_kpis['workouts'], hevy_kpis['volume'], hevy_kpis['sets']
 
             with col1:
-                st.metric("Total Workouts", total_workouts,
-                         delta=f"{delta_workouts:+d}" if delta_workouts is not None else None)
+                st.metric("Total Workouts", workouts.current,
+                         delta=f"{workouts.delta:+d}" if workouts.delta is not None else None)
             with col2:
-                st.metric("Total Volume", f"{total_volume:,.0f} lbs",
-                         delta=f"{delta_volume:+,.0f}" if delta_volume is not None else None)
+                st.metric("Total Volume", f"{volume.current:,.0f} lbs",
+                         delta=f"{volume.delta:+,.0f}" if volume.delta is not None else None)
             with col3:
-                st.metric("Total Sets", total_sets,
-                         delta=f"{delta_sets:+d}" if delta_sets is not None else None)
+                st.metric("Total Sets", sets.current,
+                         delta=f"{sets.delta:+d}" if sets.delta is not None else None)
             with col4:
-                st.metric("Unique Exercises", unique_exercises)
+                st.metric("Unique Exercises", hevy_kpis['exercises'].current)
 
             st.markdown("---")
 
             # Charts Row
             chart_col1, chart_col2 = st.columns(2)
 
+            # Figures are cached per (chart, data file version, date range, options)
+            hevy_key = (hevy_version, start_date, end_date)
+
             with chart_col1:
                 st.subheader("Volume Progression")
-                # Calculate weekly volume
-                weekly_volume = filtered_hevy.copy()
-                weekly_volume['Week'] = weekly_volume['Date'].dt.to_period('W').dt.start_time
-                weekly_agg = weekly_volume.groupby('Week')['Volume'].sum().reset_index()
-
-                fig_volume = go.Figure()
-
-                # Main line
-                fig_volume.add_trace(go.Scatter(
-                    x=weekly_agg['Week'],
-                    y=weekly_agg['Volume'],
-                    mode='lines+markers',
-                    name='Weekly Volume',
-                    line=dict(color='#61afef'),
-                    marker=dict(color='#98c379')
-                ))
-
-                # Add trend line if enabled
-                if show_trend_lines and len(weekly_agg) >= 3:
-                    # Use exponential weighted moving average for smoother trend
-                    span = max(4, len(weekly_agg) // 3)
-                    weekly_agg['Trend'] = weekly_agg['Volume'].ewm(span=span, adjust=False).mean()
-                    fig_volume.add_trace(go.Scatter(
-                        x=weekly_agg['Week'],
-                        y=weekly_agg['Trend'],
-                        mode='lines',
-                        name='Trend',
-                        line=dict(color='#e5c07b', width=3, shape='spline')
-                    ))
-
-                fig_volume.update_layout(
-                    title="Weekly Training Volume (Weight x Reps)",
-                    xaxis_title="Week",
-                    yaxis_title="Volume (lbs)",
-                    template="plotly_dark",
-                    height=400,
-                    legend=dict(x=0.5, y=1.1, xanchor='center', orientation='h')
+                fig_volume = cached_figure(
+                    ("volume",) + hevy_key + (show_trend_lines, chart_point_budget),
+                    lambda: build_volume_figure(filtered_hevy, show_trend_lines, chart_point_budget)
                 )
                 st.plotly_chart(fig_volume, use_container_width=True)
 
             with chart_col2:
                 st.subheader("Muscle Group Split")
-                # Filter out cardio from muscle group analysis
-                strength_only = filtered_hevy[~filtered_hevy['is_cardio']].copy()
-                muscle_volume = strength_only.groupby('primary_muscle_group')['Volume'].sum().reset_index()
-                muscle_volume = muscle_volume.sort_values('Volume', ascending=False)
-
-                fig_muscle = px.pie(
-                    muscle_volume,
-                    values='Volume',
-                    names='primary_muscle_group',
-                    title="Volume per Muscle Group (lbs)",
-                    hole=0.4
-                )
-                fig_muscle.update_layout(
-                    template="plotly_dark",
-                    height=400
-                )
+                fig_muscle = cached_figure(("muscle_pie",) + hevy_key, lambda: build_muscle_pie_figure(filtered_hevy))
                 st.plotly_chart(fig_muscle, use_container_width=True)
 
             # Additional muscle group bar chart
             st.subheader("Muscle Group Distribution")
-            fig_bar = px.bar(
-                muscle_volume,
-                x='primary_muscle_group',
-                y='Volume',
-                title="Total Volume by Muscle Group (Strength Training Only)",
-                color='Volume',
-                color_continuous_scale='Blues'
-            )
-            fig_bar.update_layout(
-                xaxis_title="Muscle Group",
-                yaxis_title="Volume (lbs)",
-                template="plotly_dark",
-                height=350
-            )
+            fig_bar = cached_figure(("muscle_bar",) + hevy_key, lambda: build_muscle_bar_figure(filtered_hevy))
             st.plotly_chart(fig_bar, use_container_width=True)
 
             # TODO: Muscle Heat Map Visualization (disabled - needs mannequin-style body map)
@@ -778,8 +1315,8 @@ with tab1:
             st.markdown("---")
             st.subheader("Cardio Training (All Activities)")
 
-            activities_df = load_garmin_activities()
-            garmin_df = load_garmin_data()  # Load for power-to-weight calculation
+            activities_version = dataset_version(GARMIN_ACTIVITIES_FILE)
+            activities_df = load_garmin_activities(activities_version)
             if activities_df is not None:
                 # Sport filter and distance unit controls
                 filter_col1, filter_col2 = st.columns([1, 2])
@@ -818,88 +1355,36 @@ with tab1:
                     st.session_state.distance_unit_preference = distance_unit
 
                 use_miles = distance_unit == "Miles"
-                km_to_miles = 0.621371
+                cardio_key = (activities_version, start_date, end_date, sport_filter, distance_unit, chart_point_budget)
 
-                # Filter by date range
-                activities_mask = (activities_df['Date'] >= start_datetime) & (activities_df['Date'] <= end_datetime)
-                filtered_activities = activities_df[activities_mask].copy()
-
-                # Apply sport filter
-                if sport_filter != 'All' and 'sportType' in filtered_activities.columns:
-                    filtered_activities = filtered_activities[filtered_activities['sportType'] == sport_filter].copy()
+                # Selected + previous period as one date-index view, then the sport filter
+                # (which also drops the sport-specific columns this sport never records)
+                filtered_activities, cardio_kpis = cardio_view(
+                    activities_df, CARDIO_KPIS, *periods(), sport_filter, activity_empty_columns(activities_version))
 
                 # Rename for backward compatibility with existing code
                 filtered_runs = filtered_activities
 
                 if not filtered_runs.empty:
-                    # Calculate previous period for comparison (trend arrows)
-                    period_days = (end_datetime - start_datetime).days + 1
-                    prev_start = start_datetime - pd.Timedelta(days=period_days)
-                    prev_end = start_datetime - pd.Timedelta(seconds=1)
-                    prev_runs_mask = (activities_df['Date'] >= prev_start) & (activities_df['Date'] <= prev_end)
-                    prev_runs = activities_df[prev_runs_mask].copy()
-
-                    # Apply same sport filter to previous period for accurate comparison
-                    if sport_filter != 'All' and 'sportType' in prev_runs.columns:
-                        prev_runs = prev_runs[prev_runs['sportType'] == sport_filter].copy()
-
-                    # Cardio metrics
+                    # Cardio metrics (current vs previous period, one aggregation)
                     cardio_col1, cardio_col2, cardio_col3, cardio_col4, cardio_col5 = st.columns(5)
 
-                    total_runs = len(filtered_runs)
-                    prev_total_runs = len(prev_runs) if not prev_runs.empty else 0
-
-                    # Calculate distance from speed and duration if distance column doesn't exist
-                    if 'distance' in filtered_runs.columns:
-                        total_distance_km = filtered_runs['distance'].sum() / 1000
-                    elif 'averageSpeed' in filtered_runs.columns and 'duration' in filtered_runs.columns:
-                        filtered_runs['distance_calc'] = filtered_runs['averageSpeed'] * filtered_runs['duration']
-                        total_distance_km = filtered_runs['distance_calc'].sum() / 1000
-                    else:
-                        total_distance_km = 0
-
-                    # Previous period distance
-                    if not prev_runs.empty:
-                        if 'distance' in prev_runs.columns:
-                            prev_distance_km = prev_runs['distance'].sum() / 1000
-                        elif 'averageSpeed' in prev_runs.columns and 'duration' in prev_runs.columns:
-                            prev_runs['distance_calc'] = prev_runs['averageSpeed'] * prev_runs['duration']
-                            prev_distance_km = prev_runs['distance_calc'].sum() / 1000
-                        else:
-                            prev_distance_km = 0
-                    else:
-                        prev_distance_km = 0
-
-                    # Calculate average distance per run
-                    avg_distance_km = total_distance_km / total_runs if total_runs > 0 else 0
-                    prev_avg_distance_km = prev_distance_km / prev_total_runs if prev_total_runs > 0 else 0
-
-                    avg_hr = filtered_runs['averageHR'].mean() if 'averageHR' in filtered_runs.columns else 0
-                    prev_avg_hr = prev_runs['averageHR'].mean() if not prev_runs.empty and 'averageHR' in prev_runs.columns else None
-
-                    avg_duration = filtered_runs['duration'].mean() / 60 if 'duration' in filtered_runs.columns else 0
-                    prev_avg_duration = prev_runs['duration'].mean() / 60 if not prev_runs.empty and 'duration' in prev_runs.columns else None
-
-                    # Convert to display units
-                    if use_miles:
-                        total_distance = total_distance_km * km_to_miles
-                        prev_distance = prev_distance_km * km_to_miles
-                        avg_distance = avg_distance_km * km_to_miles
-                        prev_avg_distance = prev_avg_distance_km * km_to_miles
-                        dist_unit = "mi"
-                    else:
-                        total_distance = total_distance_km
-                        prev_distance = prev_distance_km
-                        avg_distance = avg_distance_km
-                        prev_avg_distance = prev_avg_distance_km
-                        dist_unit = "km"
-
-                    # Calculate deltas
-                    delta_runs = total_runs - prev_total_runs if prev_total_runs > 0 else None
-                    delta_distance = total_distance - prev_distance if prev_distance > 0 else None
-                    delta_avg_distance = avg_distance - prev_avg_distance if prev_avg_distance > 0 else None
-                    delta_hr = avg_hr - prev_avg_hr if prev_avg_hr is not None and pd.notna(prev_avg_hr) else None
-                    delta_duration = avg_duration - prev_avg_duration if prev_avg_duration is not None and pd.notna(prev_avg_duration) else None
+                    total_runs = cardio_kpis['activities'].current
+                    delta_runs = cardio_kpis['activities'].delta
+                    avg_hr = cardio_kpis['avg_hr'].current
+                    delta_hr = cardio_kpis['avg_hr'].delta
+                    avg_duration = cardio_kpis['avg_duration_min'].current
+                    delta_duration = cardio_kpis['avg_duration_min'].delta
+
+                    # Distances (and their deltas) in display units
+                    dist_factor = KM_TO_MILES if use_miles else 1.0
+                    dist_unit = "mi" if use_miles else "km"
+                    total_distance = (cardio_kpis['distance_km'].current or 0) * dist_factor
+                    avg_distance = (cardio_kpis['avg_distance_km'].current or 0) * dist_factor
+                    delta_distance = cardio_kpis['distance_km'].delta
+                    delta_distance = delta_distance * dist_factor if delta_distance is not None else None
+                    delta_avg_distance = cardio_kpis['avg_distance_km'].delta
+                    delta_avg_distance = delta_avg_distance * dist_factor if delta_avg_distance is not None else None
 
                     # Context-aware labels based on sport type
                     activity_label = "Activities" if sport_filter == "All" else sport_filter.title()
@@ -915,24 +1400,24 @@ with tab1:
                         st.metric(f"Avg {single_label} Distance", f"{avg_distance:.2f} {dist_unit}",
                                  delta=f"{delta_avg_distance:+.2f}" if delta_avg_distance is not None else None)
                     with cardio_col4:
-                        st.metric("Avg Heart Rate", f"{avg_hr:.0f} bpm" if pd.notna(avg_hr) else "N/A",
+                        st.metric("Avg Heart Rate", f"{avg_hr:.0f} bpm" if avg_hr is not None else "N/A",
                                  delta=f"{delta_hr:+.0f}" if delta_hr is not None else None,
                                  delta_color="inverse")
                     with cardio_col5:
-                        st.metric("Avg Duration", f"{avg_duration:.1f} min" if pd.notna(avg_duration) else "N/A",
+                        st.metric("Avg Duration", f"{avg_duration:.1f} min" if avg_duration is not None else "N/A",
                                  delta=f"{delta_duration:+.1f}" if delta_duration is not None else None)
 
                     # Power metrics - Second row
                     power_col1, power_col2, power_col3, power_col4 = st.columns(4)
 
-                    avg_power = filtered_runs['avgPower'].mean() if 'avgPower' in filtered_runs.columns and filtered_runs['avgPower'].notna().any() else None
-                    max_power = filtered_runs['maxPower'].max() if 'maxPower' in filtered_runs.columns and filtered_runs['maxPower'].notna().any() else None
-                    avg_norm_power = filtered_runs['normPower'].mean() if 'normPower' in filtered_runs.columns and filtered_runs['normPower'].notna().any() else None
+                    avg_power = cardio_kpis['avg_power'].current
+                    max_power = cardio_kpis['max_power'].current
+                    avg_norm_power = cardio_kpis['avg_norm_power'].current
 
                     # Calculate power-to-weight ratio if we have both power and weight data
-                    if avg_power and garmin_df is not None and 'Weight (lbs)' in garmin_df.columns:
-                        # Get most recent weight in kg
-                        recent_weight_lbs = garmin_df[garmin_df['Weight (lbs)'].notna()]['Weight (lbs)'].iloc[-1] if not garmin_df[garmin_df['Weight (lbs)'].notna()].empty else None
+                    if avg_power:
+                        # Get most recent weight in kg (not the whole Garmin frame, see latest_weight_lbs)
+                        recent_weight_lbs = latest_weight_lbs(dataset_version(GARMIN_STATS_FILE))
                         if recent_weight_lbs:
                             recent_weight_kg = recent_weight_lbs * 0.453592
                             power_to_weight = avg_power / recent_weight_kg
@@ -956,130 +1441,42 @@ with tab1:
                     with cardio_chart_col1:
                         # Distance over time
                         if 'averageSpeed' in filtered_runs.columns and 'duration' in filtered_runs.columns:
-                            filtered_runs['distance_km'] = (filtered_runs['averageSpeed'] * filtered_runs['duration']) / 1000
-                            if use_miles:
-                                filtered_runs['distance_display'] = filtered_runs['distance_km'] * km_to_miles
-                            else:
-                                filtered_runs['distance_display'] = filtered_runs['distance_km']
-                            chart_title = f"{activity_label} Distance Over Time" if sport_filter != "All" else "Activity Distance Over Time"
-                            fig_distance = px.bar(
-                                filtered_runs,
-                                x='Date',
-                                y='distance_display',
-                                title=chart_title,
-                                color='averageHR',
-                                color_continuous_scale='Reds'
-                            )
-                            fig_distance.update_layout(
-                                xaxis_title="Date",
-                                yaxis_title=f"Distance ({dist_unit})",
-                                template="plotly_dark",
-                                height=350
+                            fig_distance = cached_figure(
+                                ("distance",) + cardio_key,
+                                lambda: build_distance_figure(filtered_runs, use_miles, sport_filter, chart_point_budget)
                             )
                             st.plotly_chart(fig_distance, use_container_width=True)
 
                     with cardio_chart_col2:
                         # Heart Rate Zones
-                        zone_cols = ['hrTimeInZone_1', 'hrTimeInZone_2', 'hrTimeInZone_3', 'hrTimeInZone_4']
-                        available_zones = [c for c in zone_cols if c in filtered_runs.columns]
-
-                        if available_zones:
-                            zone_sums = {col: filtered_runs[col].sum() / 60 for col in available_zones}  # Convert to minutes
-                            zone_labels = ['Zone 1 (Easy)', 'Zone 2 (Fat Burn)', 'Zone 3 (Cardio)', 'Zone 4 (Peak)']
-                            zone_data = pd.DataFrame({
-                                'Zone': zone_labels[:len(available_zones)],
-                                'Minutes': list(zone_sums.values())
-                            })
-
-                            fig_zones = px.pie(
-                                zone_data,
-                                values='Minutes',
-                                names='Zone',
-                                title="Heart Rate Zone Distribution (Total Minutes)",
-                                hole=0.4,
-                                color_discrete_sequence=['#4CAF50', '#FFC107', '#FF9800', '#F44336']
-                            )
-                            fig_zones.update_layout(
-                                template="plotly_dark",
-                                height=350
-                            )
+                        fig_zones = cached_figure(("zones",) + cardio_key, lambda: build_zones_figure(filtered_runs))
+                        if fig_zones is not None:
                             st.plotly_chart(fig_zones, use_container_width=True)
 
                     # Speed/Pace trend - context-aware based on sport type
                     if 'averageSpeed' in filtered_runs.columns:
                         # For cycling: show speed (km/h or mph)
                         # For running/swimming: show pace (min/km or min/mi)
-                        is_cycling = sport_filter == 'cycling'
-                        is_swimming = sport_filter == 'swimming'
-
-                        if is_cycling:
-                            # Speed in km/h or mph
-                            filtered_runs['speed_kmh'] = filtered_runs['averageSpeed'] * 3.6  # m/s to km/h
-                            if use_miles:
-                                filtered_runs['speed_display'] = filtered_runs['speed_kmh'] * km_to_miles
-                                speed_unit = "mph"
-                            else:
-                                filtered_runs['speed_display'] = filtered_runs['speed_kmh']
-                                speed_unit = "km/h"
-
-                            fig_speed = px.line(
-                                filtered_runs,
-                                x='Date',
-                                y='speed_display',
-                                markers=True,
-                                title="Cycling Speed Trend (higher is faster)"
+                        if sport_filter == 'cycling':
+                            fig_speed = cached_figure(
+                                ("speed",) + cardio_key,
+                                lambda: build_speed_figure(filtered_runs, use_miles, chart_point_budget)
                             )
-                            fig_speed.update_layout(
-                                xaxis_title="Date",
-                                yaxis_title=f"Speed ({speed_unit})",
-                                template="plotly_dark",
-                                height=300
-                            )
-                            fig_speed.update_traces(line_color='#61afef', marker_color='#e5c07b')
                             st.plotly_chart(fig_speed, use_container_width=True)
 
                             # Show power chart for cycling if available
                             if 'avgPower' in filtered_runs.columns and filtered_runs['avgPower'].notna().any():
-                                fig_power = px.line(
-                                    filtered_runs,
-                                    x='Date',
-                                    y='avgPower',
-                                    markers=True,
-                                    title="Cycling Power Trend"
-                                )
-                                fig_power.update_layout(
-                                    xaxis_title="Date",
-                                    yaxis_title="Avg Power (Watts)",
-                                    template="plotly_dark",
-                                    height=300
+                                fig_power = cached_figure(
+                                    ("power",) + cardio_key,
+                                    lambda: build_power_figure(filtered_runs, chart_point_budget)
                                 )
-                                fig_power.update_traces(line_color='#c678dd', marker_color='#e5c07b')
                                 st.plotly_chart(fig_power, use_container_width=True)
                         else:
                             # Pace for running/swimming/other
-                            filtered_runs['pace_min_km'] = 1000 / (filtered_runs['averageSpeed'] * 60)
-                            if use_miles:
-                                filtered_runs['pace_display'] = filtered_runs['pace_min_km'] * 1.60934
-                                pace_unit = "min/mi"
-                            else:
-                                filtered_runs['pace_display'] = filtered_runs['pace_min_km']
-                                pace_unit = "min/km"
-
-                            pace_title = f"{single_label} Pace Trend (lower is faster)" if sport_filter != "All" else "Pace Trend (lower is faster)"
-                            fig_pace = px.line(
-                                filtered_runs,
-                                x='Date',
-                                y='pace_display',
-                                markers=True,
-                                title=pace_title
-                            )
-                            fig_pace.update_layout(
-                                xaxis_title="Date",
-                                yaxis_title=f"Pace ({pace_unit})",
-                                template="plotly_dark",
-                                height=300
+                            fig_pace = cached_figure(
+                                ("pace",) + cardio_key,
+                                lambda: build_pace_figure(filtered_runs, use_miles, sport_filter, chart_point_budget)
                             )
-                            fig_pace.update_traces(line_color='#e06c75', marker_color='#e5c07b')
                             st.plotly_chart(fig_pace, use_container_width=True)
                 else:
                     st.info(f"No {activity_label.lower()} found for the selected date range.")
@@ -1089,58 +1486,30 @@ with tab1:
 
 # --- TAB 2: Recovery (Garmin) ---
 with tab2:
-    garmin_df = load_garmin_data()
+    garmin_version = dataset_version(GARMIN_STATS_FILE)
+    garmin_df = load_garmin_data(garmin_version, dataset_since(prev_start_datetime.date()))
 
     if garmin_df is None:
         st.warning("Garmin health data file not found. Please check the file path.")
     else:
-        # Filter by date range
-        mask = (garmin_df['Date'] >= start_datetime) & (garmin_df['Date'] <= end_datetime)
-        filtered_garmin = garmin_df[mask].copy()
+        # Selected period, sliced from the date index, and its metric cards (one aggregation)
+        filtered_garmin, recovery_kpis = period_view(garmin_df, RECOVERY_KPIS, *periods())
 
         if filtered_garmin.empty:
             st.warning("No Garmin data found for the selected date range.")
         else:
-            # Calculate previous period for comparison
-            period_days = (end_datetime - start_datetime).days + 1
-            prev_start = start_datetime - pd.Timedelta(days=period_days)
-            prev_end = start_datetime - pd.Timedelta(seconds=1)
-            prev_mask = (garmin_df['Date'] >= prev_start) & (garmin_df['Date'] <= prev_end)
-            prev_garmin = garmin_df[prev_mask].copy()
 
             # Metric Cards
             col1, col2, col3, col4 = st.columns(4)
 
-            # Current period metrics
-            avg_sleep = filtered_garmin['Sleep Score'].mean()
-
-            # Calculate HRV properly - check if column exists and has any non-null values
-            if 'HRV Avg' in filtered_garmin.columns:
-                hrv_values = filtered_garmin['HRV Avg'].dropna()
-                avg_hrv = hrv_values.mean() if not hrv_values.empty else None
-            else:
-                avg_hrv = None
-
-            avg_rhr = filtered_garmin['RHR'].mean() if 'RHR' in filtered_garmin.columns else None
-            avg_steps = filtered_garmin['Steps'].mean() if 'Steps' in filtered_garmin.columns else None
-
-            # Previous period metrics
-            prev_sleep = prev_garmin['Sleep Score'].mean() if not prev_garmin.empty else None
-            prev_hrv = None
-            if not prev_garmin.empty and 'HRV Avg' in prev_garmin.columns:
-                prev_hrv_values = prev_garmin['HRV Avg'].dropna()
-                prev_hrv = prev_hrv_values.mean() if not prev_hrv_values.empty else None
-            prev_rhr = prev_garmin['RHR'].mean() if not prev_garmin.empty and 'RHR' in prev_garmin.columns else None
-            prev_steps = prev_garmin['Steps'].mean() if not prev_garmin.empty and 'Steps' in prev_garmin.columns else None
-
-            # Calculate deltas
-            delta_sleep = avg_sleep - prev_sleep if pd.notna(avg_sleep) and pd.notna(prev_sleep) else None
-            delta_hrv = avg_hrv - prev_hrv if avg_hrv is not None and prev_hrv is not None else None
-            delta_rhr = avg_rhr - prev_rhr if pd.notna(avg_rhr) and pd.notna(prev_rhr) else None
-            delta_steps = avg_steps - prev_steps if pd.notna(avg_steps) and pd.notna(prev_steps) else None
+            # Current vs previous period
+            avg_sleep, delta_sleep = recovery_kpis['sleep'].current, recovery_kpis['sleep'].delta
+            avg_hrv, delta_hrv = recovery_kpis['hrv'].current, recovery_kpis['hrv'].delta
+            avg_rhr, delta_rhr = recovery_kpis['rhr'].current, recovery_kpis['rhr'].delta
+            avg_steps, delta_steps = recovery_kpis['steps'].current, recovery_kpis['steps'].delta
 
             with col1:
-                st.metric("Avg Sleep Score", f"{avg_sleep:.1f}" if pd.notna(avg_sleep) else "N/A",
+                st.metric("Avg Sleep Score", f"{avg_sleep:.1f}" if avg_sleep is not None else "N/A",
                          delta=f"{delta_sleep:+.1f}" if delta_sleep is not None else None)
             with col2:
                 st.metric("Avg HRV", f"{avg_hrv:.1f}" if avg_hrv is not None and pd.notna(avg_hrv) else "No data",
@@ -1158,112 +1527,26 @@ with tab2:
             # Charts Row
             chart_col1, chart_col2 = st.columns(2)
 
+            # Figures are cached per (chart, data file version, date range, options)
+            garmin_key = (garmin_version, start_date, end_date, chart_point_budget)
+
             with chart_col1:
                 st.subheader("Body Weight Trend")
-                weight_data = filtered_garmin[filtered_garmin['Weight (lbs)'].notna()].copy()
-
-                if not weight_data.empty:
-                    fig_weight = go.Figure()
-
-                    # Main weight line
-                    fig_weight.add_trace(go.Scatter(
-                        x=weight_data['Date'],
-                        y=weight_data['Weight (lbs)'],
-                        mode='lines+markers',
-                        name='Weight',
-                        line=dict(color='#e06c75'),
-                        marker=dict(color='#e5c07b')
-                    ))
-
-                    # Add trend line if enabled
-                    if show_trend_lines and len(weight_data) >= 3:
-                        weight_data = weight_data.sort_values('Date')
-                        span = max(7, len(weight_data) // 4)
-                        weight_data['Trend'] = weight_data['Weight (lbs)'].ewm(span=span, adjust=False).mean()
-                        fig_weight.add_trace(go.Scatter(
-                            x=weight_data['Date'],
-                            y=weight_data['Trend'],
-                            mode='lines',
-                            name='Trend',
-                            line=dict(color='#c678dd', width=3, shape='spline')
-                        ))
-
-                    fig_weight.update_layout(
-                        title="Body Weight Over Time",
-                        xaxis_title="Date",
-                        yaxis_title="Weight (lbs)",
-                        template="plotly_dark",
-                        height=400,
-                        legend=dict(x=0.5, y=1.1, xanchor='center', orientation='h')
-                    )
+                fig_weight = cached_figure(
+                    ("weight",) + garmin_key + (show_trend_lines,),
+                    lambda: build_weight_figure(filtered_garmin, show_trend_lines, chart_point_budget)
+                )
+                if fig_weight is not None:
                     st.plotly_chart(fig_weight, use_container_width=True)
                 else:
                     st.info("No weight data available for the selected period.")
 
             with chart_col2:
                 st.subheader("Sleep & HRV")
-                # Create multi-line chart for Sleep Score and HRV
-                fig_recovery = go.Figure()
-
-                if 'Sleep Score' in filtered_garmin.columns:
-                    sleep_data = filtered_garmin[filtered_garmin['Sleep Score'].notna()].copy()
-                    sleep_data = sleep_data.sort_values('Date')
-                    fig_recovery.add_trace(go.Scatter(
-                        x=sleep_data['Date'],
-                        y=sleep_data['Sleep Score'],
-                        mode='lines+markers',
-                        name='Sleep Score',
-                        line=dict(color='#98c379'),
-                        yaxis='y'
-                    ))
-
-                    # Add sleep trend line
-                    if show_trend_lines and len(sleep_data) >= 3:
-                        span = max(7, len(sleep_data) // 4)
-                        sleep_data['Sleep_Trend'] = sleep_data['Sleep Score'].ewm(span=span, adjust=False).mean()
-                        fig_recovery.add_trace(go.Scatter(
-                            x=sleep_data['Date'],
-                            y=sleep_data['Sleep_Trend'],
-                            mode='lines',
-                            name='Sleep Trend',
-                            line=dict(color='#98c379', width=3, shape='spline'),
-                            yaxis='y'
-                        ))
-
-                if 'HRV Avg' in filtered_garmin.columns:
-                    hrv_data = filtered_garmin[filtered_garmin['HRV Avg'].notna()].copy()
-                    if not hrv_data.empty:
-                        hrv_data = hrv_data.sort_values('Date')
-                        fig_recovery.add_trace(go.Scatter(
-                            x=hrv_data['Date'],
-                            y=hrv_data['HRV Avg'],
-                            mode='lines+markers',
-                            name='HRV Avg',
-                            line=dict(color='#61afef'),
-                            yaxis='y2'
-                        ))
-
-                        # Add HRV trend line
-                        if show_trend_lines and len(hrv_data) >= 3:
-                            span = max(7, len(hrv_data) // 4)
-                            hrv_data['HRV_Trend'] = hrv_data['HRV Avg'].ewm(span=span, adjust=False).mean()
-                            fig_recovery.add_trace(go.Scatter(
-                                x=hrv_data['Date'],
-                                y=hrv_data['HRV_Trend'],
-                                mode='lines',
-                                name='HRV Trend',
-                                line=dict(color='#61afef', width=3, shape='spline'),
-                                yaxis='y2'
-                            ))
-
-                fig_recovery.update_layout(
-                    title="Sleep Score vs HRV Average",
-                    xaxis_title="Date",
-                    yaxis=dict(title="Sleep Score", side='left', color='#98c379'),
-                    yaxis2=dict(title="HRV Avg", side='right', overlaying='y', color='#61afef'),
-                    template="plotly_dark",
-                    height=400,
-                    legend=dict(x=0.5, y=1.15, xanchor='center', orientation='h')
+                # Multi-line chart for Sleep Score and HRV
+                fig_recovery = cached_figure(
+                    ("recovery",) + garmin_key + (show_trend_lines,),
+                    lambda: build_recovery_figure(filtered_garmin, show_trend_lines, chart_point_budget)
                 )
                 st.plotly_chart(fig_recovery, use_container_width=True)
 
@@ -1273,37 +1556,14 @@ with tab2:
 
             with steps_col:
                 if 'Steps' in filtered_garmin.columns:
-                    steps_data = filtered_garmin[filtered_garmin['Steps'].notna()]
-                    if not steps_data.empty:
-                        fig_steps = px.bar(
-                            steps_data,
-                            x='Date',
-                            y='Steps',
-                            title="Daily Steps"
-                        )
-                        fig_steps.update_layout(
-                            template="plotly_dark",
-                            height=300
-                        )
-                        fig_steps.update_traces(marker_color='#c678dd')
+                    fig_steps = cached_figure(("steps",) + garmin_key, lambda: build_steps_figure(filtered_garmin, chart_point_budget))
+                    if fig_steps is not None:
                         st.plotly_chart(fig_steps, use_container_width=True)
 
             with rhr_col:
                 if 'RHR' in filtered_garmin.columns:
-                    rhr_data = filtered_garmin[filtered_garmin['RHR'].notna()]
-                    if not rhr_data.empty:
-                        fig_rhr = px.line(
-                            rhr_data,
-                            x='Date',
-                            y='RHR',
-                            markers=True,
-                            title="Resting Heart Rate"
-                        )
-                        fig_rhr.update_layout(
-                            template="plotly_dark",
-                            height=300
-                        )
-                        fig_rhr.update_traces(line_color='#e06c75', marker_color='#e5c07b')
+                    fig_rhr = cached_figure(("rhr",) + garmin_key, lambda: build_rhr_figure(filtered_garmin, chart_point_budget))
+                    if fig_rhr is not None:
                         st.plotly_chart(fig_rhr, use_container_width=True)
 
 
@@ -1533,9 +1793,26 @@ with tab3:
     with ctrl_col3:
         if st.button("Clear Streamlit Cache", type="secondary"):
             st.cache_data.clear()
+            for loader in (load_hevy_data, load_garmin_data, load_garmin_activities, activity_empty_columns):
+                loader.clear()  # Shared dataset frames (cache_resource)
+            get_figure_cache().clear()
             st.success("Cache cleared!")
             time.sleep(1)
             st.rerun()
+        fig_stats = get_figure_cache().stats()
+        st.caption(f"Figure cache: {fig_stats['figures']} figures, {fig_stats['mb']:.1f}/{FIGURE_CACHE_MB} MB, "
+                   f"{fig_stats['hits']} hits / {fig_stats['misses']} misses")
+        rss_mb = process_rss_mb()
+        if rss_mb is not None:
+            st.caption(f"Dashboard process memory (RSS, all sessions): {rss_mb:.0f} MB")
+        for label, frame in (
+            ("Hevy", load_hevy_data(dataset_version(HEVY_STATS_FILE), dataset_since(prev_start_datetime.date()))),
+            ("Garmin health", load_garmin_data(dataset_version(GARMIN_STATS_FILE), dataset_since(prev_start_datetime.date()))),
+            ("Garmin activities", load_garmin_activities(dataset_version(GARMIN_ACTIVITIES_FILE))),
+        ):
+            if frame is not None:
+                st.caption(f"{label} data: {len(frame):,} rows x {frame.shape[1]} columns, "
+                           f"{frame_memory_mb(frame):.1f} MB")
 
     st.markdown("---")
 
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Garmin Activity Detail Enrichment (background worker)
+
+The hourly activity syncs only store the activity summary. This worker fetches
+the heavier per-activity data for newly seen activities:
+  - get_activity_details      (time series, HR/pace charts)
+  - get_activity_splits       (laps / splits)
+  - get_activity_hr_in_timezones (time in each HR zone)
+
+and writes one JSON file per activity to the detail store:
+  <SAVE_PATH>/garmin_activity_details/<activityId>.json
+
+Queue:
+  The daily scripts call enqueue_activity_ids() for new activities, which drops a
+  marker file in garmin_activity_details/pending/, then start_worker() launches this
+  script detached. The worker drains the queue with a small thread pool and a
+  shared rate limiter; an OS file lock keeps a single worker running at a time
+  (released by the OS if the worker dies, so it never goes stale).
+
+Usage:
+  python garmin_activity_details.py              # Drain the queue now
+  python garmin_activity_details.py 12345 67890  # Enqueue these IDs, then drain
+"""
+
+from garmin_session import get_garmin_client
+from csv_store import dataset_lock
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from datetime import datetime
+import json
+import os
+import sys
+import platform
+import subprocess
+import time
+from dotenv import load_dotenv
+from rate_limiter import RateLimiter
+
+# 1. Load configuration
+load_dotenv()
+
+# --- CONFIGURATION ---
+SAVE_PATH = os.getenv("SAVE_PATH")
+DETAIL_DIR = os.path.join(SAVE_PATH, "garmin_activity_details") if SAVE_PATH else "garmin_activity_details"
+PENDING_DIR = os.path.join(DETAIL_DIR, "pending")
+WORKER_LOCK = os.path.join(DETAIL_DIR, ".worker")  # dataset_lock() locks .worker.lock
+
+MAX_WORKERS = int(os.getenv("GARMIN_DETAIL_WORKERS", "2"))
+CALLS_PER_SECOND = float(os.getenv("GARMIN_DETAIL_CALLS_PER_SECOND", "1.0"))
+MAX_ATTEMPTS = 3            # Give up on an activity after this many failed runs
+# ---------------------
+
+
+def detail_path(activity_id):
+    return os.path.join(DETAIL_DIR, f"{activity_id}.json")
+
+
+def enqueue_activity_ids(activity_ids):
+    """Queue activities for detail fetching. Returns the number newly queued."""
+    os.makedirs(PENDING_DIR, exist_ok=True)
+    queued = 0
+    for activity_id in activity_ids:
+        if not activity_id:
+            continue
+        marker = os.path.join(PENDING_DIR, str(activity_id))
+        if os.path.exists(marker) or os.path.exists(detail_path(activity_id)):
+            continue
+        with open(marker, 'w', encoding='utf-8') as f:
+            f.write("0")  # Failed attempts so far
+        queued += 1
+    return queued
+
+
+def pending_activity_ids():
+    if not os.path.isdir(PENDING_DIR):
+        return []
+    return sorted(name for name in os.listdir(PENDING_DIR) if not name.startswith("."))
+
+
+def start_worker():
+    """Launch this script detached so the caller's sync finishes immediately."""
+    kwargs = {"cwd": os.path.dirname(os.path.abspath(__file__))}
+    if platform.system() == "Windows":
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
+    else:
+        kwargs["start_new_session"] = True
+
+    try:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__)], **kwargs)
+        print("   Detail worker started in the background.")
+    except Exception as e:
+        print(f"   Warning: Could not start detail worker: {e}")
+
+
+def fetch_activity_details(api, limiter, activity_id):
+    """Fetch details, splits and HR zones for one activity and write its JSON file."""
+    record = {
+        "activityId": activity_id,
+        "fetched_at": datetime.now().isoformat(timespec='seconds'),
+        "details": limiter.call(api.get_activity_details, activity_id),
+        "splits": limiter.call(api.get_activity_splits, activity_id),
+        "hr_zones": limiter.call(api.get_activity_hr_in_timezones, activity_id),
+    }
+
+    # Write to a temp file first so readers never see a half-written JSON
+    tmp_path = detail_path(activity_id) + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+    os.replace(tmp_path, detail_path(activity_id))
+
+
+def record_failure(activity_id, error):
+    """Bump the attempt count in the pending marker; drop it after MAX_ATTEMPTS."""
+    marker = os.path.join(PENDING_DIR, activity_id)
+    try:
+        with open(marker, 'r', encoding='utf-8') as f:
+            attempts = int(f.read().strip() or 0) + 1
+    except (OSError, ValueError):
+        attempts = 1
+
+    if attempts >= MAX_ATTEMPTS:
+        print(f"   {activity_id}: giving up after {attempts} attempts ({error})")
+        os.remove(marker)
+    else:
+        print(f"   {activity_id}: failed ({error}), will retry next run")
+        with open(marker, 'w', encoding='utf-8') as f:
+            f.write(str(attempts))
+
+
+def drain_queue(api):
+    """Process pending activities until the queue is empty. Returns (done, failed)."""
+    limiter = RateLimiter(CALLS_PER_SECOND)
+    done = failed = 0
+    attempted = set()
+
+    while True:
+        # Pick up anything enqueued while the previous batch was running
+        batch = [a for a in pending_activity_ids() if a not in attempted]
+        if not batch:
+            break
+        attempted.update(batch)
+        print(f"Fetching details for {len(batch)} activities ({MAX_WORKERS} workers, {CALLS_PER_SECOND}/s)...")
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {executor.submit(fetch_activity_details, api, limiter, a): a for a in batch}
+            for future in as_completed(futures):
+                activity_id = futures[future]
+                try:
+                    future.result()
+                    os.remove(os.path.join(PENDING_DIR, activity_id))
+                    done += 1
+                    print(f"   {activity_id}: saved")
+                except Exception as e:
+                    record_failure(activity_id, e)
+                    failed += 1
+
+    return done, failed
+
+
+def main():
+    for arg in sys.argv[1:]:
+        if not arg.startswith("-"):
+            enqueue_activity_ids([arg])
+
+    if not pending_activity_ids():
+        print("Detail queue is empty.")
+        return
+
+    with ExitStack() as stack:
+        # Held for the whole drain, however long; a second worker exits at once
+        try:
+            stack.enter_context(dataset_lock(WORKER_LOCK, timeout=0))
+        except TimeoutError:
+            print("Another detail worker is already running. Exiting.")
+            return
+
+        try:
+            api = get_garmin_client()
+
+            started = time.perf_counter()
+            done, failed = drain_queue(api)
+            print(f"--- DETAIL WORKER COMPLETE. Saved {done}, failed {failed} "
+                  f"in {time.perf_counter() - started:.1f}s ---")
+        except Exception as e:
+            print(f"Detail worker error: {e}")
+
+
+if __name__ == "__main__":
+    # Platform-Aware Safety Check (importers run their own)
+    check_mount = os.getenv("CHECK_MOUNT_STATUS", "False").lower() == "true"
+    drive_path = os.getenv("DRIVE_MOUNT_PATH", "/home/pi/google_drive")
+    if check_mount and platform.system() != "Windows" and not os.path.ismount(drive_path):
+        print(f"CRITICAL ERROR: Drive is not mounted at {drive_path}.")
+        print("Stopping script to prevent writing to local storage.")
+        sys.exit(1)
+
+    main()
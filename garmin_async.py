@@ -0,0 +1,137 @@
+"""
+Asyncio Facade for Garmin Connect
+
+garminconnect/garth are synchronous. AsyncGarmin runs their calls in a thread
+pool so many Garmin requests can overlap on one event loop. A semaphore caps the
+number in flight, and a shared RateLimiter spaces them out.
+
+Usage:
+  garmin = AsyncGarmin(api, max_concurrency=4, calls_per_second=3.0)
+  payloads = await garmin.fetch_day("2025-01-31")
+  activities = await garmin.fetch_activities("2025-01-01", "2025-01-31")
+  garmin.close()
+
+fetch_day() returns the raw payload of each health endpoint keyed by name (see
+DAY_ENDPOINTS / FALLBACK_ENDPOINTS). A failed endpoint maps to None, matching the
+scripts' "skip what fails" behaviour. fetch_day_payloads() is the synchronous
+equivalent for sequential loops.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import RateLimiter
+
+# Payload key -> (Garmin method, connectapi path used when the method is missing)
+DAY_ENDPOINTS = {
+    "user_summary": ("get_user_summary", None),
+    "sleep": ("get_sleep_data", None),
+    "training_status": ("get_training_status", None),
+    "body_composition": ("get_body_composition", None),
+    "hrv": ("get_hrv_data", "/hrv-service/hrv/daily/{day}"),
+    "blood_pressure": ("get_blood_pressure", "/bloodpressure/{day}"),
+}
+
+# Payload key -> (Garmin method, user summary field). Only fetched when the
+# user summary does not already contain that field.
+FALLBACK_ENDPOINTS = {
+    "spo2": ("get_spo2_data", "averageSpO2"),
+    "respiration": ("get_respiration_data", "averageRespirationValue"),
+    "max_metrics": ("get_max_metrics", "vo2Max"),
+}
+
+
+def _endpoint_call(api, method_name, fallback_path, day_str):
+    """Return (func, args) for one day endpoint, or None if the API lacks it."""
+    if hasattr(api, method_name):
+        return getattr(api, method_name), (day_str,)
+    if fallback_path:
+        return api.connectapi, (fallback_path.format(day=day_str),)
+    return None
+
+
+def _needs_fallback(user_summary, field):
+    return not isinstance(user_summary, dict) or user_summary.get(field) is None
+
+
+def fetch_day_payloads(api, day_str, limiter=None):
+    """Synchronously fetch every health payload for one day (see fetch_day)."""
+    def fetch(method_name, fallback_path=None, args=None):
+        call = _endpoint_call(api, method_name, fallback_path, day_str)
+        if call is None:
+            return None
+        func, default_args = call
+        try:
+            if limiter:
+                limiter.wait()
+            return func(*(args or default_args))
+        except Exception:
+            return None
+
+    payloads = {key: fetch(method, path) for key, (method, path) in DAY_ENDPOINTS.items()}
+    payloads["activities"] = fetch("get_activities_by_date", args=(day_str, day_str))
+    for key, (method, field) in FALLBACK_ENDPOINTS.items():
+        needed = _needs_fallback(payloads["user_summary"], field)
+        payloads[key] = fetch(method) if needed else None
+    return payloads
+
+
+class AsyncGarmin:
+    """Async wrapper around a logged-in garminconnect.Garmin instance."""
+
+    def __init__(self, api, max_concurrency=4, calls_per_second=3.0, limiter=None):
+        self.api = api
+        self.limiter = limiter or RateLimiter(calls_per_second)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.semaphore = None  # Created lazily inside the running loop
+        self.max_concurrency = max_concurrency
+
+    async def call(self, func, *args):
+        """Run a blocking Garmin call in the executor (rate limited, bounded)."""
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            return await loop.run_in_executor(self.executor, self.limiter.call, func, *args)
+
+    async def _safe_call(self, func, *args):
+        try:
+            return await self.call(func, *args)
+        except Exception:
+            return None
+
+    async def fetch_activities(self, start, end, activity_type=None):
+        """Activities between start and end (ISO dates, inclusive). Raises on API errors."""
+        args = (start, end, activity_type) if activity_type else (start, end)
+        return await self.call(self.api.get_activities_by_date, *args) or []
+
+    async def fetch_day(self, day_str):
+        """
+        Fetch every health payload for one day concurrently.
+
+        Fallback endpoints (SpO2, respiration, max metrics) are only requested
+        when the user summary is missing the corresponding value.
+        """
+        keys = []
+        tasks = []
+        for key, (method, path) in DAY_ENDPOINTS.items():
+            call = _endpoint_call(self.api, method, path, day_str)
+            if call:
+                keys.append(key)
+                tasks.append(self._safe_call(call[0], *call[1]))
+        keys.append("activities")
+        tasks.append(self._safe_call(self.api.get_activities_by_date, day_str, day_str))
+
+        payloads = {key: None for key in list(DAY_ENDPOINTS) + list(FALLBACK_ENDPOINTS)}
+        payloads.update(zip(keys, await asyncio.gather(*tasks)))
+
+        fallback_keys = []
+        fallback_tasks = []
+        for key, (method, field) in FALLBACK_ENDPOINTS.items():
+            if _needs_fallback(payloads["user_summary"], field) and hasattr(self.api, method):
+                fallback_keys.append(key)
+                fallback_tasks.append(self._safe_call(getattr(self.api, method), day_str))
+        payloads.update(zip(fallback_keys, await asyncio.gather(*fallback_tasks)))
+        return payloads
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,107 @@
+"""
+Garmin Session Broker
+
+Every Garmin script gets its logged-in client from get_garmin_client() instead of
+resuming garth and looking up the profile itself.
+
+  - One client per process (threads/async workers share it)
+  - OAuth2 token refreshed proactively when it is close to expiry, and the
+    refreshed tokens are saved back to .garth/ so the next cron run starts
+    with a valid token instead of refreshing again
+  - The profile displayName is cached in .garth/profile_cache.json, so runs
+    skip the profile lookup round trip
+
+Usage:
+  from garmin_session import get_garmin_client
+  api = get_garmin_client()
+"""
+
+import garth
+from garminconnect import Garmin
+import json
+import os
+import threading
+import time
+
+TOKEN_DIR = ".garth"
+PROFILE_CACHE_FILE = "profile_cache.json"
+REFRESH_MARGIN_SECONDS = 15 * 60  # Refresh when the access token expires within this window
+
+_client = None
+_lock = threading.Lock()
+
+
+def refresh_if_expiring(token_dir=TOKEN_DIR, margin=REFRESH_MARGIN_SECONDS):
+    """Refresh the OAuth2 token if it expires within `margin` seconds and save it. Returns True if refreshed."""
+    token = garth.client.oauth2_token
+    if token is None or token.expires_at - time.time() > margin:
+        return False
+
+    garth.client.refresh_oauth2()
+    garth.client.dump(token_dir)
+    print("Garmin session: OAuth2 token refreshed and saved.")
+    return True
+
+
+def load_display_name(token_dir=TOKEN_DIR):
+    """Return the cached profile displayName, fetching and caching it on first use."""
+    cache_path = os.path.join(token_dir, PROFILE_CACHE_FILE)
+    if os.path.isfile(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                display_name = json.load(f).get("displayName")
+            if display_name:
+                return display_name
+        except Exception:
+            pass
+
+    try:
+        display_name = garth.client.profile['displayName']
+    except Exception:
+        return None
+
+    try:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({"displayName": display_name, "cached_at": int(time.time())}, f)
+    except OSError:
+        pass
+    return display_name
+
+
+def clear_profile_cache(token_dir=TOKEN_DIR):
+    """Forget the cached profile (call after logging in with a different account)."""
+    try:
+        os.remove(os.path.join(token_dir, PROFILE_CACHE_FILE))
+    except OSError:
+        pass
+
+
+def get_garmin_client(token_dir=TOKEN_DIR):
+    """
+    Return this process's logged-in Garmin client, creating it on first use.
+
+    Raises whatever garth.resume raises when no saved tokens exist
+    (run setup_garmin_login.py first).
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            garth.resume(token_dir)
+            try:
+                refresh_if_expiring(token_dir)
+            except Exception as e:
+                print(f"Garmin session: token refresh failed ({e}); continuing with current token.")
+
+            api = Garmin("dummy", "dummy")
+            api.garth = garth.client
+            display_name = load_display_name(token_dir)
+            if display_name:
+                api.display_name = display_name
+            _client = api
+        else:
+            # Long-running processes (dashboard, big imports) keep the token fresh
+            try:
+                refresh_if_expiring(token_dir)
+            except Exception as e:
+                print(f"Garmin session: token refresh failed ({e}).")
+        return _client
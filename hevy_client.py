@@ -0,0 +1,228 @@
+"""
+Shared Hevy API Client
+
+One keep-alive, connection-pooled session for every script that talks to Hevy
+(daily/history workout sync, the Gemini routine uploader and the dashboard).
+
+Features:
+  - Timeouts on every request
+  - Retry with exponential backoff on 429/5xx and network errors (honours Retry-After);
+    POSTs are only retried when Hevy can't have acted on them (429, connection never made)
+  - Pagination iterators for the list endpoints (optionally prefetching the next page)
+  - Request metrics (count, retries, errors, time spent)
+
+Usage:
+  client = HevyClient(API_KEY)
+  for workout in client.paginate("/workouts", "workouts"):
+      ...
+  print(client.metrics_summary())
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+HEVY_BASE_URL = "https://api.hevyapp.com/v1"
+DEFAULT_TIMEOUT = 30      # Seconds per request
+DEFAULT_MAX_RETRIES = 3   # Retries on top of the first attempt
+DEFAULT_POOL_SIZE = 8     # Keep-alive connections kept open to Hevy
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+NON_IDEMPOTENT_RETRY_STATUS_CODES = {429}  # Rejected before Hevy did anything
+
+# Largest pageSize each list endpoint accepts
+MAX_PAGE_SIZE = {
+    "workouts": 10,
+    "workouts/events": 10,
+    "routines": 10,
+    "routine_folders": 10,
+    "exercise_templates": 100,
+}
+
+
+class HevyAPIError(Exception):
+    """Raised by the pagination helpers when Hevy answers with a non-200 status."""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"Hevy API error {status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+def _never_sent(error):
+    """True if a network error happened before the request reached Hevy."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class HevyClient:
+    """Pooled Hevy API client shared by all Hevy callers."""
+
+    def __init__(self, api_key, timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 pool_size=DEFAULT_POOL_SIZE, backoff=1.0):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.headers.update({
+            "api-key": api_key or "",
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+        })
+
+        self._lock = threading.Lock()
+        self.metrics = {"requests": 0, "retries": 0, "errors": 0, "seconds": 0.0}
+
+    # --- Core request ---
+    def request(self, method, path, **kwargs):
+        """
+        Send a request to Hevy and return the final requests.Response.
+
+        429/5xx responses and network errors are retried with exponential backoff;
+        once retries are exhausted the last response is returned (or the network error re-raised).
+        POST isn't idempotent (a timeout after Hevy created a routine would create it twice),
+        so it is only retried on 429 and on errors while connecting.
+        """
+        url = path if path.startswith("http") else f"{HEVY_BASE_URL}/{path.lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_codes = RETRY_STATUS_CODES if idempotent else NON_IDEMPOTENT_RETRY_STATUS_CODES
+
+        started = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    if attempt == self.max_retries or not (idempotent or _never_sent(e)):
+                        self._record(errors=1)
+                        raise
+                    self._record(retries=1)
+                    time.sleep(self.backoff * 2 ** attempt)
+                    continue
+
+                if response.status_code in retry_codes and attempt < self.max_retries:
+                    self._record(retries=1)
+                    retry_after = response.headers.get("Retry-After", "")
+                    time.sleep(float(retry_after) if retry_after.isdigit() else self.backoff * 2 ** attempt)
+                    continue
+
+                if response.status_code >= 400:
+                    self._record(errors=1)
+                return response
+        finally:
+            self._record(count=1, seconds=time.perf_counter() - started)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    # --- Pagination ---
+    def fetch_page(self, path, items_key, page, params=None, page_size=None):
+        """
+        Fetch one page of a Hevy list endpoint and return (items, page_count).
+
+        Returns ([], page - 1) when Hevy answers 404 for a page past the end.
+        Raises HevyAPIError on any other non-200 response.
+        """
+        if page_size is None:
+            page_size = MAX_PAGE_SIZE.get(path.strip("/"), 10)
+
+        query = dict(params or {}, page=page, pageSize=page_size)
+        response = self.get(path, params=query)
+        if response.status_code == 404 and page > 1:
+            return [], page - 1
+        if response.status_code != 200:
+            raise HevyAPIError(response.status_code, response.text)
+
+        data = response.json()
+        return data.get(items_key, []), data.get("page_count", page)
+
+    def iter_pages(self, path, items_key, params=None, page_size=None, start_page=1, prefetch=False):
+        """
+        Yield (page_number, items, page_count) for each page of a Hevy list endpoint.
+
+        Uses the largest page size the endpoint allows unless page_size is given.
+        With prefetch=True the next page is requested in a background thread while
+        the caller is still processing the current one; breaking out of the loop
+        stops the pager (at most one extra page is fetched).
+        Raises HevyAPIError on a non-200 response.
+        """
+        def fetch(page):
+            return self.fetch_page(path, items_key, page, params=params, page_size=page_size)
+
+        if not prefetch:
+            page = start_page
+            page_count = start_page
+            while page <= page_count:
+                items, page_count = fetch(page)
+                if not items:
+                    break
+                yield page, items, page_count
+                page += 1
+            return
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            page = start_page
+            pending = pool.submit(fetch, page)
+            while pending is not None:
+                items, page_count = pending.result()
+                if not items:
+                    break
+                pending = pool.submit(fetch, page + 1) if page < page_count else None
+                yield page, items, page_count
+                page += 1
+
+    def paginate(self, path, items_key, params=None, page_size=None):
+        """Yield every item of a Hevy list endpoint across all pages."""
+        for _, items, _ in self.iter_pages(path, items_key, params=params, page_size=page_size):
+            yield from items
+
+    # --- Routine folders ---
+    def find_routine_folder(self, title):
+        """Return the ID of the routine folder with this title, or None."""
+        for folder in self.paginate("/routine_folders", "routine_folders"):
+            if folder.get("title") == title:
+                return folder["id"]
+        return None
+
+    def create_routine_folder(self, title):
+        """Create a routine folder and return its ID (None on failure)."""
+        response = self.post("/routine_folders", json={"routine_folder": {"title": title}})
+        if response.status_code in [200, 201]:
+            return response.json()["routine_folder"]["id"]
+        return None
+
+    # --- Metrics ---
+    def _record(self, count=0, retries=0, errors=0, seconds=0.0):
+        with self._lock:
+            self.metrics["requests"] += count
+            self.metrics["retries"] += retries
+            self.metrics["errors"] += errors
+            self.metrics["seconds"] += seconds
+
+    def metrics_summary(self):
+        """One-line summary of the requests made by this client."""
+        m = self.metrics
+        avg = m["seconds"] / m["requests"] if m["requests"] else 0
+        return (f"Hevy API: {m['requests']} requests, {m['retries']} retries, {m['errors']} errors, "
+                f"{m['seconds']:.1f}s total ({avg:.2f}s avg)")
+
+    def close(self):
+        self.session.close()
@@ -5,22 +5,35 @@ History Import for Garmin Activities
 Bulk imports ALL cardio activities from Garmin Connect (running, cycling, swimming, etc.)
 and saves them to garmin_activities.csv with sport-specific metrics.
 
+Streaming import: 30-day windows are fetched concurrently (bounded, rate limited),
+each window is sorted and spilled to a temp file, and the existing CSV is split
+into sorted chunks the same way. A final k-way merge writes the CSV newest first,
+so memory use does not grow with the size of the history.
+
 Usage:
   python history_garmin_activities.py [start_date] [--force]
 
   start_date: Optional start date (default: 2024-08-08)
-  --force: Overwrite existing data with fresh Garmin data
+  --force: Overwrite existing rows with fresh Garmin data (rows outside the
+           fetched range are kept)
 """
 
-import garth
-from garminconnect import Garmin
+from garmin_session import get_garmin_client
 from datetime import date, timedelta
+import asyncio
 import csv
+import heapq
+import itertools
 import os
+import shutil
 import sys
 import platform
+import tempfile
 import time
 from dotenv import load_dotenv
+from garmin_async import AsyncGarmin
+from csv_store import dataset_lock, dataset_signature, read_rows, replace_dataset
+from schemas import GARMIN_ACTIVITIES, migrate_dataset
 
 # 1. Load configuration
 load_dotenv()
@@ -42,7 +55,6 @@ elif check_mount and is_windows:
     print("Note: Mount check skipped on Windows (not applicable).")
 
 # --- CONFIGURATION ---
-TOKEN_DIR = ".garth"
 SAVE_PATH = os.getenv("SAVE_PATH")
 CSV_FILE = os.path.join(SAVE_PATH, "garmin_activities.csv") if SAVE_PATH else "garmin_activities.csv"
 DEFAULT_START_DATE = "2024-08-08"
@@ -51,6 +63,11 @@ DEFAULT_START_DATE = "2024-08-08"
 START_DATE = os.getenv("GARMIN_START_DATE", DEFAULT_START_DATE)
 FORCE_MODE = False
 
+WINDOW_DAYS = 30                                                  # Days per Garmin request
+MAX_WORKERS = int(os.getenv("GARMIN_HISTORY_WORKERS", "3"))       # Windows fetched in parallel
+CALLS_PER_SECOND = float(os.getenv("GARMIN_CALLS_PER_SECOND", "1.0"))
+SPILL_CHUNK_ROWS = 5000                                           # Existing rows per sorted spill file
+
 # Parse command line arguments (command-line overrides .env)
 for arg in sys.argv[1:]:
     if arg == "--force":
@@ -60,35 +77,8 @@ for arg in sys.argv[1:]:
         START_DATE = arg
         print(f"Using command-line start date: {START_DATE}")
 
-# CSV Headers - expanded schema for multi-sport
-HEADERS = [
-    # Identifiers
-    "Date", "Time", "activityName", "sportType",
-    # Duration & Distance
-    "duration", "elapsedDuration", "movingDuration", "distance",
-    # Speed/Pace
-    "averageSpeed", "maxSpeed",
-    # Heart Rate
-    "averageHR", "maxHR",
-    "hrTimeInZone_1", "hrTimeInZone_2", "hrTimeInZone_3", "hrTimeInZone_4", "hrTimeInZone_5",
-    # Power (Cycling/Running)
-    "avgPower", "maxPower", "normPower",
-    # Cadence
-    "avgCadence", "maxCadence",
-    # Elevation (Cycling/Running/Hiking)
-    "totalAscent", "totalDescent",
-    # Running Specific
-    "steps", "avgStrideLength",
-    # Swimming Specific
-    "avgStrokes", "totalStrokes", "poolLength", "numLaps",
-    # Training Metrics
-    "calories", "trainingEffectLabel", "activityTrainingLoad",
-    "aerobicEffect", "anaerobicEffect",
-    # VO2 & Performance
-    "vo2Max", "lactateThreshold",
-    # Activity ID (for reference)
-    "activityId"
-]
+# CSV Headers - multi-sport schema (see schemas.py)
+HEADERS = GARMIN_ACTIVITIES.headers
 # ---------------------
 
 
@@ -215,15 +205,115 @@ def extract_activity_data(act):
     ]
 
 
+def row_key(row):
+    """Sort/dedupe key: (Date, Time)"""
+    return (row[0], row[1] if len(row) > 1 else "")
+
+
+def date_windows(start, end):
+    """Split [start, end] into WINDOW_DAYS-day windows"""
+    windows = []
+    current = start
+    while current < end:
+        chunk_end = min(current + timedelta(days=WINDOW_DAYS), end)
+        windows.append((current, chunk_end))
+        current = chunk_end + timedelta(days=1)
+    return windows
+
+
+def write_spill(rows, spill_dir):
+    """Sort rows newest first and write them to a temp CSV. Returns the path."""
+    rows.sort(key=row_key, reverse=True)
+    fd, path = tempfile.mkstemp(suffix=".csv", dir=spill_dir)
+    with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+    return path
+
+
+def spill_existing(spill_dir):
+    """Split the existing dataset into sorted spill files. Returns (paths, row_count)."""
+    paths = []
+    count = 0
+    rows = read_rows(CSV_FILE, encoding='utf-8')
+    while True:
+        chunk = list(itertools.islice(rows, SPILL_CHUNK_ROWS))
+        if not chunk:
+            break
+        count += len(chunk)
+        paths.append(write_spill(chunk, spill_dir))
+    return paths, count
+
+
+async def fetch_window(garmin, window, spill_dir):
+    """Fetch one window and spill its rows. Returns (window, path, count, error)."""
+    start, end = window
+    try:
+        activities = await garmin.fetch_activities(start.isoformat(), end.isoformat())
+    except Exception as e:
+        return window, None, 0, e
+    rows = [extract_activity_data(act) for act in activities]
+    if not rows:
+        return window, None, 0, None
+    return window, write_spill(rows, spill_dir), len(rows), None
+
+
+async def fetch_all_windows(garmin, windows, spill_dir):
+    """Fetch every window concurrently on one event loop. Returns (spill paths, activity count)."""
+    new_paths = []
+    fetched = 0
+    tasks = [fetch_window(garmin, w, spill_dir) for w in windows]
+    for next_done in asyncio.as_completed(tasks):
+        (start, end), path, count, error = await next_done
+        if error:
+            print(f"   {start} to {end}: Error: {error}")
+        elif path:
+            new_paths.append(path)
+            fetched += count
+            print(f"   {start} to {end}: Found {count}.")
+        else:
+            print(f"   {start} to {end}: No data.")
+    return new_paths, fetched
+
+
+def read_spill(path, priority):
+    """Yield (key, priority, row) from a spill file (already sorted newest first)"""
+    with open(path, mode='r', newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            yield row_key(row), priority, row
+
+
+def merge_spills(existing_paths, new_paths, out_path):
+    """
+    K-way merge all spill files into out_path, newest first, one row per (Date, Time).
+
+    On duplicate keys the existing row wins, unless FORCE_MODE (fresh Garmin row wins).
+    Returns (written, added, replaced).
+    """
+    existing_priority, new_priority = (1, 0) if FORCE_MODE else (0, 1)
+    sources = ([read_spill(p, existing_priority) for p in existing_paths] +
+               [read_spill(p, new_priority) for p in new_paths])
+    merged = heapq.merge(*sources, key=lambda item: item[0], reverse=True)
+
+    written = added = replaced = 0
+    with open(out_path, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        for _, group in itertools.groupby(merged, key=lambda item: item[0]):
+            group = list(group)
+            _, priority, row = min(group, key=lambda item: item[1])
+            has_existing = any(item[1] == existing_priority for item in group)
+            if not has_existing:
+                added += 1
+            elif priority == new_priority:
+                replaced += 1
+            writer.writerow(row)
+            written += 1
+    return written, added, replaced
+
+
 def main():
     print("1. Loading tokens...")
-    garth.resume(TOKEN_DIR)
-    api = Garmin("dummy", "dummy")
-    api.garth = garth.client
-    try:
-        api.display_name = api.garth.profile['displayName']
-    except:
-        pass
+    api = get_garmin_client()
 
     print(f"2. Fetching activities from {START_DATE}...")
 
@@ -232,83 +322,57 @@ def main():
     if folder_path and not os.path.exists(folder_path):
         os.makedirs(folder_path)
 
-    # Load existing data
-    existing_ids = set()
-    existing_rows = []
-
-    if os.path.isfile(CSV_FILE):
+    # Scratch files stay in the local temp dir, out of the synced SAVE_PATH
+    spill_dir = tempfile.mkdtemp(prefix="garmin_activities_")
+    started = time.perf_counter()
+    try:
+        # Existing data -> sorted spill files
+        existing_paths = []
+        existing_version = None
         try:
-            with open(CSV_FILE, mode='r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                headers = next(reader, None)
-                for row in reader:
-                    if row:
-                        date_str = row[0]
-                        time_str = row[1] if len(row) > 1 else ""
-                        existing_ids.add((date_str, time_str))
-                        existing_rows.append(row)
-            if FORCE_MODE:
-                print(f"   Found {len(existing_rows)} existing records (will overwrite)")
-                existing_rows = []
-                existing_ids = set()
-            else:
-                print(f"   Found {len(existing_rows)} existing records (will preserve)")
+            migrate_dataset(CSV_FILE, GARMIN_ACTIVITIES)  # Legacy headers/dates (one-time)
+            existing_version = dataset_signature(CSV_FILE)
+            existing_paths, existing_count = spill_existing(spill_dir)
+            if existing_count:
+                mode = "will overwrite fetched range" if FORCE_MODE else "will preserve"
+                print(f"   Found {existing_count} existing records ({mode})")
         except Exception as e:
-            print(f"   Warning: Could not read existing file: {e}")
-
-    start = date.fromisoformat(START_DATE)
-    end = date.today()
-    current = start
-    total_new = 0
-    all_rows = list(existing_rows)
-
-    while current < end:
-        chunk_end = current + timedelta(days=30)
-        if chunk_end > end:
-            chunk_end = end
-
-        print(f"   Processing {current} to {chunk_end}...", end="", flush=True)
-        chunk_added = 0
-
+            # Merging without the full history would replace the file with only new rows
+            print(f"   CRITICAL ERROR: Could not read existing file: {e}")
+            print("   Stopping without changes.")
+            return
+
+        # Fetch windows concurrently (asyncio) -> one sorted spill file each
+        windows = date_windows(date.fromisoformat(START_DATE), date.today())
+        garmin = AsyncGarmin(api, max_concurrency=MAX_WORKERS, calls_per_second=CALLS_PER_SECOND)
         try:
-            # Fetch ALL activities (no type filter)
-            activities = api.get_activities_by_date(current.isoformat(), chunk_end.isoformat())
-
-            if activities:
-                for act in activities:
-                    start_local = act.get('startTimeLocal', '')
-                    date_str = start_local[:10]
-                    time_str = start_local[11:]
-
-                    # Skip if already exists (unless force mode)
-                    if (date_str, time_str) in existing_ids:
-                        continue
-
-                    row = extract_activity_data(act)
-                    all_rows.append(row)
-                    chunk_added += 1
-                    total_new += 1
-
-                print(f" Found {len(activities)}, added {chunk_added} new.")
-            else:
-                print(" No data.")
-
-        except Exception as e:
-            print(f" Error: {e}")
-
-        current = chunk_end + timedelta(days=1)
-        time.sleep(1)
-
-    # Write all data sorted newest to oldest
-    if all_rows:
-        all_rows.sort(key=lambda x: (x[0], x[1]), reverse=True)
-        with open(CSV_FILE, mode='w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(HEADERS)
-            writer.writerows(all_rows)
-        print(f"   Written {len(all_rows)} total records (sorted newest to oldest).")
-
-    print(f"--- COMPLETE. Added {total_new} new records. ---")
+            new_paths, fetched = asyncio.run(fetch_all_windows(garmin, windows, spill_dir))
+        finally:
+            garmin.close()
+
+        if not existing_paths and not new_paths:
+            print("--- COMPLETE. No activities found. ---")
+            return
+
+        # K-way merge into a temp file, then swap it in (under the dataset lock)
+        with dataset_lock(CSV_FILE):
+            if dataset_signature(CSV_FILE) != existing_version:
+                # Another job wrote the file while we were fetching: re-spill it
+                for path in existing_paths:
+                    os.remove(path)
+                existing_paths, _ = spill_existing(spill_dir)
+
+            tmp_out = os.path.join(spill_dir, "merged.csv")
+            written, added, replaced = merge_spills(existing_paths, new_paths, tmp_out)
+            replace_dataset(CSV_FILE, HEADERS, tmp_out, encoding='utf-8')
+        print(f"   Written {written} total records (sorted newest to oldest).")
+        if FORCE_MODE:
+            print(f"   Refreshed {replaced} existing records with fresh Garmin data.")
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    print(f"--- COMPLETE. Fetched {fetched} activities in {time.perf_counter() - started:.1f}s. "
+          f"Added {added} new records. ---")
 
 
 if __name__ == "__main__":
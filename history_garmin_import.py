@@ -1,10 +1,12 @@
-import garth
-from garminconnect import Garmin
+from garmin_session import get_garmin_client
+import asyncio
 from datetime import date, timedelta, datetime
-import csv
 import os
 import time
 import random
+from garmin_async import AsyncGarmin, fetch_day_payloads
+from csv_store import normalize_date, append_row, dataset_files, dataset_lock, read_rows, write_dataset
+from schemas import GARMIN_STATS, migrate_dataset
 
 import os
 import sys
@@ -46,21 +48,31 @@ else:
     print("WARNING: SAVE_PATH not set in .env. Using current folder.")
     CSV_FILE = "garmin_stats.csv"
 
-TOKEN_DIR = ".garth"
 DEFAULT_START_DATE = "2024-08-08"
 
 # Try to read start date from .env first, then use default
 START_DATE = os.getenv("GARMIN_START_DATE", DEFAULT_START_DATE)
 BACKFILL_MODE = False
 FORCE_MODE = False
+SHARDS = 1
+CALLS_PER_SECOND = float(os.getenv("GARMIN_CALLS_PER_SECOND", "3.0"))  # Shared by all shards
 
 # Parse command line arguments (command-line overrides .env)
-# Usage: python history_garmin_import.py [start_date] [--backfill] [--force]
+# Usage: python history_garmin_import.py [start_date] [--backfill] [--force] [--shards N]
 #   start_date: Optional start date (overrides .env GARMIN_START_DATE)
 #   --backfill: Update existing rows with missing data (e.g., new columns like BP)
 #   --force: Overwrite existing data with fresh Garmin data (re-sync all)
-for arg in sys.argv[1:]:
-    if arg == "--backfill":
+#   --shards N: Split the date range into N shards fetched concurrently on one
+#               asyncio loop (one shared rate limiter and garth token)
+args = sys.argv[1:]
+for i, arg in enumerate(args):
+    if arg == "--shards" or arg.startswith("--shards="):
+        value = arg.split("=", 1)[1] if "=" in arg else (args[i + 1] if i + 1 < len(args) else "1")
+        SHARDS = max(1, int(value))
+        print(f"SHARDED MODE: {SHARDS} parallel shards ({CALLS_PER_SECOND} API calls/s shared)")
+    elif i > 0 and args[i - 1] == "--shards":
+        continue  # Value of --shards
+    elif arg == "--backfill":
         BACKFILL_MODE = True
         print("BACKFILL MODE: Will update existing rows with missing data")
     elif arg == "--force":
@@ -79,16 +91,287 @@ def get_safe(data, *keys):
     except (KeyError, TypeError, AttributeError):
         return None
 
-def main():
-    # 1. Login
+HEADERS = GARMIN_STATS.headers
+
+
+def fetch_day_row(api, day_str, limiter=None):
+    """Fetch every health metric for one day and return the CSV row."""
+    return build_day_row(day_str, fetch_day_payloads(api, day_str, limiter))
+
+
+def build_day_row(day_str, payloads):
+    """
+    Build the CSV row for one day from the raw Garmin payloads
+    (garmin_async.fetch_day / fetch_day_payloads; failed endpoints are None).
+    """
+    # Same logic as Daily Script
+    # Core
     try:
-        garth.resume(TOKEN_DIR)
-        api = Garmin("dummy", "dummy")
-        api.garth = garth.client
+        user_stats = payloads["user_summary"]
+        rhr = get_safe(user_stats, 'restingHeartRate')
+        min_hr = get_safe(user_stats, 'minHeartRate')
+        max_hr = get_safe(user_stats, 'maxHeartRate')
+        stress = get_safe(user_stats, 'averageStressLevel')
+        steps = get_safe(user_stats, 'totalSteps')
+        vo2 = get_safe(user_stats, 'vo2Max')
+        spo2 = get_safe(user_stats, 'averageSpO2')
+        resp = get_safe(user_stats, 'averageRespirationValue')
+        cals_tot = get_safe(user_stats, 'totalKilocalories')
+        cals_act = get_safe(user_stats, 'activeKilocalories')
+        cals_goal = get_safe(user_stats, 'dailyStepGoal')
+    except:
+        rhr, min_hr, max_hr, stress, steps, vo2, spo2, resp, cals_tot, cals_act, cals_goal = [None]*11
+
+    # SpO2 fallback - try dedicated endpoint if not in user summary
+    if spo2 is None:
         try:
-            api.display_name = api.garth.profile['displayName']
+            spo2_data = payloads["spo2"]
+            if spo2_data:
+                spo2 = get_safe(spo2_data, 'averageSpO2')
+                if spo2 is None:
+                    spo2 = get_safe(spo2_data, 'latestSpO2')
+                if spo2 is None:
+                    spo2 = get_safe(spo2_data, 'latestSpO2Value')
         except:
             pass
+
+    # Respiration fallback - try dedicated endpoint if not in user summary
+    if resp is None:
+        try:
+            resp_data = payloads["respiration"]
+            if resp_data:
+                resp = get_safe(resp_data, 'avgWakingRespirationValue')
+                if resp is None:
+                    resp = get_safe(resp_data, 'avgSleepRespirationValue')
+        except:
+            pass
+
+    # VO2 Max fallback - try max metrics endpoint
+    if vo2 is None:
+        try:
+            max_metrics = payloads["max_metrics"]
+            if max_metrics:
+                for metric in max_metrics if isinstance(max_metrics, list) else [max_metrics]:
+                    if get_safe(metric, 'generic', 'vo2MaxPreciseValue'):
+                        vo2 = get_safe(metric, 'generic', 'vo2MaxPreciseValue')
+                        break
+                    if get_safe(metric, 'vo2MaxPreciseValue'):
+                        vo2 = get_safe(metric, 'vo2MaxPreciseValue')
+                        break
+        except:
+            pass
+
+    # Sleep
+    try:
+        sleep_data = payloads["sleep"]
+        s_tot = get_safe(sleep_data, 'dailySleepDTO', 'sleepTimeSeconds')
+        s_deep = get_safe(sleep_data, 'dailySleepDTO', 'deepSleepSeconds')
+        s_rem = get_safe(sleep_data, 'dailySleepDTO', 'remSleepSeconds')
+        s_score = get_safe(sleep_data, 'dailySleepDTO', 'sleepScores', 'overall', 'value')
+        if s_tot: s_tot = round(s_tot / 3600, 2)
+        if s_deep: s_deep = round(s_deep / 3600, 2)
+        if s_rem: s_rem = round(s_rem / 3600, 2)
+    except:
+        s_tot, s_deep, s_rem, s_score = None, None, None, None
+
+    # Training Status
+    t_status = None
+    try:
+        ts = payloads["training_status"]
+        # Try multiple paths for training status
+        t_status = get_safe(ts, 'mostRecentTerminatedTrainingStatus', 'status')
+        if t_status is None:
+            t_status = get_safe(ts, 'trainingStatusData', 'status')
+        if t_status is None:
+            t_status = get_safe(ts, 'status')
+        if t_status is None and isinstance(ts, list) and len(ts) > 0:
+            t_status = get_safe(ts[0], 'status')
+
+        # Also try to get VO2 max from training status if still missing
+        if vo2 is None and ts:
+            vo2 = get_safe(ts, 'vo2MaxValue')
+            if vo2 is None:
+                vo2 = get_safe(ts, 'mostRecentTerminatedTrainingStatus', 'vo2MaxValue')
+    except:
+        pass
+
+    # Body Comp
+    wt, mus, fat, h2o = None, None, None, None
+    try:
+        bc = payloads["body_composition"]
+        if bc and 'totalAverage' in bc:
+            avg = bc['totalAverage']
+            if avg.get('weight'): wt = round(avg.get('weight')/453.592, 1)
+            if avg.get('muscleMass'): mus = round(avg.get('muscleMass')/453.592, 1)
+            fat = avg.get('bodyFat')
+            h2o = avg.get('bodyWater')
+    except:
+        pass
+
+    # HRV
+    hrv_s, hrv_a = None, None
+    try:
+        h = payloads["hrv"]
+
+        hrv_s = get_safe(h, 'hrvSummary', 'status')
+
+        # Try multiple HRV value sources in order of preference
+        hrv_a = get_safe(h, 'hrvSummary', 'weeklyAverage')
+        if hrv_a is None:
+            hrv_a = get_safe(h, 'hrvSummary', 'lastNightAvg')
+        if hrv_a is None:
+            hrv_a = get_safe(h, 'lastNightAvg')
+        if hrv_a is None:
+            # Try to get from HRV values array
+            hrv_values = get_safe(h, 'hrvValues')
+            if hrv_values and len(hrv_values) > 0:
+                hrv_a = get_safe(hrv_values[-1], 'hrvValue')
+        if hrv_a is None:
+            hrv_a = get_safe(h, 'hrvValue')
+    except:
+        pass
+
+    # Blood Pressure
+    bp_sys, bp_dia = None, None
+    try:
+        bp_data = payloads["blood_pressure"]
+
+        if bp_data:
+            summaries = get_safe(bp_data, 'measurementSummaries')
+            if summaries and len(summaries) > 0:
+                # Try to get from measurements array first (most accurate)
+                measurements = get_safe(summaries[0], 'measurements')
+                if measurements and len(measurements) > 0:
+                    bp_sys = get_safe(measurements[0], 'systolic')
+                    bp_dia = get_safe(measurements[0], 'diastolic')
+
+                # Fallback to summary high values
+                if bp_sys is None:
+                    bp_sys = get_safe(summaries[0], 'highSystolic')
+                    bp_dia = get_safe(summaries[0], 'highDiastolic')
+    except:
+        pass
+
+    # Activities
+    act_str = ""
+    try:
+        acts = payloads["activities"]
+        if acts:
+            names = [f"{a['activityName']} ({a['activityType']['typeKey']})" for a in acts]
+            act_str = "; ".join(names)
+    except:
+        pass
+
+    # Build Row
+    return [
+        day_str, wt, mus, fat, h2o, s_tot, s_deep, s_rem, s_score,
+        rhr, min_hr, max_hr, stress, resp, spo2, vo2, t_status, hrv_s, hrv_a,
+        bp_sys, bp_dia,
+        steps, cals_goal, cals_tot, cals_act, act_str
+    ]
+
+
+def merge_row(day_str, row, existing_data, fetched_days):
+    """Store a fetched row in the keyed store according to the import mode"""
+    fetched_days.add(day_str)
+    if BACKFILL_MODE and day_str in existing_data:
+        # Merge with existing data - only fill empty values
+        old_row = existing_data[day_str]
+        merged_row = []
+        for old_val, new_val in zip(old_row, row):
+            # Keep old value if it exists and is not empty
+            if old_val is not None and str(old_val).strip() != '':
+                merged_row.append(old_val)
+            else:
+                merged_row.append(new_val)
+        existing_data[day_str] = merged_row
+    else:
+        # Force mode / new day: completely replace with fresh data
+        existing_data[day_str] = row
+
+
+def write_all_rows(existing_data, fetched_days):
+    """
+    Write the days fetched this run into the CSV (newest first).
+
+    The file is re-read under the lock: the hourly health job may have written
+    rows while we were fetching, so only the fetched days replace what is on disk.
+    """
+    with dataset_lock(CSV_FILE):
+        rows = {}
+        for row in read_rows(CSV_FILE):
+            date_str = normalize_date(row[0])
+            if date_str:
+                row = (row + [''] * len(HEADERS))[:len(HEADERS)]
+                row[0] = date_str
+                rows[date_str] = row
+        for day_str in fetched_days:
+            rows[day_str] = existing_data[day_str]
+        sorted_dates = sorted(rows.keys(), reverse=True)
+        write_dataset(CSV_FILE, HEADERS, [rows[d] for d in sorted_dates])
+    return len(rows)
+
+
+def format_eta(seconds):
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{secs:02d}s"
+
+
+async def run_sharded_async(garmin, days, existing_data, fetched_days, progress):
+    """
+    Fetch `days` with SHARDS coroutines, each owning a contiguous slice of the range.
+
+    All shards share one AsyncGarmin (one garth session, one rate limiter); each
+    day's endpoints are requested concurrently. Results go into the keyed store
+    (existing_data) so completion order doesn't matter.
+    """
+    shard_size = -(-len(days) // SHARDS)  # Ceiling division
+    shards = [days[i:i + shard_size] for i in range(0, len(days), shard_size)]
+    started = time.perf_counter()
+
+    async def run_shard(shard_no, shard_days):
+        for day_str in shard_days:
+            try:
+                row = build_day_row(day_str, await garmin.fetch_day(day_str))
+                merge_row(day_str, row, existing_data, fetched_days)
+                status = "Done."
+            except Exception as e:
+                progress["failed"] += 1
+                status = f"Failed ({e})"
+
+            progress["done"] += 1
+            done = progress["done"]
+            elapsed = time.perf_counter() - started
+            eta = elapsed / done * (len(days) - done)
+            print(f"[{done}/{len(days)}] shard {shard_no}: {day_str} {status} "
+                  f"({done / elapsed:.2f} days/s, ETA {format_eta(eta)})")
+
+    print(f"Fetching {len(days)} days in {len(shards)} shards...")
+    await asyncio.gather(*(run_shard(n + 1, shard) for n, shard in enumerate(shards)))
+
+
+def run_sharded(api, days, existing_data, fetched_days):
+    """Run the sharded import on one event loop. Returns the number of days fetched."""
+    garmin = AsyncGarmin(api, max_concurrency=SHARDS * 2, calls_per_second=CALLS_PER_SECOND)
+    progress = {"done": 0, "failed": 0}
+    try:
+        asyncio.run(run_sharded_async(garmin, days, existing_data, fetched_days, progress))
+    except KeyboardInterrupt:
+        # Ctrl+C keeps what was fetched
+        print("\nStopped. Writing the days fetched so far...")
+    finally:
+        garmin.close()
+
+    if progress["failed"]:
+        print(f"{progress['failed']} days failed. Re-run to retry them.")
+    return progress["done"] - progress["failed"]
+
+
+def main():
+    # 1. Login
+    try:
+        api = get_garmin_client()
     except Exception as e:
         print(f"Login failed: {e}")
         return
@@ -97,63 +380,33 @@ def main():
     start = date.fromisoformat(START_DATE)
     end = date.today() - timedelta(days=1) # Stop at yesterday (daily script handles today)
     delta = timedelta(days=1)
-    
+
     current_date = start
-    
+
     print(f"--- STARTING HISTORY PULL ---")
     print(f"From {start} to {end}")
     print("Press Ctrl+C to stop at any time.")
-    
+
     # 3. Create CSV Header
-    headers = [
-        "Date",
-        "Weight (lbs)", "Muscle Mass (lbs)", "Body Fat %", "Water %",
-        "Sleep Total (hr)", "Sleep Deep (hr)", "Sleep REM (hr)", "Sleep Score",
-        "RHR", "Min HR", "Max HR", "Avg Stress", "Respiration", "SpO2",
-        "VO2 Max", "Training Status", "HRV Status", "HRV Avg",
-        "BP Systolic", "BP Diastolic",
-        "Steps", "Step Goal", "Cals Total", "Cals Active",
-        "Activities"
-    ]
-    
+    headers = HEADERS
+
     # Load existing data
     existing_dates = set()
-    existing_data = {}  # For backfill/force mode: {date_str: row_list}
-
-    def normalize_date(date_str):
-        """Normalize date to ISO format"""
-        if '/' in date_str:
-            parts = date_str.split('/')
-            if len(parts) == 3:
-                month, day, year = parts
-                return f"{year}-{int(month):02d}-{int(day):02d}"
-        return date_str
-
-    if os.path.isfile(CSV_FILE):
+    existing_data = {}  # Keyed store for backfill/force/sharded mode: {date_str: row_list}
+    fetched_days = set()  # Days fetched this run (the only rows write_all_rows replaces)
+    keep_rows = BACKFILL_MODE or FORCE_MODE or SHARDS > 1
+
+    if dataset_files(CSV_FILE):
         try:
-            with open(CSV_FILE, mode='r', newline='') as f:
-                reader = csv.reader(f)
-                file_headers = next(reader, None)  # Read actual headers from file
-
-                # Build column mapping: old position -> new position
-                col_mapping = {}
-                if file_headers:
-                    for old_idx, col_name in enumerate(file_headers):
-                        if col_name in headers:
-                            new_idx = headers.index(col_name)
-                            col_mapping[old_idx] = new_idx
-
-                for row in reader:
-                    if row:
-                        date_str = normalize_date(row[0])
-                        existing_dates.add(date_str)
-                        if BACKFILL_MODE or FORCE_MODE:
-                            # Remap columns to match new header order
-                            new_row = [''] * len(headers)
-                            for old_idx, value in enumerate(row):
-                                if old_idx in col_mapping:
-                                    new_row[col_mapping[old_idx]] = value
-                            existing_data[date_str] = new_row
+            # Legacy header layouts are fixed once by the schema migration
+            migrate_dataset(CSV_FILE, GARMIN_STATS)
+            for row in read_rows(CSV_FILE):
+                date_str = normalize_date(row[0])
+                existing_dates.add(date_str)
+                if keep_rows:
+                    new_row = (row + [''] * len(headers))[:len(headers)]
+                    new_row[0] = date_str
+                    existing_data[date_str] = new_row
             if FORCE_MODE:
                 print(f"Found {len(existing_dates)} existing dates (will overwrite with fresh data)")
             elif BACKFILL_MODE:
@@ -163,11 +416,29 @@ def main():
         except Exception as e:
             print(f"Warning: Could not read existing file: {e}")
     else:
-        with open(CSV_FILE, mode='w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(headers)
+        write_dataset(CSV_FILE, headers, [])
+
+    # 4a. Sharded mode: parallel workers, keyed store, single write at the end
+    if SHARDS > 1:
+        days = []
+        while current_date <= end:
+            day_str = current_date.isoformat()
+            if not (day_str in existing_dates and not BACKFILL_MODE and not FORCE_MODE):
+                days.append(day_str)
+            current_date += delta
 
-    # 4. The Loop
+        if not days:
+            print("Nothing to fetch.")
+        else:
+            fetched = run_sharded(api, days, existing_data, fetched_days)
+            print("Writing updated data to file...")
+            total = write_all_rows(existing_data, fetched_days)
+            print(f"Fetched {fetched} days. File has {total} rows.")
+
+        print("--- HISTORY PULL COMPLETE ---")
+        return
+
+    # 4b. The Loop
     while current_date <= end:
         day_str = current_date.isoformat()
 
@@ -185,205 +456,14 @@ def main():
             print(f"Processing {day_str}...", end="", flush=True)
 
         try:
-            # --- FETCH DATA (Same logic as Daily Script) ---
-            # Core
-            try:
-                user_stats = api.get_user_summary(day_str)
-                rhr = get_safe(user_stats, 'restingHeartRate')
-                min_hr = get_safe(user_stats, 'minHeartRate')
-                max_hr = get_safe(user_stats, 'maxHeartRate')
-                stress = get_safe(user_stats, 'averageStressLevel')
-                steps = get_safe(user_stats, 'totalSteps')
-                vo2 = get_safe(user_stats, 'vo2Max')
-                spo2 = get_safe(user_stats, 'averageSpO2')
-                resp = get_safe(user_stats, 'averageRespirationValue')
-                cals_tot = get_safe(user_stats, 'totalKilocalories')
-                cals_act = get_safe(user_stats, 'activeKilocalories')
-                cals_goal = get_safe(user_stats, 'dailyStepGoal')
-            except:
-                rhr, min_hr, max_hr, stress, steps, vo2, spo2, resp, cals_tot, cals_act, cals_goal = [None]*11
-
-            # SpO2 fallback - try dedicated endpoint if not in user summary
-            if spo2 is None:
-                try:
-                    spo2_data = api.get_spo2_data(day_str)
-                    if spo2_data:
-                        spo2 = get_safe(spo2_data, 'averageSpO2')
-                        if spo2 is None:
-                            spo2 = get_safe(spo2_data, 'latestSpO2')
-                        if spo2 is None:
-                            spo2 = get_safe(spo2_data, 'latestSpO2Value')
-                except:
-                    pass
-
-            # Respiration fallback - try dedicated endpoint if not in user summary
-            if resp is None:
-                try:
-                    resp_data = api.get_respiration_data(day_str)
-                    if resp_data:
-                        resp = get_safe(resp_data, 'avgWakingRespirationValue')
-                        if resp is None:
-                            resp = get_safe(resp_data, 'avgSleepRespirationValue')
-                except:
-                    pass
-
-            # VO2 Max fallback - try max metrics endpoint
-            if vo2 is None:
-                try:
-                    if hasattr(api, 'get_max_metrics'):
-                        max_metrics = api.get_max_metrics(day_str)
-                        if max_metrics:
-                            for metric in max_metrics if isinstance(max_metrics, list) else [max_metrics]:
-                                if get_safe(metric, 'generic', 'vo2MaxPreciseValue'):
-                                    vo2 = get_safe(metric, 'generic', 'vo2MaxPreciseValue')
-                                    break
-                                if get_safe(metric, 'vo2MaxPreciseValue'):
-                                    vo2 = get_safe(metric, 'vo2MaxPreciseValue')
-                                    break
-                except:
-                    pass
-
-            # Sleep
-            try:
-                sleep_data = api.get_sleep_data(day_str)
-                s_tot = get_safe(sleep_data, 'dailySleepDTO', 'sleepTimeSeconds')
-                s_deep = get_safe(sleep_data, 'dailySleepDTO', 'deepSleepSeconds')
-                s_rem = get_safe(sleep_data, 'dailySleepDTO', 'remSleepSeconds')
-                s_score = get_safe(sleep_data, 'dailySleepDTO', 'sleepScores', 'overall', 'value')
-                if s_tot: s_tot = round(s_tot / 3600, 2)
-                if s_deep: s_deep = round(s_deep / 3600, 2)
-                if s_rem: s_rem = round(s_rem / 3600, 2)
-            except:
-                s_tot, s_deep, s_rem, s_score = None, None, None, None
-
-            # Training Status
-            t_status = None
-            try:
-                if hasattr(api, 'get_training_status'):
-                    ts = api.get_training_status(day_str)
-                    # Try multiple paths for training status
-                    t_status = get_safe(ts, 'mostRecentTerminatedTrainingStatus', 'status')
-                    if t_status is None:
-                        t_status = get_safe(ts, 'trainingStatusData', 'status')
-                    if t_status is None:
-                        t_status = get_safe(ts, 'status')
-                    if t_status is None and isinstance(ts, list) and len(ts) > 0:
-                        t_status = get_safe(ts[0], 'status')
-
-                    # Also try to get VO2 max from training status if still missing
-                    if vo2 is None and ts:
-                        vo2 = get_safe(ts, 'vo2MaxValue')
-                        if vo2 is None:
-                            vo2 = get_safe(ts, 'mostRecentTerminatedTrainingStatus', 'vo2MaxValue')
-            except:
-                pass
-
-            # Body Comp
-            wt, mus, fat, h2o = None, None, None, None
-            try:
-                bc = api.get_body_composition(day_str)
-                if bc and 'totalAverage' in bc:
-                    avg = bc['totalAverage']
-                    if avg.get('weight'): wt = round(avg.get('weight')/453.592, 1)
-                    if avg.get('muscleMass'): mus = round(avg.get('muscleMass')/453.592, 1)
-                    fat = avg.get('bodyFat')
-                    h2o = avg.get('bodyWater')
-            except:
-                pass
-
-            # HRV
-            hrv_s, hrv_a = None, None
-            try:
-                if hasattr(api, 'get_hrv_data'):
-                    h = api.get_hrv_data(day_str)
-                else:
-                    h = api.connectapi(f"/hrv-service/hrv/daily/{day_str}")
-
-                hrv_s = get_safe(h, 'hrvSummary', 'status')
-
-                # Try multiple HRV value sources in order of preference
-                hrv_a = get_safe(h, 'hrvSummary', 'weeklyAverage')
-                if hrv_a is None:
-                    hrv_a = get_safe(h, 'hrvSummary', 'lastNightAvg')
-                if hrv_a is None:
-                    hrv_a = get_safe(h, 'lastNightAvg')
-                if hrv_a is None:
-                    # Try to get from HRV values array
-                    hrv_values = get_safe(h, 'hrvValues')
-                    if hrv_values and len(hrv_values) > 0:
-                        hrv_a = get_safe(hrv_values[-1], 'hrvValue')
-                if hrv_a is None:
-                    hrv_a = get_safe(h, 'hrvValue')
-            except:
-                pass
-
-            # Blood Pressure
-            bp_sys, bp_dia = None, None
-            try:
-                if hasattr(api, 'get_blood_pressure'):
-                    bp_data = api.get_blood_pressure(day_str)
-                else:
-                    bp_data = api.connectapi(f"/bloodpressure/{day_str}")
-
-                if bp_data:
-                    summaries = get_safe(bp_data, 'measurementSummaries')
-                    if summaries and len(summaries) > 0:
-                        # Try to get from measurements array first (most accurate)
-                        measurements = get_safe(summaries[0], 'measurements')
-                        if measurements and len(measurements) > 0:
-                            bp_sys = get_safe(measurements[0], 'systolic')
-                            bp_dia = get_safe(measurements[0], 'diastolic')
-
-                        # Fallback to summary high values
-                        if bp_sys is None:
-                            bp_sys = get_safe(summaries[0], 'highSystolic')
-                            bp_dia = get_safe(summaries[0], 'highDiastolic')
-            except:
-                pass
-
-            # Activities
-            act_str = ""
-            try:
-                acts = api.get_activities_by_date(day_str, day_str)
-                if acts:
-                    names = [f"{a['activityName']} ({a['activityType']['typeKey']})" for a in acts]
-                    act_str = "; ".join(names)
-            except:
-                pass
-
-            # Build Row
-            row = [
-                day_str, wt, mus, fat, h2o, s_tot, s_deep, s_rem, s_score,
-                rhr, min_hr, max_hr, stress, resp, spo2, vo2, t_status, hrv_s, hrv_a,
-                bp_sys, bp_dia,
-                steps, cals_goal, cals_tot, cals_act, act_str
-            ]
+            row = fetch_day_row(api, day_str)
 
-            if FORCE_MODE:
-                # Force mode: completely replace with fresh data
-                existing_data[day_str] = row
-                print(" Done.")
-            elif BACKFILL_MODE:
-                # Merge with existing data - only fill empty values
-                if day_str in existing_data:
-                    old_row = existing_data[day_str]
-                    merged_row = []
-                    for i, (old_val, new_val) in enumerate(zip(old_row, row)):
-                        # Keep old value if it exists and is not empty
-                        if old_val is not None and str(old_val).strip() != '':
-                            merged_row.append(old_val)
-                        else:
-                            merged_row.append(new_val)
-                    existing_data[day_str] = merged_row
-                else:
-                    existing_data[day_str] = row
-                print(" Done.")
+            if FORCE_MODE or BACKFILL_MODE:
+                merge_row(day_str, row, existing_data, fetched_days)
             else:
-                # Normal mode: append immediately
-                with open(CSV_FILE, mode='a', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(row)
-                print(" Done.")
+                # Normal mode: append immediately (flat file or this month's partition)
+                append_row(CSV_FILE, headers, row)
+            print(" Done.")
 
         except Exception as e:
             print(f" Failed ({e})")
@@ -393,16 +473,10 @@ def main():
         time.sleep(random.uniform(1.5, 3.0)) # Sleep 1.5 to 3 seconds
 
     # In backfill or force mode, write all data back to file
-    if (BACKFILL_MODE or FORCE_MODE) and existing_data:
+    if (BACKFILL_MODE or FORCE_MODE) and fetched_days:
         print("Writing updated data to file...")
-        # Sort by date (newest first)
-        sorted_dates = sorted(existing_data.keys(), reverse=True)
-        with open(CSV_FILE, mode='w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(headers)
-            for d in sorted_dates:
-                writer.writerow(existing_data[d])
-        print(f"Updated {len(existing_data)} rows.")
+        write_all_rows(existing_data, fetched_days)
+        print(f"Updated {len(fetched_days)} rows.")
 
     print("--- HISTORY PULL COMPLETE ---")
 
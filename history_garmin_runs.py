@@ -1,7 +1,7 @@
-import garth
-from garminconnect import Garmin
+from garmin_session import get_garmin_client
+from csv_store import dataset_files, read_rows, write_dataset
+from schemas import GARMIN_RUNS, migrate_dataset
 from datetime import date, timedelta
-import csv
 import os
 import sys
 import platform
@@ -31,7 +31,6 @@ elif check_mount and is_windows:
     print("Note: Mount check skipped on Windows (not applicable).")
 
 # --- CONFIGURATION ---
-TOKEN_DIR = ".garth"
 SAVE_PATH = os.getenv("SAVE_PATH")
 CSV_FILE = os.path.join(SAVE_PATH, "garmin_runs.csv") if SAVE_PATH else "garmin_runs.csv"
 DEFAULT_START_DATE = "2024-08-08"
@@ -55,13 +54,7 @@ for arg in sys.argv[1:]:
 
 def main():
     print("1. Loading tokens...")
-    garth.resume(TOKEN_DIR)
-    api = Garmin("dummy", "dummy")
-    api.garth = garth.client
-    try:
-        api.display_name = api.garth.profile['displayName']
-    except:
-        pass
+    api = get_garmin_client()
 
     print(f"2. Fetching runs from {START_DATE}...")
 
@@ -74,17 +67,14 @@ def main():
     existing_dates = set()
     existing_rows = []
 
-    if os.path.isfile(CSV_FILE):
+    if dataset_files(CSV_FILE):
         try:
-            with open(CSV_FILE, mode='r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                headers = next(reader, None)
-                for row in reader:
-                    if row:
-                        date_str = row[0]
-                        time_str = row[1] if len(row) > 1 else ""
-                        existing_dates.add((date_str, time_str))
-                        existing_rows.append(row)
+            migrate_dataset(CSV_FILE, GARMIN_RUNS)  # Legacy headers/dates (one-time)
+            for row in read_rows(CSV_FILE, encoding='utf-8'):
+                date_str = row[0]
+                time_str = row[1] if len(row) > 1 else ""
+                existing_dates.add((date_str, time_str))
+                existing_rows.append(row)
             if FORCE_MODE:
                 print(f"   Found {len(existing_rows)} existing records (will overwrite)")
                 existing_rows = []  # Clear existing data in force mode
@@ -170,17 +160,7 @@ def main():
     # Write all data sorted newest to oldest
     if all_rows:
         all_rows.sort(key=lambda x: (x[0], x[1]), reverse=True)  # Sort by date, then time descending
-        with open(CSV_FILE, mode='w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                "Date", "Time", "activityName", "activityType_typeKey",
-                "duration", "elapsedDuration", "movingDuration",
-                "averageSpeed", "averageHR", "maxHR", "steps",
-                "summarizedExerciseSets", "totalSets", "activeSets", "totalReps",
-                "trainingEffectLabel", "activityTrainingLoad", "minActivityLapDuration",
-                "hrTimeInZone_1", "hrTimeInZone_2", "hrTimeInZone_3", "hrTimeInZone_4"
-            ])
-            writer.writerows(all_rows)
+        write_dataset(CSV_FILE, GARMIN_RUNS.headers, all_rows, encoding='utf-8')
         print(f"   Written {len(all_rows)} total records (sorted newest to oldest).")
 
     print(f"--- COMPLETE. Added {total_new} new records. ---")
@@ -1,9 +1,10 @@
-import requests
-import csv
 import os
 import time
 from datetime import datetime
 from dotenv import load_dotenv  # <--- Loads the secret file
+from hevy_client import HevyClient, HevyAPIError
+from csv_store import dataset_files, dataset_lock, read_rows, write_dataset
+from schemas import HEVY_STATS, migrate_dataset
 
 import os
 import sys
@@ -78,11 +79,8 @@ def main():
         print("CRITICAL ERROR: 'HEVY_API_KEY' not found in .env file.")
         return
 
-    headers = {
-        "api-key": API_KEY,
-        "Accept": "application/json"
-    }
-    
+    client = HevyClient(API_KEY)
+
     print(f"--- STARTING HEVY HISTORY PULL (Since {START_YEAR}) ---")
     print(f"Target File: {CSV_FILE}")
     
@@ -97,21 +95,20 @@ def main():
             # We continue anyway, in case it's a root drive issue
             
     # 2. Load existing data
-    file_exists = os.path.isfile(CSV_FILE)
+    file_exists = bool(dataset_files(CSV_FILE))
     existing_entries = set()
+    snapshot_entries = set()  # Keys on disk at startup (kept in force mode too)
     existing_rows = []
 
     if file_exists:
         try:
-            with open(CSV_FILE, mode='r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                _csv_header = next(reader, None)  # Skip header row
-                for row in reader:
-                    if row:
-                        # Create unique key: date, workout, exercise, set number
-                        key = (row[0], row[1], row[2], row[3])
-                        existing_entries.add(key)
-                        existing_rows.append(row)
+            migrate_dataset(CSV_FILE, HEVY_STATS)  # Legacy headers/dates (one-time)
+            for row in read_rows(CSV_FILE, encoding='utf-8'):
+                # Create unique key: date, workout, exercise, set number
+                key = (row[0], row[1], row[2], row[3])
+                existing_entries.add(key)
+                existing_rows.append(row)
+            snapshot_entries = set(existing_entries)
             if FORCE_MODE:
                 print(f"   Found {len(existing_rows)} existing records (will overwrite)")
                 existing_rows = []
@@ -122,41 +119,25 @@ def main():
             print(f"   Warning: Could not read existing file: {e}")
     else:
         try:
-            with open(CSV_FILE, mode='w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(["Date", "Workout", "Exercise", "Set", "Weight (lbs)", "Reps", "RPE", "Type"])
+            write_dataset(CSV_FILE, HEVY_STATS.headers, [], encoding='utf-8')
         except Exception as e:
             print(f"Error creating file: {e}")
             return
 
-    page = 1
     total_new = 0
-    keep_going = True
-    all_new_rows = list(existing_rows)  # Start with existing data
+    total_workouts = 0
+    all_new_rows = []
+    fetch_started = time.perf_counter()
 
     # 3. Fetch Loop
-    while keep_going:
-        print(f"Fetching Page {page}...", end="", flush=True)
-
-        url = "https://api.hevyapp.com/v1/workouts"
-        params = {"page": page, "pageSize": 10}
-
-        try:
-            response = requests.get(url, headers=headers, params=params)
-
-            if response.status_code != 200:
-                print(f"\nCRITICAL ERROR: {response.status_code}")
-                print(f"Server Message: {response.text}")
-                break
-
-            data = response.json()
-            workouts = data.get('workouts', [])
-
-            if not workouts:
-                print(" No more workouts found. Done.")
-                break
+    # Pages come newest first at the largest pageSize Hevy allows; the next page is
+    # prefetched in the background while this one is flattened.
+    try:
+        for page, workouts, page_count in client.iter_pages("/workouts", "workouts", prefetch=True):
+            print(f"Page {page}/{page_count}...", end="", flush=True)
 
             page_rows = []
+            reached_cutoff = False
 
             for workout in workouts:
                 w_date_str = workout.get('start_time')
@@ -167,10 +148,10 @@ def main():
 
                 # Check Date Limit (stop if before start date)
                 if w_dt < START_DATE_OBJ:
-                    print(f"\nReached {w_dt.date()}. Stopping (before {START_DATE}).")
-                    keep_going = False
+                    reached_cutoff = True
                     break
 
+                total_workouts += 1
                 w_date_clean = w_dt.strftime("%Y-%m-%d")
                 w_title = workout.get('title', 'Unknown Workout')
 
@@ -199,7 +180,8 @@ def main():
                             weight_lbs,
                             reps,
                             s.get('rpe', ''),
-                            s_type
+                            s_type,
+                            workout.get('id', '')
                         ]
                         page_rows.append(row)
                         total_new += 1
@@ -210,23 +192,44 @@ def main():
             else:
                 print(" (Page empty).")
 
-            page += 1
-            time.sleep(0.5)
+            if reached_cutoff:
+                print(f"Reached {w_dt.date()}. Stopping (before {START_DATE}).")
+                break
+        else:
+            print("No more workouts found. Done.")
 
-        except Exception as e:
-            print(f"\nGlobal Error: {e}")
-            break
+    except HevyAPIError as e:
+        print(f"\nCRITICAL ERROR: {e.status_code}")
+        print(f"Server Message: {e.message}")
+    except Exception as e:
+        print(f"\nGlobal Error: {e}")
+
+    elapsed = time.perf_counter() - fetch_started
+    rate = total_workouts / elapsed if elapsed > 0 else 0
+    print(f"Fetched {total_workouts} workouts in {elapsed:.1f}s ({rate:.1f} workouts/s)")
 
     # 4. Save to CSV (sorted newest to oldest)
+    # Re-read under the lock and merge: the hourly sync may have written workouts
+    # while we were fetching, and its sync state has already moved past them.
     if all_new_rows:
-        # Sort by date descending (newest first)
-        all_new_rows.sort(key=lambda x: x[0], reverse=True)
-        with open(CSV_FILE, mode='w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(["Date", "Workout", "Exercise", "Set", "Weight (lbs)", "Reps", "RPE", "Type"])
-            writer.writerows(all_new_rows)
-        print(f"   Written {len(all_new_rows)} total records (sorted newest to oldest).")
-
+        with dataset_lock(CSV_FILE):
+            fetched_keys = {(r[0], r[1], r[2], str(r[3])) for r in all_new_rows}
+            kept_rows = []
+            for row in read_rows(CSV_FILE, encoding='utf-8'):
+                key = tuple((row + [''] * 4)[:4])
+                if key in fetched_keys:
+                    continue
+                if FORCE_MODE and key in snapshot_entries:
+                    continue  # Replaced by the fresh pull
+                kept_rows.append(row)
+
+            all_rows = kept_rows + all_new_rows
+            # Sort by date descending (newest first)
+            all_rows.sort(key=lambda x: x[0], reverse=True)
+            write_dataset(CSV_FILE, HEVY_STATS.headers, all_rows, encoding='utf-8')
+        print(f"   Written {len(all_rows)} total records (sorted newest to oldest).")
+
+    print(client.metrics_summary())
     print(f"--- COMPLETE. Added {total_new} new records. ---")
 
 if __name__ == "__main__":
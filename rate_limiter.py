@@ -0,0 +1,38 @@
+"""
+Shared Rate Limiter
+
+Spaces out calls to an external API across threads, so concurrent workers
+never go faster than the configured rate.
+
+Usage:
+  limiter = RateLimiter(calls_per_second=1.0)
+  limiter.wait()   # Blocks until this caller may make its request
+  api.get_something()
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe limiter allowing at most `calls_per_second` calls across all threads."""
+
+    def __init__(self, calls_per_second=1.0):
+        self.min_interval = 1.0 / calls_per_second if calls_per_second > 0 else 0.0
+        self._next_allowed = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next call slot, then reserve it."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed)
+            self._next_allowed = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def call(self, func, *args, **kwargs):
+        """Wait for a slot, then call func(*args, **kwargs)."""
+        self.wait()
+        return func(*args, **kwargs)
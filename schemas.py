@@ -0,0 +1,320 @@
+"""
+Dataset Schema Registry
+
+One place that describes every CSV dataset: column names and order, pandas
+dtypes, units, nullability, the natural key and a schema version. Writers take
+their header from here and readers get explicit read_csv arguments, so a
+column list is never repeated across scripts.
+
+Header drift (old files with missing/reordered columns, renamed columns) and
+legacy M/D/YYYY dates are fixed by versioned one-time migrations:
+migrate_dataset() rewrites the file once and records the schema version in the
+<file>.meta.json sidecar, instead of every reader remapping columns row by row
+or parsing dates element by element. Writers only ever emit ISO dates, so
+readers use parse_dates(), a fixed-format fast path.
+
+Run all pending migrations at once with:
+  python schemas.py
+
+Usage:
+  from schemas import GARMIN_STATS, migrate_dataset
+  migrate_dataset(CSV_FILE, GARMIN_STATS)
+  writer.writerow(GARMIN_STATS.headers)
+  df = pd.read_csv(path, **GARMIN_STATS.read_csv_kwargs())
+  df['Date'] = parse_dates(df['Date'])
+"""
+
+from dataclasses import dataclass, field
+import csv
+import os
+import platform
+import sys
+
+from csv_store import dataset_files, dataset_lock, load_meta, normalize_date, save_meta, write_csv
+
+ISO_DATE_FORMAT = "%Y-%m-%d"
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    dtype: str = "float32"  # pandas dtype; "date" columns are read as text and parsed
+    unit: str = None
+    nullable: bool = True
+    sport_specific: bool = False  # Only some sports record it (power, strokes, ...)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """Brings a file up to `version`. `renames` maps old column names to new ones."""
+    version: int
+    description: str
+    renames: dict = field(default_factory=dict)
+    normalize_dates: bool = False  # Rewrite date columns as ISO YYYY-MM-DD
+
+
+@dataclass(frozen=True)
+class DatasetSchema:
+    filename: str
+    columns: tuple
+    key: tuple
+    order: tuple = ("Date",)  # Columns the file is sorted by, newest first
+    version: int = 2
+    migrations: tuple = ()
+
+    @property
+    def headers(self):
+        return [c.name for c in self.columns]
+
+    @property
+    def sport_specific_columns(self):
+        return [c.name for c in self.columns if c.sport_specific]
+
+    @property
+    def date_columns(self):
+        return [c.name for c in self.columns if c.dtype == "date"]
+
+    def dtypes(self):
+        return {c.name: ("str" if c.dtype == "date" else c.dtype) for c in self.columns}
+
+    def read_csv_kwargs(self, columns=None):
+        """Explicit dtype/usecols for pd.read_csv (unknown file columns are skipped)."""
+        wanted = set(columns or self.headers)
+        return {
+            "dtype": {name: dtype for name, dtype in self.dtypes().items() if name in wanted},
+            "usecols": lambda name: name in wanted,
+        }
+
+
+def _cols(dtype, unit, *names, sport_specific=False):
+    return tuple(Column(name, dtype, unit, sport_specific=sport_specific) for name in names)
+
+
+# --- DATASETS ---
+DATE_MIGRATION = Migration(2, "Rewrite legacy M/D/YYYY dates as ISO", normalize_dates=True)
+
+GARMIN_STATS = DatasetSchema(
+    filename="garmin_stats.csv",
+    columns=(
+        Column("Date", "date", nullable=False),
+        *_cols("float32", "lbs", "Weight (lbs)", "Muscle Mass (lbs)"),
+        *_cols("float32", "%", "Body Fat %", "Water %"),
+        *_cols("float32", "hr", "Sleep Total (hr)", "Sleep Deep (hr)", "Sleep REM (hr)"),
+        Column("Sleep Score"),
+        *_cols("float32", "bpm", "RHR", "Min HR", "Max HR"),
+        Column("Avg Stress"),
+        Column("Respiration", unit="brpm"),
+        Column("SpO2", unit="%"),
+        Column("VO2 Max", unit="ml/kg/min"),
+        Column("Training Status", "category"),
+        Column("HRV Status", "category"),
+        Column("HRV Avg", unit="ms"),
+        *_cols("float32", "mmHg", "BP Systolic", "BP Diastolic"),
+        *_cols("float32", "steps", "Steps", "Step Goal"),
+        *_cols("float32", "kcal", "Cals Total", "Cals Active"),
+        Column("Activities", "str"),
+    ),
+    key=("Date",),
+    migrations=(
+        Migration(1, "Align legacy headers (missing/reordered columns) to the current column set"),
+        DATE_MIGRATION,
+    ),
+)
+
+GARMIN_ACTIVITIES = DatasetSchema(
+    filename="garmin_activities.csv",
+    columns=(
+        Column("Date", "date", nullable=False),
+        Column("Time", "str", nullable=False),
+        Column("activityName", "category"),
+        Column("sportType", "category"),
+        *_cols("float32", "s", "duration", "elapsedDuration", "movingDuration"),
+        Column("distance", unit="m"),
+        *_cols("float32", "m/s", "averageSpeed", "maxSpeed"),
+        *_cols("float32", "bpm", "averageHR", "maxHR"),
+        *_cols("float32", "s", *[f"hrTimeInZone_{i}" for i in range(1, 6)]),
+        *_cols("float32", "W", "avgPower", "maxPower", "normPower", sport_specific=True),
+        *_cols("float32", "spm", "avgCadence", "maxCadence", sport_specific=True),
+        *_cols("float32", "m", "totalAscent", "totalDescent", sport_specific=True),
+        Column("steps", unit="steps", sport_specific=True),
+        Column("avgStrideLength", unit="cm", sport_specific=True),
+        Column("avgStrokes", sport_specific=True),
+        Column("totalStrokes", sport_specific=True),
+        Column("poolLength", unit="m", sport_specific=True),
+        Column("numLaps", "Int16"),
+        Column("calories", unit="kcal"),
+        Column("trainingEffectLabel", "category"),
+        Column("activityTrainingLoad"),
+        Column("aerobicEffect"),
+        Column("anaerobicEffect"),
+        Column("vo2Max", unit="ml/kg/min", sport_specific=True),
+        Column("lactateThreshold", unit="bpm", sport_specific=True),
+        Column("activityId", "Int64"),
+    ),
+    key=("Date", "Time"),
+    order=("Date", "Time"),
+    migrations=(
+        Migration(1, "Align legacy headers to the multi-sport column set"),
+        DATE_MIGRATION,
+    ),
+)
+
+GARMIN_RUNS = DatasetSchema(
+    filename="garmin_runs.csv",
+    columns=(
+        Column("Date", "date", nullable=False),
+        Column("Time", "str", nullable=False),
+        Column("activityName", "category"),
+        Column("activityType_typeKey", "category"),
+        *_cols("float32", "s", "duration", "elapsedDuration", "movingDuration"),
+        Column("averageSpeed", unit="m/s"),
+        *_cols("float32", "bpm", "averageHR", "maxHR"),
+        Column("steps", unit="steps"),
+        Column("summarizedExerciseSets", "str"),
+        Column("totalSets"),
+        Column("activeSets"),
+        Column("totalReps"),
+        Column("trainingEffectLabel", "category"),
+        Column("activityTrainingLoad"),
+        Column("minActivityLapDuration", unit="s"),
+        *_cols("float32", "s", *[f"hrTimeInZone_{i}" for i in range(1, 5)]),
+    ),
+    key=("Date", "Time"),
+    order=("Date", "Time"),
+    migrations=(
+        Migration(1, "Align legacy headers to the runs column set"),
+        DATE_MIGRATION,
+    ),
+)
+
+HEVY_STATS = DatasetSchema(
+    filename="hevy_stats.csv",
+    columns=(
+        Column("Date", "date", nullable=False),
+        Column("Workout", "category", nullable=False),
+        Column("Exercise", "category", nullable=False),
+        Column("Set", "int16", nullable=False),
+        Column("Weight (lbs)", unit="lbs"),
+        Column("Reps", unit="reps"),
+        Column("RPE"),
+        Column("Type", "category"),
+        Column("Workout ID", "str"),  # Hevy workout id (empty for rows imported before v3)
+    ),
+    key=("Date", "Workout", "Workout ID", "Exercise", "Set"),
+    version=3,
+    migrations=(
+        Migration(1, "Align legacy headers to the set-level column set"),
+        DATE_MIGRATION,
+        Migration(3, "Add the Hevy workout ID column"),
+    ),
+)
+
+SCHEMAS = {s.filename: s for s in (GARMIN_STATS, GARMIN_ACTIVITIES, GARMIN_RUNS, HEVY_STATS)}
+
+
+def schema_for(path):
+    """Registry lookup by file name (None for files without a schema)."""
+    return SCHEMAS.get(os.path.basename(path))
+
+
+# --- MIGRATIONS ---
+def _read_header(path):
+    with open(path, mode='r', newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), [])
+
+
+def _migrate_file(file_path, schema, pending):
+    """Rewrite one CSV file for the pending migrations. Returns True if it changed."""
+    header = _read_header(file_path)
+    renames = {}
+    for migration in pending:
+        renames.update(migration.renames)
+    normalize = any(m.normalize_dates for m in pending)
+    date_positions = [schema.headers.index(name) for name in schema.date_columns]
+    positions = {renames.get(name, name): i for i, name in enumerate(header)}
+    source = [positions.get(name) for name in schema.headers]
+
+    changed = header != schema.headers
+    rows = []
+    with open(file_path, mode='r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if not row:
+                continue
+            new_row = [row[i] if i is not None and i < len(row) else '' for i in source]
+            if normalize:
+                for i in date_positions:
+                    iso = normalize_date(new_row[i]) or new_row[i]
+                    if iso != new_row[i]:
+                        new_row[i] = iso
+                        changed = True
+            rows.append(new_row)
+
+    if changed:
+        write_csv(file_path, schema.headers, rows, encoding='utf-8')
+    return changed
+
+
+def migrate_dataset(path, schema):
+    """
+    Run any pending migrations for a dataset (flat file or month partitions),
+    once. Files are rewritten with the current header (columns matched by
+    name, renamed columns carried over, missing ones left empty) and ISO
+    dates, and the schema version is recorded in the sidecar. Returns True if
+    anything was rewritten.
+    """
+    files = dataset_files(path)
+    if not files:
+        return False
+
+    with dataset_lock(path):
+        meta = load_meta(path)
+        pending = [m for m in schema.migrations if m.version > meta.get("schema_version", 0)]
+        if not pending and _read_header(files[0]) == schema.headers:
+            return False
+
+        changed = [f for f in files if _migrate_file(f, schema, pending)]
+        if changed:
+            print(f"Migrated {os.path.basename(path)} to schema v{schema.version} ({len(changed)} file(s)).")
+
+        meta["schema_version"] = schema.version
+        save_meta(path, meta)
+        return bool(changed)
+
+
+def migrate_all(folder):
+    """Run pending migrations for every registered dataset in a folder."""
+    for schema in SCHEMAS.values():
+        path = os.path.join(folder, schema.filename)
+        if dataset_files(path) and not migrate_dataset(path, schema):
+            print(f"{schema.filename}: up to date (schema v{schema.version}).")
+
+
+# --- READERS ---
+def parse_dates(values):
+    """
+    Parse a date column. Stored dates are ISO, so this is one vectorised
+    fixed-format parse; files that still hold legacy dates (not migrated
+    yet) fall back to slower per-element parsing.
+    """
+    import pandas as pd
+    try:
+        return pd.to_datetime(values, format=ISO_DATE_FORMAT)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values, format='mixed', dayfirst=False)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    # Platform-Aware Safety Check
+    check_mount = os.getenv("CHECK_MOUNT_STATUS", "False").lower() == "true"
+    drive_path = os.getenv("DRIVE_MOUNT_PATH", "/home/pi/google_drive")
+    if check_mount and platform.system() != "Windows" and not os.path.ismount(drive_path):
+        print(f"CRITICAL ERROR: Drive is not mounted at {drive_path}.")
+        print("Stopping script to prevent writing to local storage.")
+        sys.exit(1)
+
+    migrate_all(os.getenv("SAVE_PATH") or ".")
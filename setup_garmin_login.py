@@ -1,4 +1,5 @@
 import garth
+from garmin_session import TOKEN_DIR, clear_profile_cache
 import os
 import getpass
 from dotenv import load_dotenv
@@ -25,7 +26,8 @@ def main():
         print(f"Attempting login for {email}...")
         garth.login(email, password)
         print("Login SUCCESS!")
-        garth.save(".garth")
+        garth.save(TOKEN_DIR)
+        clear_profile_cache(TOKEN_DIR)  # Account may have changed
         print("Tokens saved.")
 
     except Exception as e:
@@ -0,0 +1,73 @@
+"""
+Refresh policy of the hourly health run: interval endpoints are only marked as
+fetched once they return data, so a failed fetch is retried on the next run.
+"""
+
+import pytest
+
+import daily_garmin_health
+
+
+class FakeGarmin:
+    """Garmin client whose body composition call fails until `body_comp_fails` runs are used up."""
+
+    def __init__(self, body_comp_fails=1):
+        self.body_comp_fails = body_comp_fails
+        self.calls = []
+
+    def get_user_summary(self, day):
+        return {"restingHeartRate": 52, "totalSteps": 8000, "vo2Max": 50}
+
+    def get_sleep_data(self, day):
+        return {"dailySleepDTO": {"sleepTimeSeconds": 27000, "sleepScores": {"overall": {"value": 80}}}}
+
+    def get_training_status(self, day):
+        self.calls.append("training_status")
+        return {"status": "PRODUCTIVE"}
+
+    def get_body_composition(self, day):
+        self.calls.append("body_composition")
+        if self.body_comp_fails:
+            self.body_comp_fails -= 1
+            raise ConnectionError("Garmin timed out")
+        return {"totalAverage": {"weight": 80000, "bodyFat": 18.5}}
+
+    def get_hrv_data(self, day):
+        return {"hrvSummary": {"status": "BALANCED", "weeklyAverage": 60}}
+
+    def get_blood_pressure(self, day):
+        self.calls.append("blood_pressure")
+        return None
+
+    def get_activities_by_date(self, start, end):
+        return []
+
+
+@pytest.fixture
+def health(tmp_path, monkeypatch):
+    """daily_garmin_health writing to a temp folder with a fake Garmin client."""
+    api = FakeGarmin()
+    monkeypatch.setattr(daily_garmin_health, "CSV_FILE", str(tmp_path / "garmin_stats.csv"))
+    monkeypatch.setattr(daily_garmin_health, "REFRESH_STATE_FILE", str(tmp_path / ".garmin_refresh_state.json"))
+    monkeypatch.setattr(daily_garmin_health, "get_garmin_client", lambda: api)
+    return api
+
+
+def test_failed_interval_fetch_is_retried_next_run(health):
+    daily_garmin_health.main()
+    assert health.calls.count("body_composition") == 1
+
+    daily_garmin_health.main()
+    assert health.calls.count("body_composition") == 2
+    assert daily_garmin_health.load_today_row(daily_garmin_health.date.today().isoformat())["Weight (lbs)"] == "176.4"
+
+    daily_garmin_health.main()  # Fetched successfully last run: not due for SLOW_REFRESH_HOURS
+    assert health.calls.count("body_composition") == 2
+
+
+def test_empty_interval_fetch_is_retried_and_filled_one_is_not(health):
+    daily_garmin_health.main()
+    daily_garmin_health.main()
+
+    assert health.calls.count("blood_pressure") == 2  # Returned nothing: retried
+    assert health.calls.count("training_status") == 1  # Returned a status: reused
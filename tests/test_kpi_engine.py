@@ -0,0 +1,206 @@
+"""
+compute_kpis() vs the per-period pandas calculations the dashboard used before
+the KPI engine (boolean mask per period, then one pandas call per metric).
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kpi_engine import KPI, compute_kpis
+
+DAY = pd.Timedelta(days=1)
+SECOND = pd.Timedelta(seconds=1)
+
+HEVY_KPIS = [
+    KPI("workouts", ("Date", "Workout"), "distinct"),
+    KPI("volume", "Volume", "sum"),
+    KPI("sets"),
+    KPI("exercises", "Exercise", "nunique"),
+]
+
+CARDIO_KPIS = [
+    KPI("activities"),
+    KPI("distance_km", "distance_km", "sum"),
+    KPI("avg_distance_km", ("distance_km", "activities"), "ratio"),
+    KPI("avg_hr", "averageHR", "mean"),
+    KPI("avg_duration_min", "duration", "mean", scale=1 / 60),
+    KPI("max_hr", "averageHR", "max"),
+    KPI("hr_samples", "averageHR", "count"),
+]
+
+
+def date_indexed(df):
+    """Sorted by date and indexed by it, as the dashboard loaders return frames."""
+    df = df.sort_values("Date", kind="stable").set_index("Date", drop=False)
+    df.index.name = None
+    return df
+
+
+@pytest.fixture
+def hevy_df():
+    """~120 days of sets: 0-2 workouts a day (some with the same title), categorical text columns."""
+    rng = np.random.default_rng(3)
+    rows = []
+    for day in pd.date_range("2024-01-01", periods=120, freq="D"):
+        for workout in rng.choice(["Push", "Pull", "Legs"], size=rng.integers(0, 3)):
+            for set_no in range(int(rng.integers(1, 6))):
+                rows.append({
+                    "Date": day,
+                    "Workout": workout,
+                    "Exercise": rng.choice(["Bench", "Squat", "Row", "Curl"]),
+                    "Set": set_no + 1,
+                    "Weight (lbs)": np.float32(rng.uniform(20, 300)),
+                    "Reps": np.float32(rng.integers(3, 15)),
+                })
+    df = pd.DataFrame(rows).astype({"Workout": "category", "Exercise": "category", "Set": "int16"})
+    df["Volume"] = df["Weight (lbs)"].fillna(0) * df["Reps"].fillna(0)
+    return date_indexed(df)
+
+
+@pytest.fixture
+def activities_df():
+    """~90 days of activities with some missing heart rates."""
+    rng = np.random.default_rng(5)
+    dates = pd.Timestamp("2024-03-01") + pd.to_timedelta(np.sort(rng.integers(0, 90, 150)), unit="D")
+    hr = rng.uniform(110, 170, len(dates))
+    hr[rng.random(len(dates)) < 0.2] = np.nan
+    df = pd.DataFrame({
+        "Date": dates,
+        "sportType": pd.Categorical(rng.choice(["running", "cycling"], len(dates))),
+        "distance_km": rng.uniform(1, 40, len(dates)).astype("float32"),
+        "duration": rng.uniform(900, 5400, len(dates)).astype("float32"),
+        "averageHR": hr.astype("float32"),
+    })
+    return date_indexed(df)
+
+
+def period(df, start, end):
+    return df[(df["Date"] >= start) & (df["Date"] <= end)].copy()
+
+
+def old_hevy_metrics(df, start, end):
+    rows = period(df, start, end)
+    return {
+        "workouts": rows.groupby(["Date", "Workout"], observed=True).ngroups,
+        "volume": float(rows["Volume"].sum()),
+        "sets": len(rows),
+        "exercises": rows["Exercise"].nunique(),
+    }
+
+
+def old_cardio_metrics(df, start, end):
+    rows = period(df, start, end)
+    activities = len(rows)
+    distance = float(rows["distance_km"].sum())
+    return {
+        "activities": activities,
+        "distance_km": distance,
+        "avg_distance_km": distance / activities if activities else None,
+        "avg_hr": float(rows["averageHR"].mean()) if rows["averageHR"].notna().any() else None,
+        "avg_duration_min": float(rows["duration"].mean()) / 60 if activities else None,
+        "max_hr": float(rows["averageHR"].max()) if rows["averageHR"].notna().any() else None,
+        "hr_samples": int(rows["averageHR"].count()),
+    }
+
+
+def month(year, number):
+    start = pd.Timestamp(year=year, month=number, day=1)
+    return start, start + pd.offsets.MonthEnd(0) + DAY - SECOND
+
+
+def assert_matches(values, expected_current, expected_previous):
+    for name, kpi in values.items():
+        assert kpi.current == pytest.approx(expected_current[name], rel=1e-5), name
+        assert kpi.previous == pytest.approx(expected_previous[name], rel=1e-5), name
+
+
+def test_hevy_kpis_match_per_period_calculations(hevy_df):
+    current, previous = month(2024, 3), month(2024, 2)
+    values = compute_kpis(hevy_df, HEVY_KPIS, current, previous)
+
+    assert_matches(values, old_hevy_metrics(hevy_df, *current), old_hevy_metrics(hevy_df, *previous))
+    assert isinstance(values["workouts"].current, int)
+    assert values["volume"].delta == pytest.approx(values["volume"].current - values["volume"].previous)
+
+
+def test_distinct_counts_date_and_workout_pairs(hevy_df):
+    """Two same-titled workouts on different days count twice; two sessions of one title on one day once."""
+    current, previous = month(2024, 4), month(2024, 3)
+    values = compute_kpis(hevy_df, [KPI("workouts", ("Date", "Workout"), "distinct")], current, previous)
+
+    rows = period(hevy_df, *current)
+    expected = len(set(zip(rows["Date"], rows["Workout"])))
+    assert values["workouts"].current == expected
+    assert expected < len(rows)  # The fixture does have several sets per workout
+
+
+def test_cardio_kpis_and_ratio_match_per_period_calculations(activities_df):
+    current, previous = month(2024, 5), month(2024, 4)
+    values = compute_kpis(activities_df, CARDIO_KPIS, current, previous)
+
+    assert_matches(values, old_cardio_metrics(activities_df, *current),
+                   old_cardio_metrics(activities_df, *previous))
+    ratio = values["avg_distance_km"]
+    assert ratio.current == pytest.approx(values["distance_km"].current / values["activities"].current)
+
+
+def test_ratio_is_none_when_denominator_is_zero(activities_df):
+    empty = (pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-31"))
+    values = compute_kpis(activities_df, CARDIO_KPIS, month(2024, 4), empty)
+
+    assert values["activities"].previous == 0
+    assert values["avg_distance_km"].previous is None
+    assert values["avg_distance_km"].delta is None
+
+
+def test_previous_period_without_activity_has_no_delta(hevy_df):
+    empty = (pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-31") + DAY - SECOND)
+    values = compute_kpis(hevy_df, HEVY_KPIS, month(2024, 3), empty)
+
+    assert values["sets"].previous == 0
+    assert values["volume"].previous == 0
+    for kpi in values.values():
+        assert kpi.current
+        assert kpi.delta is None
+
+
+def test_mean_of_empty_previous_period_is_none(activities_df):
+    empty = (pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-31"))
+    values = compute_kpis(activities_df, CARDIO_KPIS, month(2024, 4), empty)
+
+    assert values["avg_hr"].previous is None
+    assert values["max_hr"].previous is None
+    assert values["avg_hr"].delta is None
+
+
+def test_missing_columns_come_back_as_none(hevy_df):
+    kpis = [
+        KPI("power", "avgPower", "mean"),
+        KPI("pairs", ("Date", "Routine"), "distinct"),
+        KPI("derived", lambda df: df["avgPower"] * 2, "sum"),
+        KPI("per_set", ("power", "sets"), "ratio"),
+        KPI("sets"),
+    ]
+    values = compute_kpis(hevy_df, kpis, month(2024, 3), month(2024, 2))
+
+    for name in ("power", "pairs", "derived", "per_set"):
+        assert (values[name].current, values[name].previous, values[name].delta) == (None, None, None)
+    assert values["sets"].current == len(period(hevy_df, *month(2024, 3)))
+
+
+def test_non_adjacent_periods(hevy_df):
+    """A gap between the periods takes the two slices separately instead of one contiguous view."""
+    current = (pd.Timestamp("2024-04-01"), pd.Timestamp("2024-04-20") + DAY - SECOND)
+    previous = (pd.Timestamp("2024-01-10"), pd.Timestamp("2024-01-25") + DAY - SECOND)
+    values = compute_kpis(hevy_df, HEVY_KPIS, current, previous)
+
+    assert_matches(values, old_hevy_metrics(hevy_df, *current), old_hevy_metrics(hevy_df, *previous))
+
+
+def test_overlapping_periods_are_computed_independently(hevy_df):
+    current = month(2024, 3)
+    previous = (pd.Timestamp("2024-02-15"), pd.Timestamp("2024-03-15"))
+    values = compute_kpis(hevy_df, HEVY_KPIS, current, previous)
+
+    assert_matches(values, old_hevy_metrics(hevy_df, *current), old_hevy_metrics(hevy_df, *previous))
@@ -0,0 +1,105 @@
+"""
+Allocation budget for one dashboard rerun.
+
+Loads fixture hevy_stats.csv / garmin_activities.csv files through the
+dashboard's own loaders (dashboard_frames), then traces the per-rerun frame work
+of the Training and Cardio sections, period_view() and cardio_view() with the
+dashboard's KPI lists, with tracemalloc. The shared frames must only be sliced,
+never copied or mutated per rerun. (Charts are built from these slices on a
+figure cache miss only.)
+"""
+
+import csv
+import random
+import tracemalloc
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from dashboard_frames import (CARDIO_KPIS, HEVY_KPIS, RERUN_ALLOC_BUDGET_MB, cardio_view, load_activities_frame,
+                              load_hevy_frame, period_view, previous_period)
+from schemas import GARMIN_ACTIVITIES, HEVY_STATS
+
+HEVY_ROWS = 100_000       # ~34 years of sets: a full copy alone would be over budget
+ACTIVITY_ROWS = 10_000
+END_DATE = date(2024, 6, 30)
+
+def write_rows(path, headers, rows):
+    with open(path, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow([row.get(name, '') for name in headers])
+
+
+def hevy_rows():
+    rng = random.Random(42)
+    exercises = ["Bench Press (Barbell)", "Squat (Barbell)", "Deadlift (Barbell)", "Lat Pulldown (Cable)"]
+    for i in range(HEVY_ROWS):
+        yield {"Date": (END_DATE - timedelta(days=i // 8)).isoformat(), "Workout": rng.choice(["Push", "Pull", "Legs"]),
+               "Exercise": rng.choice(exercises), "Set": i % 4 + 1, "Weight (lbs)": round(rng.uniform(20, 300), 1),
+               "Reps": rng.randint(3, 15), "Type": "normal"}
+
+
+def activity_rows():
+    rng = random.Random(7)
+    for i in range(ACTIVITY_ROWS):
+        yield {"Date": (END_DATE - timedelta(days=i // 2)).isoformat(), "Time": f"{7 + i % 2 * 10}:00:00",
+               "sportType": rng.choice(["running", "cycling"]), "duration": round(rng.uniform(900, 5400)),
+               "distance": round(rng.uniform(1000, 40000)), "averageSpeed": round(rng.uniform(1.0, 9.0), 2),
+               "averageHR": rng.randint(110, 170)}
+
+
+@pytest.fixture(scope="module")
+def loaded(tmp_path_factory):
+    """(hevy frame, activities frame) as returned by the dashboard loaders."""
+    folder = tmp_path_factory.mktemp("datasets")
+    hevy_path, activities_path = folder / "hevy_stats.csv", folder / "garmin_activities.csv"
+    write_rows(hevy_path, HEVY_STATS.headers, hevy_rows())
+    write_rows(activities_path, GARMIN_ACTIVITIES.headers, activity_rows())
+    return load_hevy_frame(str(hevy_path)), load_activities_frame(str(activities_path))
+
+
+def rerun(hevy_df, activities_df, start, end, sport):
+    """The frame work of one rerun of the Training and Cardio sections, as the dashboard calls it."""
+    periods = (start, end), previous_period(start, end)
+    return (period_view(hevy_df, HEVY_KPIS, *periods),
+            cardio_view(activities_df, CARDIO_KPIS, *periods, sport, {}))
+
+
+def traced_peak_mb(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def ninety_days():
+    end = pd.Timestamp(END_DATE) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    return end.normalize() - pd.Timedelta(days=89), end
+
+
+@pytest.mark.parametrize("sport", ["All", "running"])
+def test_rerun_stays_within_allocation_budget(loaded, sport):
+    hevy_df, activities_df = loaded
+    start, end = ninety_days()
+    rerun(hevy_df, activities_df, start, end, sport)  # Warm up lazy pandas/numpy imports and caches
+
+    peak = traced_peak_mb(lambda: rerun(hevy_df, activities_df, start, end, sport))
+    assert peak <= RERUN_ALLOC_BUDGET_MB, f"rerun peak {peak:.2f} MB is over the {RERUN_ALLOC_BUDGET_MB} MB budget"
+
+
+def test_rerun_does_not_change_the_shared_frames(loaded):
+    hevy_df, activities_df = loaded
+    columns = (list(hevy_df.columns), list(activities_df.columns))
+    rerun(hevy_df, activities_df, *ninety_days(), "running")
+    assert (list(hevy_df.columns), list(activities_df.columns)) == columns
+
+
+def test_budget_catches_per_rerun_copies(loaded):
+    """The fixture is large enough that copying the shared frame on a rerun breaks the budget."""
+    hevy_df, _ = loaded
+    assert traced_peak_mb(lambda: hevy_df[hevy_df['Date'].notna()].copy()) > RERUN_ALLOC_BUDGET_MB
@@ -13,10 +13,10 @@ This ensures step counts and other metrics reflect the full day's activity
 rather than partial data captured mid-day.
 """
 
-import garth
-from garminconnect import Garmin
+from garmin_session import get_garmin_client
+from csv_store import upsert_daily_row
+from schemas import GARMIN_STATS, migrate_dataset
 from datetime import date, timedelta
-import csv
 import os
 import sys
 import platform
@@ -53,7 +53,6 @@ else:
     print("WARNING: SAVE_PATH not set in .env. Using current folder.")
     CSV_FILE = "garmin_stats.csv"
 
-TOKEN_DIR = ".garth"
 # -------------------------------------
 
 def get_safe(data, *keys):
@@ -274,67 +273,19 @@ def data_to_row(data):
         data['activity_str']
     ]
 
-def normalize_date(date_str):
-    """Normalize date string to ISO format for comparison"""
-    if not date_str:
-        return None
-    try:
-        if '-' in date_str and len(date_str) == 10:
-            return date_str
-        if '/' in date_str:
-            parts = date_str.split('/')
-            if len(parts) == 3:
-                month, day, year = parts
-                return f"{year}-{int(month):02d}-{int(day):02d}"
-        return date_str
-    except:
-        return date_str
-
 def save_to_csv(new_row, target_date):
     """Save data row to CSV, replacing any existing entry for the target date."""
 
-    headers = [
-        "Date",
-        "Weight (lbs)", "Muscle Mass (lbs)", "Body Fat %", "Water %",
-        "Sleep Total (hr)", "Sleep Deep (hr)", "Sleep REM (hr)", "Sleep Score",
-        "RHR", "Min HR", "Max HR", "Avg Stress", "Respiration", "SpO2",
-        "VO2 Max", "Training Status", "HRV Status", "HRV Avg",
-        "BP Systolic", "BP Diastolic",
-        "Steps", "Step Goal", "Cals Total", "Cals Active",
-        "Activities"
-    ]
-
-    rows = []
-    folder_path = os.path.dirname(CSV_FILE)
-    if folder_path and not os.path.exists(folder_path):
-        os.makedirs(folder_path)
+    headers = GARMIN_STATS.headers
 
-    file_exists = os.path.isfile(CSV_FILE)
-    read_failed = False
-
-    if file_exists:
-        try:
-            with open(CSV_FILE, mode='r', newline='') as f:
-                reader = csv.reader(f)
-                all_data = list(reader)
-                if all_data:
-                    rows = [row for row in all_data[1:] if row and normalize_date(row[0]) != target_date]
-        except Exception as e:
-            print(f"CRITICAL: Failed to read existing CSV: {e}")
-            print("Aborting to prevent data loss. Please check the file.")
-            read_failed = True
-
-    if read_failed:
+    try:
+        migrate_dataset(CSV_FILE, GARMIN_STATS)  # One-time header alignment
+        upsert_daily_row(CSV_FILE, headers, new_row)
+    except Exception as e:
+        print(f"CRITICAL: Failed to update CSV: {e}")
+        print("Aborting to prevent data loss. Please check the file.")
         return False
 
-    rows.append(new_row)
-    rows.sort(key=lambda x: normalize_date(x[0]) if x else '', reverse=True)
-
-    with open(CSV_FILE, mode='w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(headers)
-        writer.writerows(rows)
-
     return True
 
 def main():
@@ -344,15 +295,7 @@ def main():
 
         print(f"=== Updating Yesterday's Garmin Data ({yesterday}) ===")
         print("1. Loading tokens...")
-        garth.resume(TOKEN_DIR)
-
-        # Initialize API
-        api = Garmin("dummy", "dummy")
-        api.garth = garth.client
-        try:
-            api.display_name = api.garth.profile['displayName']
-        except:
-            pass
+        api = get_garmin_client()
 
         print(f"2. Pulling data for {yesterday}...")
         data = fetch_garmin_data(api, yesterday)